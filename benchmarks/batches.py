@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# Copyright (C) 2012-2016 Victor Klepikovskiy
+#
+# This file is part of python-jtl.
+#
+# python-jtl is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# python-jtl is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-jtl. If not, see <http://www.gnu.org/licenses/>.
+
+"""Benchmark of the batched iteration against the per-sample iteration.
+
+Usage: python benchmarks/batches.py [FILE...]
+
+Synthetic CSV and XML results are generated when no files are given.
+
+"""
+
+from datetime import datetime, timedelta
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+        os.pardir))
+import jtl
+
+
+def generate(temp_dir, count=200000):
+    """Generate synthetic CSV and XML results and return their filenames.
+
+    """
+    template = jtl.Sample(*([None] * len(jtl.Sample._fields)))._replace(
+            all_threads=10, assertion_results=(), bytes_received=1024,
+            children=(), cookies={}, data_encoding='utf-8', data_type='text',
+            error_count=0, group_threads=10, hostname='host',
+            idle_time=timedelta(0), latency_time=timedelta(milliseconds=50),
+            method='GET', query_string='', request_headers={},
+            response_code='200', response_data='', response_filename='',
+            response_headers={'status_line': '', 'headers': {}},
+            response_message='OK', sample_count=1, success=True,
+            tag_name='httpSample', url='http://localhost/')
+    start = datetime(2016, 5, 14)
+    samples = (template._replace(label='label %d' % (i % 20),
+            elapsed_time=timedelta(milliseconds=i % 1000),
+            thread_name='Thread Group 1-%d' % (i % 10),
+            timestamp=start + timedelta(milliseconds=i * 10))
+            for i in xrange(count))
+    filenames = []
+    for writer_class, extension in ((jtl.CSVWriter, 'csv'),
+            (jtl.XMLWriter, 'xml')):
+        filename = os.path.join(temp_dir, 'results.%s' % extension)
+        writer = writer_class(filename)
+        writer.writesamples(samples if extension == 'csv' else
+                jtl.create_parser(filenames[0]).itersamples())
+        writer.close()
+        filenames.append(filename)
+    return filenames
+
+
+def per_sample(filename):
+    total = 0
+    for sample in jtl.create_parser(filename).itersamples():
+        total += sample.bytes_received
+    return total
+
+
+def batches(filename):
+    total = 0
+    for batch in jtl.create_parser(filename).iterbatches(1000):
+        for sample in batch:
+            total += sample.bytes_received
+    return total
+
+
+def columnar(filename):
+    total = 0
+    for columns in jtl.create_parser(filename).iterbatches(1000,
+            columnar=True):
+        total += sum(columns['bytes_received'])
+    return total
+
+
+def main(filenames):
+    temp_dir = None
+    if not filenames:
+        temp_dir = tempfile.mkdtemp()
+        filenames = generate(temp_dir)
+    try:
+        for filename in filenames:
+            print filename
+            for benchmark in (per_sample, batches, columnar):
+                started = time.time()
+                benchmark(filename)
+                print '  %-12s %8.3f s' % (benchmark.__name__,
+                        time.time() - started)
+    finally:
+        if temp_dir:
+            shutil.rmtree(temp_dir)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -16,10 +16,37 @@
 # along with python-jtl. If not, see <http://www.gnu.org/licenses/>.
 
 
-from collections import namedtuple
+from array import array
+from collections import namedtuple, OrderedDict
 from datetime import datetime, timedelta
+from itertools import count, ifilter, islice, izip, repeat
 from xml.etree import cElementTree as etree
+import argparse
+import BaseHTTPServer
+import cPickle
 import csv
+import functools
+import glob
+import hashlib
+import heapq
+import json
+import math
+import mmap
+import multiprocessing
+import operator
+import os
+import Queue
+import re
+import socket
+import SocketServer
+import struct
+import sys
+import tempfile
+import threading
+import time
+import traceback
+import urlparse
+import zlib
 
 
 class AssertionResult(namedtuple('AssertionResult', (
@@ -82,6 +109,481 @@ class Sample(namedtuple('Sample', (
     pass
 
 
+# creates the instance of Sample class from the sequence of field values
+# without the overhead of keyword arguments
+_new_sample = functools.partial(tuple.__new__, Sample)
+
+
+class FlatSample(namedtuple('FlatSample', (
+            'depth', 'parent_id', 'sample', 'sample_id',
+            ))):
+    """The class that stores the single sample from the flattened results
+    data. It contains the following fields:
+
+    depth     -- nesting level of the sample (0 for top level samples)
+    parent_id -- ordinal number of the parent sample (None for top level
+                 samples)
+    sample    -- sample as an instance of Sample class (children are
+                 not included)
+    sample_id -- ordinal number of the sample in the results (samples are
+                 numbered in the order they start)
+
+    """
+    pass
+
+
+class Position(namedtuple('Position', (
+            'offset', 'sample_id', 'skip',
+            ))):
+    """The class that stores the position of the parser in the results
+    data. Positions can be serialized (e.g. as JSON lists) and passed back
+    to the parser to resume the iteration. It contains the following
+    fields:
+
+    offset    -- byte offset in the results file
+    sample_id -- ordinal number of the first sample after the offset
+                 (flattened iteration only)
+    skip      -- number of items to be skipped after the offset
+
+    """
+    pass
+
+
+class ConcurrencyPoint(namedtuple('ConcurrencyPoint', (
+            'requests', 'threads', 'timestamp',
+            ))):
+    """The class that stores the single point of the concurrency timeline.
+    It contains the following fields:
+
+    requests  -- number of requests in flight
+    threads   -- number of threads with requests in flight
+    timestamp -- time from which the values are in effect
+
+    """
+    pass
+
+
+class SummaryRow(namedtuple('SummaryRow', (
+            'average', 'error_rate', 'label', 'max', 'median', 'min', 'p90',
+            'p95', 'p99', 'received_rate', 'samples', 'throughput',
+            ))):
+    """The class that stores the single row of the aggregate report. It
+    contains the following fields:
+
+    average       -- average elapsed time (ms)
+    error_rate    -- ratio of failed samples
+    label         -- label of the samples (None for the total row)
+    max           -- maximum elapsed time (ms)
+    median        -- median elapsed time (ms)
+    min           -- minimum elapsed time (ms)
+    p90           -- 90th percentile of elapsed time (ms)
+    p95           -- 95th percentile of elapsed time (ms)
+    p99           -- 99th percentile of elapsed time (ms)
+    received_rate -- received kilobytes per second
+    samples       -- number of samples
+    throughput    -- samples per second
+
+    """
+    pass
+
+
+class ErrorFingerprint(namedtuple('ErrorFingerprint', (
+            'count', 'error', 'example', 'failure_message',
+            'first_timestamp', 'label', 'last_timestamp', 'response_code',
+            'response_message',
+            ))):
+    """The class that stores the group of failed samples with the same
+    error fingerprint. It contains the following fields:
+
+    count            -- number of failed samples (may be overestimated by
+                        at most error)
+    error            -- maximum overestimation of count
+    example          -- example sample (instance of Sample class)
+    failure_message  -- normalized assertion failure message
+    first_timestamp  -- timestamp of the first sample counted
+    label            -- label of the samples
+    last_timestamp   -- timestamp of the last sample counted
+    response_code    -- response code
+    response_message -- normalized response message
+
+    """
+    pass
+
+
+class ComparisonRow(namedtuple('ComparisonRow', (
+            'baseline', 'baseline_percentile', 'candidate',
+            'candidate_percentile', 'change', 'error_p_value', 'label',
+            'p_value', 'regression',
+            ))):
+    """The class that stores the comparison of the candidate run with the
+    baseline run for the single label. It contains the following fields:
+
+    baseline             -- aggregate report row of the baseline run
+                            (instance of SummaryRow class, None if the
+                            label is missing)
+    baseline_percentile  -- compared percentile of elapsed time in the
+                            baseline run (ms)
+    candidate            -- aggregate report row of the candidate run
+                            (instance of SummaryRow class, None if the
+                            label is missing)
+    candidate_percentile -- compared percentile of elapsed time in the
+                            candidate run (ms)
+    change               -- relative change of the compared percentile
+                            (e.g. 0.1 for 10% slower)
+    error_p_value        -- p-value of the error rate not being higher in
+                            the candidate run
+    label                -- label of the samples (None for the total row)
+    p_value              -- p-value of elapsed time not being higher in
+                            the candidate run (Mann-Whitney U test)
+    regression           -- regression flag
+
+    """
+    pass
+
+
+class SessionSummary(namedtuple('SessionSummary', (
+            'duration', 'elapsed_time', 'end', 'errors', 'hostname',
+            'idle_time', 'iteration', 'samples', 'start', 'think_time',
+            'thread_name',
+            ))):
+    """The class that stores the summary of the single virtual user
+    session (all the samples of the thread) or its iteration. It contains
+    the following fields:
+
+    duration     -- time from the start of the first sample till the end
+                    of the last one
+    elapsed_time -- total elapsed time of the samples
+    end          -- end time of the last sample
+    errors       -- number of failed samples
+    hostname     -- hostname where the samples were generated
+    idle_time    -- total idle time of the samples
+    iteration    -- ordinal number of the iteration in the session
+                    (starting with 1, None for the whole session)
+    samples      -- number of samples
+    start        -- timestamp of the first sample
+    think_time   -- total time between the end of a sample and the start
+                    of the next one
+    thread_name  -- thread name
+
+    """
+    pass
+
+
+class ChangePoint(namedtuple('ChangePoint', (
+            'baseline', 'direction', 'label', 'metric', 'timestamp',
+            'value',
+            ))):
+    """The class that stores the change of the label's elapsed time or
+    error rate detected in the stream of samples. It contains the
+    following fields:
+
+    baseline  -- value of the metric before the change (geometric mean of
+                 elapsed time in ms or error rate)
+    direction -- direction of the change ('increase' or 'decrease')
+    label     -- label of the samples
+    metric    -- changed metric ('elapsed_time' or 'error_rate')
+    timestamp -- timestamp of the sample the change was detected at
+    value     -- value of the metric since the change started
+
+    """
+    pass
+
+
+class PrefetchReader(object):
+    """The file-like class that reads the file in a background thread. The
+    data are read in large buffers and passed to the consumer through a
+    bounded queue, so the I/O waits overlap with parsing and the reading
+    blocks when the queue is full.
+
+    """
+    buffer_size = 1024 * 1024
+
+    def __init__(self, source, depth=4, buffer_size=None):
+        """Initialize the class.
+
+        Arguments:
+        source -- filename or file object to be read
+        depth -- maximum number of buffers read ahead
+        buffer_size -- size of the buffers in bytes
+
+        """
+        self.thread = None
+        self.close_file = not hasattr(source, 'read')
+        self.fp = open(source, 'rb') if self.close_file else source
+        self.depth = max(depth, 1)
+        self.buffer_size = buffer_size or self.buffer_size
+        self.offset = self.fp.tell()
+        self._start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __del__(self):
+        self._stop()
+
+    def _start(self):
+        """Start reading the file from the current position in the
+        background thread.
+
+        """
+        self.buffer = ''
+        self.buffer_pos = 0
+        self.eof = False
+        self.queue = Queue.Queue(self.depth)
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=_prefetch, args=(self.fp,
+                self.buffer_size, self.queue, self.stopped))
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _stop(self):
+        """Stop the background thread.
+
+        """
+        if self.thread is not None:
+            self.stopped.set()
+            self.thread.join()
+            self.thread = None
+
+    def _fill(self):
+        """Append the next buffer from the queue to the buffered data and
+        return False at the end of the file.
+
+        """
+        if self.eof:
+            return False
+        chunk = self.queue.get()
+        if isinstance(chunk, Exception):
+            self.eof = True
+            raise chunk
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.buffer_pos:] + chunk
+        self.buffer_pos = 0
+        return True
+
+    def read(self, size=-1):
+        """Read and return at most size bytes (all the remaining data if
+        size is negative).
+
+        """
+        if size < 0:
+            while self._fill():
+                pass
+            size = len(self.buffer) - self.buffer_pos
+        elif self.buffer_pos == len(self.buffer):
+            self._fill()
+        start = self.buffer_pos
+        data = self.buffer[start:start + size]
+        self.buffer_pos += len(data)
+        self.offset += len(data)
+        return data
+
+    def readline(self):
+        """Read and return the next line (including the line terminator).
+
+        """
+        start = self.buffer_pos
+        end = self.buffer.find('\n', start) + 1
+        while not end:
+            scanned = len(self.buffer) - self.buffer_pos
+            if not self._fill():
+                end = len(self.buffer)
+                break
+            start = self.buffer_pos
+            end = self.buffer.find('\n', start + scanned) + 1
+        data = self.buffer[start:end]
+        self.buffer_pos = end
+        self.offset += len(data)
+        return data
+
+    def __iter__(self):
+        """Generator method which yields the remaining lines. This is
+        cheaper than calling readline method repeatedly, and the position
+        is still kept up to date after every line.
+
+        """
+        while True:
+            lines = self.buffer[self.buffer_pos:].splitlines(True)
+            last = lines.pop() if lines and lines[-1][-1:] != '\n' else ''
+            self.buffer, self.buffer_pos = last, 0
+            for line in lines:
+                self.offset += len(line)
+                yield line
+            if not self._fill():
+                break
+        if self.buffer:
+            data, self.buffer = self.buffer, ''
+            self.offset += len(data)
+            yield data
+
+    def tell(self):
+        """Return the current position in the file.
+
+        """
+        return self.offset
+
+    def seek(self, offset, whence=0):
+        """Move to the new position in the file and restart reading ahead
+        from there.
+
+        """
+        self._stop()
+        if whence == 1:
+            offset, whence = self.offset + offset, 0
+        self.fp.seek(offset, whence)
+        self.offset = self.fp.tell()
+        self._start()
+
+    def close(self):
+        """Stop reading ahead and close the file (if opened by the class).
+
+        """
+        self._stop()
+        if self.close_file:
+            self.fp.close()
+
+
+def _prefetch(fp, buffer_size, queue, stopped):
+    """Read the file into the queue until the end of the file or until
+    stopped (the thread target of PrefetchReader class). An empty string
+    marks the end of the file and exceptions are passed to the consumer.
+
+    """
+    while not stopped.is_set():
+        try:
+            chunk = fp.read(buffer_size)
+        except Exception as e:
+            chunk = e
+        while not stopped.is_set():
+            try:
+                queue.put(chunk, timeout=0.1)
+                break
+            except Queue.Full:
+                pass
+        if not chunk or isinstance(chunk, Exception):
+            return
+
+
+class _XMLReader(object):
+    """The file-like class that reads XML results data in chunks ending at
+    the boundaries of the top level samples and keeps track of the chunks
+    offsets.
+
+    """
+    root_tag = re.compile(r'<(?![?!])[^>]*>')
+    sample_tag = re.compile(r'<(/?)(?:httpSample|sample)\b[^>]*?(/?)>')
+    start_sample_tag = re.compile(r'<(?:httpSample|sample)\b')
+    empty_sample_tag = re.compile(r'<(?:httpSample|sample)\b[^>]*/>')
+    chunk_size = 16 * 1024
+
+    def __init__(self, source, offset=None, prefetch=0):
+        """Initialize the class.
+
+        Arguments:
+        source -- filename or file object containing the results data
+        offset -- byte offset of the top level sample boundary to start
+            reading from (the first sample by default)
+        prefetch -- number of buffers read ahead in the background thread
+            (the file is read in the foreground if 0)
+
+        """
+        self.close_file = not hasattr(source, 'read')
+        self.fp = source
+        if self.close_file:
+            self.fp = (PrefetchReader(source, prefetch) if prefetch
+                    else open(source, 'rb'))
+        if offset is not None:
+            self.fp.seek(0)
+        data = ''
+        while True:
+            chunk = self.fp.read(self.chunk_size)
+            data += chunk
+            match = self.root_tag.search(data)
+            if match or not chunk:
+                break
+        self.prolog = data[:match.end()] if match else data
+        self.start = len(self.prolog)
+        if offset is None or offset == self.start:
+            self.buffer = data[self.start:]
+            self.offset = self.start
+        else:
+            self.fp.seek(offset)
+            self.buffer = ''
+            self.offset = offset
+        self.chunk_offset = self.offset
+        self.depth = 0
+        self.scan_pos = 0
+        self.boundary = 0
+        self.eof = False
+
+    def _scan(self):
+        """Scan the buffered data for the top level sample boundaries. The
+        depth at the end of the last sample in the buffer is computed by
+        counting the tags, and the tags are only walked one by one if that
+        sample is not a top level one.
+
+        """
+        buffer, start = self.buffer, self.scan_pos
+        end = max(buffer.rfind('</httpSample>', start),
+                buffer.rfind('</sample>', start))
+        end = buffer.find('>', end) + 1 if end >= 0 else start
+        for match in self.empty_sample_tag.finditer(buffer, end):
+            end = match.end()
+        if end == start:
+            return
+        depth = (self.depth + len(self.start_sample_tag.findall(buffer,
+                start, end)) - len(self.empty_sample_tag.findall(buffer,
+                start, end)) - buffer.count('</httpSample>', start, end) -
+                buffer.count('</sample>', start, end))
+        if not depth:
+            self.boundary = end
+        else:
+            depth = self.depth
+            for match in self.sample_tag.finditer(buffer, start, end):
+                closing, empty = match.groups()
+                if closing:
+                    depth -= 1
+                elif not empty:
+                    depth += 1
+                if not depth:
+                    self.boundary = match.end()
+        self.depth = depth
+        self.scan_pos = end
+
+    def read(self, size=-1):
+        """Read and return the next chunk of data. The chunk can be larger
+        than the size requested, as it always ends at the boundary of a top
+        level sample (or at the end of the file).
+
+        """
+        if self.prolog is not None:
+            prolog, self.prolog = self.prolog, None
+            return prolog
+        self._scan()
+        while not self.boundary and not self.eof:
+            chunk = self.fp.read(max(size, self.chunk_size,
+                    len(self.buffer)))
+            if chunk:
+                self.buffer += chunk
+                self._scan()
+            else:
+                self.eof = True
+                if self.close_file:
+                    self.fp.close()
+        boundary = self.boundary if not self.eof else len(self.buffer)
+        data, self.buffer = self.buffer[:boundary], self.buffer[boundary:]
+        self.chunk_offset = self.offset
+        self.offset += boundary
+        self.scan_pos = max(self.scan_pos - boundary, 0)
+        self.boundary = 0
+        return data
+
+
 class BaseParser(object):
     """The base class for JTL parsers.
 
@@ -93,6 +595,70 @@ class BaseParser(object):
         """
         raise NotImplementedError
 
+    def _get_timedelta(self, value):
+        """Return the time value in milliseconds as an instance of timedelta
+        class. The instances are cached, as the same values are repeated
+        many times in the results (the cache is created by the parsers).
+
+        """
+        delta = self._timedeltas.get(value)
+        if delta is None:
+            if len(self._timedeltas) >= 100000:
+                self._timedeltas.clear()
+            delta = self._timedeltas[value] = timedelta(
+                    milliseconds=int(value or 0))
+        return delta
+
+    def iterbatches(self, size=1000, columnar=False):
+        """Generator method which yields samples from the results in
+        batches, which is cheaper than yielding them one by one for
+        consumers processing samples in blocks. Parsers redefine this
+        method to fill the batches in their own parsing loops.
+
+        Arguments:
+        size -- maximum number of samples in the batch (only the last
+            batch may be smaller)
+        columnar -- yield batches as dictionaries which map Sample field
+            names to lists of the field values instead of lists of Sample
+            class instances
+
+        """
+        batch = []
+        for sample in self.itersamples():
+            batch.append(sample)
+            if len(batch) >= size:
+                yield _get_columns(batch) if columnar else batch
+                batch = []
+        if batch:
+            yield _get_columns(batch) if columnar else batch
+
+    def iterflat(self):
+        """Generator method which yields every sample from the results
+        (including child samples) once as an instance of FlatSample class.
+        Child samples are yielded before their parent, so child samples
+        can be aggregated by parent_id and the aggregate completed as soon
+        as the parent sample is yielded. Samples are numbered from the
+        sample_id of the position the iteration is resumed from.
+
+        """
+        sample_ids = count(self.position.sample_id)
+        for sample in self.itersamples():
+            for flat_sample in self._flatten(sample, sample_ids, None, 0):
+                yield flat_sample
+
+    def _flatten(self, sample, sample_ids, parent_id, depth):
+        """Generator method which yields the sample and all its descendants
+        as instances of FlatSample class.
+
+        """
+        sample_id = next(sample_ids)
+        for child in sample.children:
+            for flat_sample in self._flatten(child, sample_ids, sample_id,
+                    depth + 1):
+                yield flat_sample
+        yield FlatSample(depth=depth, parent_id=parent_id,
+                sample=sample._replace(children=()), sample_id=sample_id)
+
 
 class XMLParser(BaseParser):
     """The class that implements JTL (XML) file parsing functionality.
@@ -104,11 +670,51 @@ class XMLParser(BaseParser):
         Arguments:
         source -- filename or file object containing the results data
 
+        Keyword arguments:
+        position -- position (instance of Position class or a sequence of
+            its fields) to resume the iteration from
+        prefetch -- number of buffers read ahead in the background thread
+            (0 to read in the foreground, which is the default)
+
         """
-        self.context = etree.iterparse(source, events=('start', 'end'))
+        position = kwargs.get('position')
+        self.reader = _XMLReader(source, position and position[0],
+                kwargs.get('prefetch', 0))
+        self.context = etree.iterparse(self.reader, events=('start', 'end'))
         self.context = iter(self.context)
         event, self.root = self.context.next()
         self.version = self.root.get('version')
+        self._position = list(position or (self.reader.start, 0, 0))
+        self._timedeltas = {}
+        self._skip = self._position[2]
+
+    @property
+    def position(self):
+        """Position after the last item yielded (instance of Position
+        class).
+
+        """
+        return Position(*self._position)
+
+    def _advance(self, sample_id=0):
+        """Advance the position by one item and return True if the item
+        is to be skipped (when resuming the iteration).
+
+        Arguments:
+        sample_id -- ordinal number of the first sample started in the
+            current chunk of data (flattened iteration only)
+
+        """
+        position = self._position
+        offset = self.reader.chunk_offset
+        if offset == position[0]:
+            position[2] += 1
+        else:
+            position[:] = offset, sample_id, 1
+        if self._skip:
+            self._skip -= 1
+            return True
+        return False
 
     def _get_assertion_results(self, elem):
         """Get assertion results from the sample and return them as a list of
@@ -153,61 +759,122 @@ class XMLParser(BaseParser):
                 'headers': response_headers}
 
     def _get_sample(self, elem, children=()):
-        """Return the sample data as an instance of Sample class.
+        """Return the sample data as an instance of Sample class. The
+        sample is built positionally, and the sub-elements are looked up
+        only if there are any.
 
         """
-        sample = {}
-        sample['all_threads'] = int(elem.get('na', 0))
-        sample['assertion_results'] = self._get_assertion_results(elem)
-        sample['bytes_received'] = int(elem.get('by', 0))
-        sample['children'] = tuple(children)
-        sample['cookies'] = self._get_cookies(elem)
-        sample['data_encoding'] = elem.get('de', '')
-        sample['data_type'] = elem.get('dt', '')
-        sample['elapsed_time'] = timedelta(milliseconds=int(elem.get('t', 0)))
-        sample['error_count'] = int(elem.get('ec', 0))
-        sample['group_threads'] = int(elem.get('ng', 0))
-        sample['hostname'] = elem.get('hn', '')
-        sample['idle_time'] = timedelta(milliseconds=int(elem.get('it', 0)))
-        sample['label'] = elem.get('lb', '')
-        sample['latency_time'] = timedelta(milliseconds=int(elem.get('lt', 0)))
-        sample['method'] = elem.findtext('method', '')
-        sample['query_string'] = elem.findtext('queryString', '')
-        sample['request_headers'] = self._get_request_headers(elem)
-        sample['response_code'] = elem.get('rc', '')
-        sample['response_data'] = elem.findtext('responseData', '')
-        sample['response_filename'] = elem.findtext('responseFile', '')
-        sample['response_headers'] = self._get_response_headers(elem)
-        sample['response_message'] = elem.get('rm', '')
-        sample['sample_count'] = int(elem.get('sc', 0))
-        sample['success'] = bool(elem.get('s') == 'true')
-        sample['tag_name'] = elem.tag
-        sample['thread_name'] = elem.get('tn', '')
-        sample['timestamp'] = datetime.utcfromtimestamp(
-                int(elem.get('ts', 0)) / 1000.0)
-        sample['url'] = elem.findtext('java.net.URL', '')
-        return Sample(**sample)
+        get = elem.get
+        get_timedelta = self._get_timedelta
+        if len(elem):
+            findtext = elem.findtext
+            assertion_results = self._get_assertion_results(elem)
+            cookies = self._get_cookies(elem)
+            method = findtext('method', '')
+            query_string = findtext('queryString', '')
+            request_headers = self._get_request_headers(elem)
+            response_data = findtext('responseData', '')
+            response_filename = findtext('responseFile', '')
+            response_headers = self._get_response_headers(elem)
+            url = findtext('java.net.URL', '')
+        else:
+            assertion_results = ()
+            cookies = {}
+            method = query_string = response_data = response_filename = \
+                    url = ''
+            request_headers = {}
+            response_headers = {'status_line': '', 'headers': {}}
+        return _new_sample((int(get('na', 0)), assertion_results,
+                int(get('by', 0)), tuple(children), cookies, get('de', ''),
+                get('dt', ''), get_timedelta(get('t')), int(get('ec', 0)),
+                int(get('ng', 0)), get('hn', ''), get_timedelta(get('it')),
+                get('lb', ''), get_timedelta(get('lt')), method,
+                query_string, request_headers, get('rc', ''), response_data,
+                response_filename, response_headers, get('rm', ''),
+                int(get('sc', 0)), get('s') == 'true', elem.tag,
+                get('tn', ''), datetime.utcfromtimestamp(
+                    int(get('ts', 0)) / 1000.0), url))
 
     def itersamples(self):
-        """Generator method which yields samples from the results.
+        """Generator method which yields samples from the results. The
+        position attribute holds the position after the last sample
+        yielded.
 
         """
-        sample_started = False
-        sample_children = []
+        stack = []
         for event, elem in self.context:
-            if event == 'start' and elem.tag == 'sample':
-                sample_started = True
-                sample_children = []
-            elif event == 'end' and elem.tag == 'httpSample':
-                sample = self._get_sample(elem)
-                if sample_started:
-                    sample_children.append(sample)
+            if elem.tag in ('httpSample', 'sample'):
+                if event == 'start':
+                    stack.append([])
                 else:
-                    yield sample
-            elif event == 'end' and elem.tag == 'sample':
-                sample = self._get_sample(elem, sample_children)
-                sample_started = False
-                yield sample
+                    children = stack.pop()
+                    if stack:
+                        stack[-1].append(self._get_sample(elem, children))
+                    elif not self._advance():
+                        yield self._get_sample(elem, children)
+            self.root.clear()
+
+    def iterbatches(self, size=1000, columnar=False):
+        """Generator method which yields samples from the results in
+        batches (lists of Sample class instances or columns, see
+        BaseParser.iterbatches). The position attribute holds the position
+        after the last batch yielded.
+
+        """
+        get_sample = self._get_sample
+        advance = self._advance
+        clear = self.root.clear
+        stack = []
+        batch = []
+        for event, elem in self.context:
+            tag = elem.tag
+            if tag == 'httpSample' or tag == 'sample':
+                if event == 'start':
+                    stack.append([])
+                else:
+                    children = stack.pop()
+                    if stack:
+                        stack[-1].append(get_sample(elem, children))
+                    elif not advance():
+                        batch.append(get_sample(elem, children))
+                        if len(batch) >= size:
+                            yield _get_columns(batch) if columnar else batch
+                            batch = []
+            clear()
+        if batch:
+            yield _get_columns(batch) if columnar else batch
+
+    def iterflat(self):
+        """Generator method which yields every sample from the results
+        (including child samples) once as an instance of FlatSample class.
+        Child samples are yielded as soon as they end and are discarded
+        from their parent element, so the memory used does not depend on
+        the number of child samples. The position attribute holds the
+        position after the last sample yielded.
+
+        """
+        stack = []
+        chunk_offset, next_id = self._position[:2]
+        chunk_id = next_id
+        for event, elem in self.context:
+            if elem.tag in ('httpSample', 'sample'):
+                if event == 'start':
+                    if not stack and \
+                            self.reader.chunk_offset != chunk_offset:
+                        chunk_offset = self.reader.chunk_offset
+                        chunk_id = next_id
+                    parent_id = stack[-1][1] if stack else None
+                    stack.append((elem, next_id, parent_id))
+                    next_id += 1
+                else:
+                    elem, sample_id, parent_id = stack.pop()
+                    if not self._advance(chunk_id):
+                        yield FlatSample(depth=len(stack),
+                                parent_id=parent_id,
+                                sample=self._get_sample(elem),
+                                sample_id=sample_id)
+                    if stack:
+                        stack[-1][0].remove(elem)
             self.root.clear()
 
 
@@ -215,6 +882,10 @@ class CSVParser(BaseParser):
     """The class that implements JTL (CSV) file parsing functionality.
 
     """
+    integer_fieldnames = frozenset(('allThreads', 'bytes', 'elapsed',
+            'ErrorCount', 'grpThreads', 'IdleTime', 'Latency', 'SampleCount',
+            'timeStamp'))
+
     def __init__(self, source, **kwargs):
         """Initialize the class.
 
@@ -229,11 +900,28 @@ class CSVParser(BaseParser):
             Hostname, IdleTime, label, Latency, responseCode,
             responseMessage, SampleCount, success, threadName,
             timeStamp, URL
+        position -- position (instance of Position class or a sequence of
+            its fields) to resume the iteration from
+        prefetch -- number of buffers read ahead in the background thread
+            (0 to read in the foreground, which is the default; ignored by
+            iterrecords method)
 
         """
         self.source = source
         self.delimiter = kwargs.get('delimiter', ',')
         self.fieldnames = kwargs.get('fieldnames', None)
+        self.prefetch = kwargs.get('prefetch', 0)
+        position = tuple(kwargs.get('position') or ()) + (0, 0)
+        self._offset, self._sample_id = position[:2]
+        self._timedeltas = {}
+
+    @property
+    def position(self):
+        """Position after the last sample yielded (instance of Position
+        class).
+
+        """
+        return Position(self._offset, self._sample_id, 0)
 
     def _get_assertion_results(self, row):
         """Get assertion results from the sample and return them as a list of
@@ -250,6 +938,131 @@ class CSVParser(BaseParser):
             assertion_results.append(AssertionResult(**fields))
         return tuple(assertion_results)
 
+    def _get_converter(self, fieldnames):
+        """Return the function which converts the row of column values to
+        an instance of Sample class. The column indexes are looked up once
+        (values of the columns missing in the file are appended to every
+        row) and the sample is built positionally; rows with unexpected
+        number of values are converted through the dictionary.
+
+        """
+        width = len(fieldnames)
+        indexes = dict((name, index) for index, name in enumerate(fieldnames))
+        tail = []
+        def index(name, default=''):
+            if name not in indexes:
+                indexes[name] = width + len(tail)
+                tail.append(default)
+            return indexes[name]
+        (all_threads, bytes_received, data_encoding, data_type, elapsed,
+                error_count, failure_message, group_threads, hostname,
+                idle_time, label, latency_time, response_code,
+                response_filename, response_message, sample_count, success,
+                thread_name, timestamp, url) = (index('allThreads', '0'),
+                index('bytes', '0'), index('Encoding'), index('dataType'),
+                index('elapsed'), index('ErrorCount', '0'),
+                index('failureMessage'), index('grpThreads', '0'),
+                index('Hostname'), index('IdleTime'), index('label'),
+                index('Latency'), index('responseCode'), index('Filename'),
+                index('responseMessage'), index('SampleCount', '0'),
+                index('success'), index('threadName'), index('timeStamp', '0'),
+                index('URL'))
+        get_sample = self._get_sample
+        get_timedelta = self._get_timedelta
+        utcfromtimestamp = datetime.utcfromtimestamp
+        def convert(values):
+            if len(values) != width:
+                return get_sample(dict(zip(fieldnames, values)))
+            row = values + tail if tail else values
+            message = row[failure_message]
+            return _new_sample((int(row[all_threads]),
+                    (AssertionResult(False, True, message, ''), )
+                        if message else (),
+                    int(row[bytes_received]), (), {}, row[data_encoding],
+                    row[data_type], get_timedelta(row[elapsed]),
+                    int(row[error_count]), int(row[group_threads]),
+                    row[hostname], get_timedelta(row[idle_time]), row[label],
+                    get_timedelta(row[latency_time]), '', '', {},
+                    row[response_code], '', row[response_filename],
+                    {'status_line': '', 'headers': {}},
+                    row[response_message], int(row[sample_count]),
+                    row[success] == 'true', '', row[thread_name],
+                    utcfromtimestamp(int(row[timestamp]) / 1000.0), row[url]))
+        return convert
+
+    def _get_batch_converter(self, fieldnames):
+        """Return the function which converts the list of rows of column
+        values to the list of Sample class instances (or to the dictionary
+        which maps Sample field names to lists of the field values, if its
+        columnar flag is set). The rows are converted column by column, so
+        the conversions run in the built-in map function instead of per
+        sample. Batches containing rows with unexpected number of values
+        are converted row by row.
+
+        """
+        width = len(fieldnames)
+        indexes = dict((name, index) for index, name in enumerate(fieldnames))
+        widths = set([width])
+        convert = self._get_converter(fieldnames)
+        get_timedelta = self._get_timedelta
+        get_cached = self._timedeltas.get
+        utcfromtimestamp = datetime.utcfromtimestamp
+        def convert_batch(rows, columnar=False):
+            if set(map(len, rows)) != widths:
+                batch = map(convert, rows)
+                return _get_columns(batch) if columnar else batch
+            size = len(rows)
+            columns = zip(*rows)
+            def strings(name, default=''):
+                index = indexes.get(name)
+                return columns[index] if index is not None else \
+                        repeat(default, size)
+            def integers(name):
+                # the counters take few distinct values in a batch, so each
+                # of them is converted once
+                index = indexes.get(name)
+                if index is None:
+                    return repeat(0, size)
+                values = dict((value, int(value))
+                        for value in set(columns[index]))
+                return map(values.__getitem__, columns[index])
+            def timedeltas(name):
+                index = indexes.get(name)
+                if index is None:
+                    return repeat(get_timedelta(None), size)
+                values = map(get_cached, columns[index])
+                if None in values:
+                    values = [get_timedelta(raw) if value is None else value
+                            for value, raw in izip(values, columns[index])]
+                return values
+            fields = (integers('allThreads'),
+                    [(AssertionResult(False, True, message, ''), )
+                        if message else ()
+                        for message in strings('failureMessage')],
+                    integers('bytes'), repeat((), size),
+                    [{} for index in xrange(size)], strings('Encoding'),
+                    strings('dataType'), timedeltas('elapsed'),
+                    integers('ErrorCount'), integers('grpThreads'),
+                    strings('Hostname'), timedeltas('IdleTime'),
+                    strings('label'), timedeltas('Latency'),
+                    repeat('', size), repeat('', size),
+                    [{} for index in xrange(size)], strings('responseCode'),
+                    repeat('', size), strings('Filename'),
+                    [{'status_line': '', 'headers': {}}
+                        for index in xrange(size)],
+                    strings('responseMessage'), integers('SampleCount'),
+                    map(operator.eq, strings('success'),
+                        repeat('true', size)),
+                    repeat('', size), strings('threadName'),
+                    map(utcfromtimestamp, map(operator.truediv,
+                        map(int, strings('timeStamp', '0')),
+                        repeat(1000.0, size))),
+                    strings('URL'))
+            if columnar:
+                return dict(zip(Sample._fields, map(list, fields)))
+            return map(_new_sample, izip(*fields))
+        return convert_batch
+
     def _get_sample(self, row):
         """Return the sample data as an instance of Sample class.
 
@@ -262,17 +1075,14 @@ class CSVParser(BaseParser):
         sample['cookies'] = {}
         sample['data_encoding'] = row.get('Encoding', '')
         sample['data_type'] = row.get('dataType', '')
-        sample['elapsed_time'] = timedelta(
-                milliseconds=int(row.get('elapsed', 0)))
+        sample['elapsed_time'] = self._get_timedelta(row.get('elapsed'))
         sample['error_count'] = int(row.get('ErrorCount', 0))
         sample['group_threads'] = int(row.get('grpThreads', 0))
         sample['hostname'] = row.get('Hostname', '')
         # workarond for JMeter's bug 53802
-        sample['idle_time'] = timedelta(
-                milliseconds=int(row.get('IdleTime') or 0))
+        sample['idle_time'] = self._get_timedelta(row.get('IdleTime'))
         sample['label'] = row.get('label', '')
-        sample['latency_time'] = timedelta(
-                milliseconds=int(row.get('Latency', 0)))
+        sample['latency_time'] = self._get_timedelta(row.get('Latency'))
         sample['method'] = ''
         sample['query_string'] = ''
         sample['request_headers'] = {}
@@ -291,14 +1101,171 @@ class CSVParser(BaseParser):
         return Sample(**sample)
 
     def itersamples(self):
-        """Generator method which yeilds samples from the results.
+        """Generator method which yeilds samples from the results. The
+        position attribute holds the position after the last sample
+        yielded.
+
+        """
+        with self._open() as fp:
+            fieldnames, reader = self._get_reader(fp)
+            convert = self._get_converter(fieldnames)
+            for values in reader:
+                if values:
+                    self._offset = fp.tell()
+                    self._sample_id += 1
+                    yield convert(values)
+
+    def iterbatches(self, size=1000, columnar=False):
+        """Generator method which yields samples from the results in
+        batches (lists of Sample class instances or columns, see
+        BaseParser.iterbatches). The position attribute holds the position
+        after the last batch yielded.
+
+        """
+        with self._open() as fp:
+            fieldnames, reader = self._get_reader(fp)
+            convert_batch = self._get_batch_converter(fieldnames)
+            reader = ifilter(None, reader)
+            while True:
+                rows = list(islice(reader, size))
+                if not rows:
+                    break
+                self._offset = fp.tell()
+                self._sample_id += len(rows)
+                yield convert_batch(rows, columnar)
+
+    def _open(self):
+        """Open the results file (for reading in the background thread if
+        prefetching is enabled).
+
+        """
+        if self.prefetch:
+            return PrefetchReader(self.source, self.prefetch)
+        return open(self.source, 'rb')
+
+    def _get_reader(self, fp):
+        """Return the fieldnames and the CSV reader for the file starting
+        from the current position (the fieldnames are read from the
+        beginning of the file when required).
+
+        """
+        fieldnames = self.fieldnames
+        if fieldnames is None:
+            fieldnames = next(csv.reader([fp.readline()],
+                    delimiter=self.delimiter), [])
+        if self._offset:
+            fp.seek(self._offset)
+        lines = fp if isinstance(fp, PrefetchReader) else iter(fp.readline,
+                '')
+        return fieldnames, csv.reader(lines, delimiter=self.delimiter)
+
+    def iterrecords(self, fieldnames=None):
+        """Generator method which yields records from the results as tuples
+        of column values. The file is memory-mapped and split into records
+        and columns on the raw data; the columns listed in
+        integer_fieldnames are converted to integers and only the requested
+        columns are extracted. Records containing quote characters are
+        handed over to the csv module. Missing values are returned as 0
+        (integer columns) or as an empty string (other columns).
+
+        Arguments:
+        fieldnames -- names of columns to be returned (all the columns of
+            the file by default)
 
         """
         with open(self.source, 'rb') as fp:
-            reader = csv.DictReader(fp, delimiter=self.delimiter,
-                    fieldnames=self.fieldnames)
-            for row in reader:
-                yield self._get_sample(row)
+            if not os.fstat(fp.fileno()).st_size:
+                return
+            data = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                for record in self._iterrecords(data, fieldnames):
+                    yield record
+            finally:
+                data.close()
+
+    def _iterrecords(self, data, fieldnames):
+        """Generator method which yields records from the memory-mapped
+        results data.
+
+        """
+        records = self._iterlines(data, 0)
+        file_fieldnames = self.fieldnames
+        if file_fieldnames is None:
+            for line in records:
+                file_fieldnames = self._split_line(line, -1)
+                break
+            else:
+                return
+        file_fieldnames = list(file_fieldnames)
+        if fieldnames is None:
+            fieldnames = file_fieldnames
+        columns = []
+        for name in fieldnames:
+            index = (file_fieldnames.index(name)
+                    if name in file_fieldnames else None)
+            columns.append((index, name in self.integer_fieldnames))
+        maxsplit = max([i for i, is_integer in columns if i is not None] or
+                [0]) + 1
+        split_line = self._split_line
+        for line in records:
+            values = split_line(line, maxsplit)
+            size = len(values)
+            record = []
+            for index, is_integer in columns:
+                value = values[index] if index is not None and \
+                        index < size else ''
+                if is_integer:
+                    value = int(value) if value else 0
+                record.append(value)
+            yield tuple(record)
+
+    def _iterlines(self, data, pos, raw=False):
+        """Generator method which yields raw lines (records) of the
+        memory-mapped results data starting from the given position. Lines
+        with unbalanced quote characters are joined with the following
+        ones. Empty lines are skipped.
+
+        Arguments:
+        data -- memory-mapped results data
+        pos -- position to start from
+        raw -- yield the lines with their line terminators
+
+        """
+        find = data.find
+        size = len(data)
+        while pos < size:
+            end = find('\n', pos)
+            if end < 0:
+                end = size
+            line = data[pos:end]
+            while line.count('"') % 2 and end < size:
+                end = find('\n', end + 1)
+                if end < 0:
+                    end = size
+                line = data[pos:end]
+            start, pos = pos, end + 1
+            if line.endswith('\r'):
+                line = line[:-1]
+            if line:
+                yield data[start:pos] if raw else line
+
+    def _split_line(self, line, maxsplit):
+        """Split the line into the list of column values. Lines containing
+        quote characters are parsed with the csv module.
+
+        """
+        if '"' in line:
+            return next(csv.reader(line.splitlines(True),
+                    delimiter=self.delimiter))
+        return line.split(self.delimiter, maxsplit)
+
+
+def _get_columns(batch):
+    """Return the batch of samples as a dictionary which maps Sample field
+    names to lists of the field values.
+
+    """
+    return dict(zip(Sample._fields, [list(column) for column in zip(*batch)]))
 
 
 def create_parser(source, **kwargs):
@@ -316,6 +1283,10 @@ def create_parser(source, **kwargs):
         Hostname, IdleTime, label, Latency, responseCode,
         responseMessage, SampleCount, success, threadName,
         timeStamp, URL
+    position -- position (instance of Position class or a sequence of its
+        fields) to resume the iteration from
+    prefetch -- number of buffers read ahead in the background thread (0
+        to read in the foreground, which is the default)
 
     """
     with open(source) as fp:
@@ -323,3 +1294,3648 @@ def create_parser(source, **kwargs):
             return XMLParser(source, **kwargs)
         else:
             return CSVParser(source, **kwargs)
+
+
+class BaseWriter(object):
+    """The base class for JTL writers.
+
+    """
+    buffer_size = 1024 * 1024
+
+    def __init__(self, target, **kwargs):
+        """Initialize the class.
+
+        Arguments:
+        target -- filename or file object to write the results data to
+
+        Keyword arguments:
+        fields -- names of Sample fields to be written (all the fields
+            supported by the format by default)
+
+        """
+        self.close_file = not hasattr(target, 'write')
+        self.fp = (open(target, 'wb', self.buffer_size) if self.close_file
+                else target)
+        self.fields = kwargs.get('fields', None)
+
+    def write(self, sample):
+        """Write the sample to the results. Must be redefined in
+        subclasses.
+
+        """
+        raise NotImplementedError
+
+    def writesamples(self, samples):
+        """Write all the samples to the results and return the number of
+        samples written.
+
+        """
+        write = self.write
+        written = 0
+        for sample in samples:
+            write(sample)
+            written += 1
+        return written
+
+    def close(self):
+        """Flush the results data and close the file (if it was opened by
+        the writer).
+
+        """
+        if self.close_file:
+            self.fp.close()
+        else:
+            self.fp.flush()
+
+
+class XMLWriter(BaseWriter):
+    """The class that implements JTL (XML) file writing functionality.
+
+    """
+    attributes = (('elapsed_time', 't'), ('idle_time', 'it'),
+            ('latency_time', 'lt'), ('timestamp', 'ts'), ('success', 's'),
+            ('label', 'lb'), ('response_code', 'rc'),
+            ('response_message', 'rm'), ('thread_name', 'tn'),
+            ('data_type', 'dt'), ('data_encoding', 'de'),
+            ('bytes_received', 'by'), ('sample_count', 'sc'),
+            ('error_count', 'ec'), ('group_threads', 'ng'),
+            ('all_threads', 'na'), ('hostname', 'hn'))
+    elements = (('response_headers', 'responseHeader'),
+            ('request_headers', 'requestHeader'),
+            ('response_data', 'responseData'),
+            ('response_filename', 'responseFile'), ('cookies', 'cookies'),
+            ('method', 'method'), ('query_string', 'queryString'),
+            ('url', 'java.net.URL'))
+
+    def __init__(self, target, **kwargs):
+        """Initialize the class and write the results header.
+
+        Arguments:
+        target -- filename or file object to write the results data to
+
+        Keyword arguments:
+        fields -- names of Sample fields to be written (all the fields by
+            default)
+        version -- version of the results format (1.2 by default)
+
+        """
+        super(XMLWriter, self).__init__(target, **kwargs)
+        fields = self.fields or Sample._fields
+        self.attributes = [(field, name) for field, name in self.attributes
+                if field in fields]
+        self.elements = [(field, name) for field, name in self.elements
+                if field in fields]
+        self.assertion_results = 'assertion_results' in fields
+        self.children = 'children' in fields
+        self.fp.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<testResults version=%s>\n' % _quote_xml(
+                kwargs.get('version', '1.2')))
+
+    def _get_value(self, sample, field):
+        """Return the value of the sample field as a string.
+
+        """
+        value = getattr(sample, field)
+        if field == 'timestamp':
+            return str(_milliseconds(value - _EPOCH))
+        elif isinstance(value, timedelta):
+            return str(_milliseconds(value))
+        elif isinstance(value, bool):
+            return 'true' if value else 'false'
+        elif field == 'cookies':
+            return '; '.join(['%s=%s' % item for item in value.items()])
+        elif field == 'request_headers':
+            return '\n'.join(['%s: %s' % item for item in value.items()])
+        elif field == 'response_headers':
+            if not value['status_line'] and not value['headers']:
+                return ''
+            return '\n'.join([value['status_line']] + ['%s: %s' % item
+                    for item in value['headers'].items()]) + '\n'
+        return _to_bytes(value)
+
+    def _get_lines(self, sample, indent):
+        """Return the list of lines representing the sample in XML.
+
+        """
+        tag = sample.tag_name or 'httpSample'
+        start = '%s<%s %s' % (indent, tag, ' '.join(['%s=%s' % (name,
+                _quote_xml(self._get_value(sample, field)))
+                for field, name in self.attributes]))
+        lines = []
+        indent += '  '
+        if self.assertion_results:
+            for result in sample.assertion_results:
+                lines.append('%s<assertionResult>' % indent)
+                lines.append('%s  <name>%s</name>' % (indent,
+                        _escape_xml(_to_bytes(result.name))))
+                lines.append('%s  <failure>%s</failure>' % (indent,
+                        'true' if result.failure else 'false'))
+                lines.append('%s  <error>%s</error>' % (indent,
+                        'true' if result.error else 'false'))
+                if result.failure_message:
+                    lines.append('%s  <failureMessage>%s</failureMessage>' %
+                            (indent, _escape_xml(_to_bytes(
+                            result.failure_message))))
+                lines.append('%s</assertionResult>' % indent)
+        if self.children:
+            for child in sample.children:
+                lines.extend(self._get_lines(child, indent))
+        for field, name in self.elements:
+            value = self._get_value(sample, field)
+            if value:
+                attributes = ('' if name == 'java.net.URL' else
+                        ' class="java.lang.String"')
+                lines.append('%s<%s%s>%s</%s>' % (indent, name, attributes,
+                        _escape_xml(value), name))
+        if not lines:
+            return [start + '/>']
+        return [start + '>'] + lines + ['%s</%s>' % (indent[:-2], tag)]
+
+    def write(self, sample):
+        """Write the sample to the results.
+
+        """
+        self.fp.write('\n'.join(self._get_lines(sample, '')) + '\n')
+
+    def close(self):
+        """Write the results footer, flush the results data and close the
+        file (if it was opened by the writer).
+
+        """
+        self.fp.write('</testResults>\n')
+        super(XMLWriter, self).close()
+
+
+class CSVWriter(BaseWriter):
+    """The class that implements JTL (CSV) file writing functionality.
+
+    """
+    columns = (('timestamp', 'timeStamp'), ('elapsed_time', 'elapsed'),
+            ('label', 'label'), ('response_code', 'responseCode'),
+            ('response_message', 'responseMessage'),
+            ('thread_name', 'threadName'), ('data_type', 'dataType'),
+            ('success', 'success'), ('assertion_results', 'failureMessage'),
+            ('bytes_received', 'bytes'), ('group_threads', 'grpThreads'),
+            ('all_threads', 'allThreads'), ('url', 'URL'),
+            ('response_filename', 'Filename'), ('latency_time', 'Latency'),
+            ('data_encoding', 'Encoding'), ('sample_count', 'SampleCount'),
+            ('error_count', 'ErrorCount'), ('hostname', 'Hostname'),
+            ('idle_time', 'IdleTime'))
+
+    def __init__(self, target, **kwargs):
+        """Initialize the class and write the fieldnames (unless disabled).
+
+        Arguments:
+        target -- filename or file object to write the results data to
+
+        Keyword arguments:
+        delimiter -- custom delimiter character
+        fields -- names of Sample fields to be written (all the fields
+            which have CSV columns by default); the columns are written in
+            the order of the fields
+        header -- write the fieldnames (True by default)
+
+        """
+        super(CSVWriter, self).__init__(target, **kwargs)
+        if self.fields is None:
+            self.columns = list(self.columns)
+        else:
+            columns = dict(self.columns)
+            self.columns = [(field, columns[field]) for field in self.fields
+                    if field in columns]
+        self.writer = csv.writer(self.fp,
+                delimiter=kwargs.get('delimiter', ','), lineterminator='\n')
+        if kwargs.get('header', True):
+            self.writer.writerow([name for field, name in self.columns])
+
+    def _get_row(self, sample):
+        """Return the list of column values of the sample.
+
+        """
+        row = []
+        for field, name in self.columns:
+            value = getattr(sample, field)
+            if field == 'timestamp':
+                value = _milliseconds(value - _EPOCH)
+            elif isinstance(value, timedelta):
+                value = _milliseconds(value)
+            elif isinstance(value, bool):
+                value = 'true' if value else 'false'
+            elif field == 'assertion_results':
+                value = _to_bytes(next((result.failure_message
+                        for result in value if result.failure_message), ''))
+            else:
+                value = _to_bytes(value)
+            row.append(value)
+        return row
+
+    def write(self, sample):
+        """Write the sample to the results.
+
+        """
+        self.writer.writerow(self._get_row(sample))
+
+
+def convert(source, target, format=None, fields=None, **kwargs):
+    """The function that converts the results file to another format (and
+    optionally drops some of the fields) in a single streaming pass.
+    Return the number of samples written.
+
+    Arguments:
+    source -- name of the file containing the results data
+    target -- filename or file object to write the results data to
+    format -- format of the results written: csv or xml (determined by
+        the target extension by default)
+    fields -- names of Sample fields to be written (all the fields by
+        default)
+
+    Keyword arguments are passed to the parser (see create_parser).
+
+    """
+    if format is None:
+        format = ('xml' if isinstance(target, basestring) and
+                target.lower().endswith('.xml') else 'csv')
+    writer_class = {'csv': CSVWriter, 'xml': XMLWriter}[format]
+    parser = create_parser(source, **kwargs)
+    writer = writer_class(target, fields=fields)
+    try:
+        return writer.writesamples(parser.itersamples())
+    finally:
+        writer.close()
+
+
+_SPLIT_FIELDS = {'hostname': ('Hostname', 'hn'), 'label': ('label', 'lb'),
+        'timestamp': ('timeStamp', 'ts')}
+
+
+def split(source, target, by='label', interval=3600, max_open=256,
+        **kwargs):
+    """The function that splits the results file into multiple files (one
+    per label, host or time interval) in a single streaming pass. The
+    original CSV lines or XML sample elements are copied byte for byte
+    (along with the CSV header or the XML prolog), and only the field the
+    file is split by is parsed. Return the dictionary which maps the
+    values of the field (or the starts of the time intervals as instances
+    of datetime class) to the names of files written.
+
+    Arguments:
+    source -- name of the file containing the results data
+    target -- directory to write the files to (the files are named after
+        the source file and the values of the field)
+    by -- field to split the file by: label, hostname or timestamp
+    interval -- length of the time intervals in seconds (when splitting
+        by timestamp)
+    max_open -- maximum number of the files kept open at once
+
+    Keyword arguments:
+    delimiter -- custom delimiter character (CSV only)
+    fieldnames -- names of columns (CSV without fieldnames only)
+
+    """
+    if by not in _SPLIT_FIELDS:
+        raise ValueError('Cannot split results by %s' % by)
+    if not os.path.isdir(target):
+        os.makedirs(target)
+    name, extension = os.path.splitext(os.path.basename(source))
+    if by == 'timestamp':
+        interval *= 1000
+        get_key = lambda value: (int(value) - int(value) % interval
+                if value else None)
+    else:
+        get_key = lambda value: value
+    shards = _Shards(os.path.join(target, name), extension, max_open)
+    try:
+        with open(source, 'rb') as fp:
+            xml = fp.readline().startswith('<?xml')
+        if xml:
+            _split_xml(source, shards, _SPLIT_FIELDS[by][1], get_key)
+        else:
+            _split_csv(CSVParser(source, **kwargs), shards,
+                    _SPLIT_FIELDS[by][0], get_key)
+    finally:
+        shards.close()
+    if by == 'timestamp':
+        return dict((key if key is None else
+                datetime.utcfromtimestamp(key / 1000.0), filename)
+                for key, filename in shards.filenames.iteritems())
+    return shards.filenames
+
+
+def _split_csv(parser, shards, field, get_key):
+    """Split the CSV results file line by line.
+
+    """
+    with open(parser.source, 'rb') as fp:
+        if not os.fstat(fp.fileno()).st_size:
+            return
+        data = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            lines = parser._iterlines(data, 0, raw=True)
+            fieldnames = parser.fieldnames
+            if fieldnames is None:
+                for line in lines:
+                    shards.header = line
+                    fieldnames = parser._split_line(line.rstrip('\r\n'), -1)
+                    break
+                else:
+                    return
+            index = list(fieldnames).index(field)
+            split_line = parser._split_line
+            write = shards.write
+            for line in lines:
+                values = split_line(line.rstrip('\r\n'), index + 1)
+                write(get_key(values[index] if index < len(values)
+                        else ''), line)
+        finally:
+            data.close()
+
+
+def _split_xml(source, shards, attribute, get_key):
+    """Split the XML results file into top level sample elements (each
+    one with the whitespace preceding it).
+
+    """
+    reader = _XMLReader(source)
+    shards.header = reader.read()
+    value_pattern = re.compile(r'\s%s="([^"]*)"' % attribute)
+    sample_tag = reader.sample_tag
+    write = shards.write
+    data = ''
+    depth = 0
+    while True:
+        chunk = reader.read()
+        if not chunk:
+            break
+        data += chunk
+        start = 0
+        for match in sample_tag.finditer(data):
+            closing, empty = match.groups()
+            if closing:
+                depth -= 1
+            elif not depth:
+                tag = match.group()
+                if not empty:
+                    depth += 1
+            elif not empty:
+                depth += 1
+            if not depth:
+                value = value_pattern.search(tag)
+                write(get_key(_unescape_xml(value.group(1)) if value
+                        else ''), data[start:match.end()])
+                start = match.end()
+        data = data[start:]
+    shards.footer = data
+
+
+def _unescape_xml(value):
+    """Replace the XML entities in the attribute value.
+
+    """
+    return re.sub(r'&(#x[0-9a-fA-F]+|#[0-9]+|\w+);', _unescape_entity,
+            value)
+
+
+def _unescape_entity(match):
+    name = match.group(1)
+    if name.startswith('#x'):
+        return _to_bytes(unichr(int(name[2:], 16)))
+    if name.startswith('#'):
+        return _to_bytes(unichr(int(name[1:])))
+    return {'amp': '&', 'apos': "'", 'gt': '>', 'lt': '<',
+            'quot': '"'}.get(name, match.group())
+
+
+class _Shards(object):
+    """The class that writes data to multiple files, keeping at most
+    max_open of them open (the least recently used files are closed and
+    reopened for appending when needed).
+
+    """
+    buffer_size = 64 * 1024
+
+    def __init__(self, prefix, extension, max_open):
+        self.prefix = prefix
+        self.extension = extension
+        self.max_open = max(max_open, 1)
+        self.header = ''
+        self.footer = ''
+        self.filenames = {}
+        self.names = set()
+        self.files = OrderedDict()
+
+    def _get_filename(self, key):
+        """Return the unique filename for the key.
+
+        """
+        if key is None:
+            name = 'none'
+        elif isinstance(key, (int, long)):
+            name = datetime.utcfromtimestamp(key / 1000.0).strftime(
+                    '%Y%m%d-%H%M%S')
+        else:
+            name = re.sub(r'[^\w.-]', '_', _to_bytes(key)) or '_'
+        unique_name = name
+        for number in count(2):
+            if unique_name not in self.names:
+                break
+            unique_name = '%s-%d' % (name, number)
+        self.names.add(unique_name)
+        return '%s-%s%s' % (self.prefix, unique_name, self.extension)
+
+    def write(self, key, data):
+        fp = self.files.pop(key, None)
+        if fp is None:
+            if len(self.files) >= self.max_open:
+                self.files.popitem(last=False)[1].close()
+            filename = self.filenames.get(key)
+            if filename is None:
+                filename = self.filenames[key] = self._get_filename(key)
+                fp = open(filename, 'wb', self.buffer_size)
+                fp.write(self.header)
+            else:
+                fp = open(filename, 'ab', self.buffer_size)
+        self.files[key] = fp
+        fp.write(data)
+
+    def close(self):
+        """Write the footer to all the files and close them.
+
+        """
+        for key, filename in self.filenames.iteritems():
+            fp = self.files.pop(key, None) or open(filename, 'ab')
+            fp.write(self.footer)
+            fp.close()
+
+
+def _to_bytes(value):
+    """Return the value as a string encoded in UTF-8.
+
+    """
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    return str(value)
+
+
+def _escape_xml(value):
+    """Return the string with XML special characters (and carriage returns,
+    which would be normalized by XML parsers otherwise) escaped.
+
+    """
+    return value.replace('&', '&amp;').replace('<', '&lt;').replace(
+            '>', '&gt;').replace('"', '&quot;').replace("'", '&apos;').replace(
+            '\r', '&#13;')
+
+
+def _quote_xml(value):
+    """Return the string escaped and quoted as an XML attribute value.
+
+    """
+    return '"%s"' % _escape_xml(value).replace('\n', '&#10;').replace(
+            '\t', '&#9;')
+
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _milliseconds(delta):
+    """Return the timedelta value rounded to milliseconds.
+
+    """
+    return ((delta.days * 86400 + delta.seconds) * 1000 +
+            (delta.microseconds + 500) // 1000)
+
+
+def itersorted(samples, run_size=100000, temp_dir=None):
+    """Generator function that yields the samples ordered by their
+    timestamps (samples with equal timestamps keep their order). Samples
+    are sorted in runs of at most run_size samples; when there is more
+    than one run, the sorted runs are spilled to temporary files (sample
+    by sample, as pickled tuples of plain field values) and merged, so
+    only one sample per run is kept in memory while merging.
+
+    Arguments:
+    samples -- iterable of Sample class instances (e.g. the result of
+        parser's itersamples method)
+    run_size -- maximum number of samples kept in memory while sorting
+    temp_dir -- directory for the temporary files (the system default
+        by default)
+
+    """
+    runs = []
+    try:
+        samples = iter(samples)
+        while True:
+            run = list(islice(samples, run_size))
+            run.sort(key=operator.attrgetter('timestamp'))
+            if not runs and len(run) < run_size:
+                for sample in run:
+                    yield sample
+                return
+            if not run:
+                break
+            fp = tempfile.TemporaryFile(dir=temp_dir)
+            runs.append(fp)
+            pickler = cPickle.Pickler(fp, cPickle.HIGHEST_PROTOCOL)
+            for sample in run:
+                pickler.dump(_pack_sample(sample))
+                # the memo would keep every sample of the run referenced
+                # by the unpickler while merging
+                pickler.clear_memo()
+            del run
+            fp.seek(0)
+        for item in heapq.merge(*[_iterrun(fp, index)
+                for index, fp in enumerate(runs)]):
+            yield item[-1]
+    finally:
+        for fp in runs:
+            fp.close()
+
+
+def _iterrun(fp, index):
+    """Generator function that yields the samples of the sorted run from
+    the temporary file decorated with the keys for merging.
+
+    """
+    load = cPickle.Unpickler(fp).load
+    for position in count():
+        try:
+            sample = _unpack_sample(load())
+        except EOFError:
+            return
+        yield sample.timestamp, index, position, sample
+
+
+_TIME_FIELDS = tuple(Sample._fields.index(field)
+        for field in ('elapsed_time', 'idle_time', 'latency_time'))
+_TIMESTAMP_FIELD = Sample._fields.index('timestamp')
+_ASSERTION_RESULTS_FIELD = Sample._fields.index('assertion_results')
+_CHILDREN_FIELD = Sample._fields.index('children')
+
+
+def _microseconds(delta):
+    """Return the timedelta value in microseconds.
+
+    """
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+
+def _pack_sample(sample):
+    """Return the sample as a tuple of plain values (time values in
+    microseconds), which is pickled without references to the classes.
+
+    """
+    values = list(sample)
+    for index in _TIME_FIELDS:
+        if values[index] is not None:
+            values[index] = _microseconds(values[index])
+    if values[_TIMESTAMP_FIELD] is not None:
+        values[_TIMESTAMP_FIELD] = _microseconds(values[_TIMESTAMP_FIELD] -
+                _EPOCH)
+    if values[_ASSERTION_RESULTS_FIELD]:
+        values[_ASSERTION_RESULTS_FIELD] = tuple(tuple(result)
+                for result in values[_ASSERTION_RESULTS_FIELD])
+    if values[_CHILDREN_FIELD]:
+        values[_CHILDREN_FIELD] = tuple(_pack_sample(child)
+                for child in values[_CHILDREN_FIELD])
+    return tuple(values)
+
+
+def _unpack_sample(values):
+    """Return the sample from the tuple returned by _pack_sample.
+
+    """
+    values = list(values)
+    for index in _TIME_FIELDS:
+        if values[index] is not None:
+            values[index] = timedelta(microseconds=values[index])
+    if values[_TIMESTAMP_FIELD] is not None:
+        values[_TIMESTAMP_FIELD] = _EPOCH + timedelta(
+                microseconds=values[_TIMESTAMP_FIELD])
+    if values[_ASSERTION_RESULTS_FIELD]:
+        values[_ASSERTION_RESULTS_FIELD] = tuple(AssertionResult(*result)
+                for result in values[_ASSERTION_RESULTS_FIELD])
+    if values[_CHILDREN_FIELD]:
+        values[_CHILDREN_FIELD] = tuple(_unpack_sample(child)
+                for child in values[_CHILDREN_FIELD])
+    return Sample(*values)
+
+
+def concurrency(samples, by=None):
+    """The function that reconstructs the concurrency timeline from the
+    samples: each sample is treated as a request in flight from its
+    timestamp till its timestamp plus elapsed time. The timeline is
+    computed with a single sweep over the sorted request start and end
+    events, which are packed into integers so that sorting does not
+    create any per-event objects.
+
+    Return a dictionary which maps the values of the grouping field (or
+    None, when no grouping is requested) to the lists of ConcurrencyPoint
+    class instances, one per change of the values.
+
+    Arguments:
+    samples -- iterable of Sample class instances (e.g. the result of
+        parser's itersamples method)
+    by -- name of the Sample field to group the samples by (e.g. label
+        or hostname)
+
+    """
+    threads = {}
+    groups = {}
+    base = None
+    for sample in samples:
+        start = _milliseconds(sample.timestamp - _EPOCH)
+        if base is None:
+            base = start
+        start -= base
+        end = start + _milliseconds(sample.elapsed_time)
+        thread = threads.setdefault((sample.hostname, sample.thread_name),
+                len(threads))
+        events = groups.setdefault(getattr(sample, by) if by else None, [])
+        # end events go before start events of the same millisecond
+        events.append((start * 2 + 1) << 24 | thread)
+        events.append((end * 2) << 24 | thread)
+    timelines = {}
+    for key, events in groups.iteritems():
+        events.sort()
+        timelines[key] = _sweep(events, base)
+    return timelines
+
+
+def _sweep(events, base):
+    """Return the concurrency timeline for the sorted list of packed
+    request start and end events.
+
+    """
+    timeline = []
+    thread_requests = {}
+    requests = threads = 0
+    last_time = None
+    for event in events:
+        time, start = divmod(event >> 24, 2)
+        if time != last_time and last_time is not None:
+            _append_point(timeline, requests, threads, last_time + base)
+        last_time = time
+        thread = event & 0xffffff
+        count = thread_requests.get(thread, 0)
+        if start:
+            requests += 1
+            thread_requests[thread] = count + 1
+            threads += not count
+        else:
+            requests -= 1
+            thread_requests[thread] = count - 1
+            threads -= count == 1
+    if last_time is not None:
+        _append_point(timeline, requests, threads, last_time + base)
+    return timeline
+
+
+def _append_point(timeline, requests, threads, time):
+    """Append the point to the concurrency timeline if the values have
+    changed.
+
+    """
+    if not timeline or timeline[-1][:2] != (requests, threads):
+        timeline.append(ConcurrencyPoint(requests=requests, threads=threads,
+                timestamp=datetime.utcfromtimestamp(time / 1000.0)))
+
+
+def itersessions(samples, marker=None, window=10, timeout=None):
+    """Generator function that reconstructs virtual user sessions from the
+    samples grouped by host and thread, and yields the summaries of the
+    iterations and sessions (instances of SessionSummary class) as soon
+    as they are closed. The samples completing out of order are reordered
+    by their timestamps within the reordering window (the samples delayed
+    more than that are processed as they come).
+
+    Arguments:
+    samples -- iterable of Sample class instances (e.g. the result of
+        parser's itersamples method)
+    marker -- label of the sample starting every iteration (the whole
+        session is the single iteration by default)
+    window -- length of the reordering window in seconds
+    timeout -- time in seconds the thread has to be idle for its session
+        to be closed (sessions are only closed at the end of the samples
+        by default)
+
+    """
+    pending = []
+    sessions = {}
+    latest = checked = None
+    window *= 1000
+    counter = count()
+    for sample in samples:
+        start = _milliseconds(sample.timestamp - _EPOCH)
+        heapq.heappush(pending, (start, next(counter), sample))
+        if latest is None or start > latest:
+            latest = start
+        while pending and pending[0][0] <= latest - window:
+            for summary in _add_to_session(sessions,
+                    heapq.heappop(pending)[2], marker):
+                yield summary
+        if timeout and latest - window >= (checked or 0) + timeout * 1000:
+            checked = latest - window
+            for key in sorted(sessions,
+                    key=lambda key: sessions[key][0].start):
+                if sessions[key][0].end < checked - timeout * 1000:
+                    for summary in _close_session(sessions.pop(key)):
+                        yield summary
+    while pending:
+        for summary in _add_to_session(sessions, heapq.heappop(pending)[2],
+                marker):
+            yield summary
+    for key in sorted(sessions, key=lambda key: sessions[key][0].start):
+        for summary in _close_session(sessions.pop(key)):
+            yield summary
+
+
+class _SessionPart(object):
+    """The class that accumulates the summary of the session or its
+    iteration (times in milliseconds).
+
+    """
+    def __init__(self, sample, start, iteration):
+        self.hostname = sample.hostname
+        self.thread_name = sample.thread_name
+        self.iteration = iteration
+        self.start = start
+        self.end = start
+        self.samples = 0
+        self.errors = 0
+        self.elapsed = 0
+        self.idle = 0
+        self.think = 0
+
+    def add(self, start, elapsed, idle, success):
+        if self.samples:
+            self.think += max(start - self.end, 0)
+        self.samples += 1
+        self.errors += not success
+        self.elapsed += elapsed
+        self.idle += idle
+        self.end = max(self.end, start + elapsed)
+
+    def summary(self):
+        return SessionSummary(
+                duration=timedelta(milliseconds=self.end - self.start),
+                elapsed_time=timedelta(milliseconds=self.elapsed),
+                end=datetime.utcfromtimestamp(self.end / 1000.0),
+                errors=self.errors,
+                hostname=self.hostname,
+                idle_time=timedelta(milliseconds=self.idle),
+                iteration=self.iteration,
+                samples=self.samples,
+                start=datetime.utcfromtimestamp(self.start / 1000.0),
+                think_time=timedelta(milliseconds=self.think),
+                thread_name=self.thread_name,
+                )
+
+
+def _add_to_session(sessions, sample, marker):
+    """Add the sample to its session and return the list of summaries of
+    the iterations closed.
+
+    """
+    start = _milliseconds(sample.timestamp - _EPOCH)
+    values = (start, _milliseconds(sample.elapsed_time),
+            _milliseconds(sample.idle_time), sample.success)
+    key = (sample.hostname, sample.thread_name)
+    closed = []
+    parts = sessions.get(key)
+    if parts is None:
+        parts = sessions[key] = [_SessionPart(sample, start, None),
+                _SessionPart(sample, start, 1)]
+    elif marker is not None and sample.label == marker and parts[1].samples:
+        closed.append(parts[1].summary())
+        parts[1] = _SessionPart(sample, start, parts[1].iteration + 1)
+    for part in parts:
+        part.add(*values)
+    return closed
+
+
+def _close_session(parts):
+    """Return the summaries of the last iteration and the whole session.
+
+    """
+    return [parts[1].summary(), parts[0].summary()]
+
+
+class LatencySketch(object):
+    """The class that implements the mergeable sketch of the latency
+    distribution. Values are counted in logarithmically sized buckets, so
+    percentiles are estimated with the given relative accuracy, and the
+    memory used only grows with the logarithm of the values range.
+
+    """
+    def __init__(self, accuracy=0.01):
+        """Initialize the class.
+
+        Arguments:
+        accuracy -- relative accuracy of the percentiles estimation
+
+        """
+        self.accuracy = accuracy
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.buckets = {}
+        self.zero_count = 0
+        self.count = 0
+        self.min = None
+        self.max = None
+
+    def add(self, value, count=1):
+        """Add the value (e.g. elapsed time in milliseconds) to the sketch.
+
+        """
+        if value > 0:
+            index = int(math.ceil(math.log(value) / self.log_gamma))
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        else:
+            self.zero_count += count
+        self.count += count
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        """Merge the other sketch (with the same accuracy) into this one.
+
+        """
+        if other.accuracy != self.accuracy:
+            raise ValueError('Cannot merge sketches with different accuracy')
+        for index, count in other.buckets.iteritems():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        for value in (other.min, other.max):
+            if value is not None:
+                if self.min is None or value < self.min:
+                    self.min = value
+                if self.max is None or value > self.max:
+                    self.max = value
+
+    def percentile(self, percent):
+        """Return the estimated percentile of the values (the value below
+        or equal to which the given percent of the values falls), or None
+        if the sketch is empty.
+
+        """
+        if not self.count:
+            return None
+        rank = max(int(math.ceil(percent / 100.0 * self.count)), 1)
+        if rank <= self.zero_count:
+            return max(self.min, 0)
+        rank -= self.zero_count
+        for index in sorted(self.buckets):
+            rank -= self.buckets[index]
+            if rank <= 0:
+                value = 2 * self.gamma ** index / (self.gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+
+class ExactHistogram(object):
+    """The class that counts the occurrences of every value (e.g. elapsed
+    time in integer milliseconds) for exact percentiles. The memory used
+    only grows with the number of distinct values, not with the number
+    of values. It has the same interface as LatencySketch class (the
+    values are the bucket indexes), so it is used in its place when
+    exact percentiles are requested.
+
+    """
+    accuracy = None
+
+    def __init__(self):
+        self.buckets = {}
+        self.zero_count = 0
+        self.count = 0
+        self.min = None
+        self.max = None
+
+    def add(self, value, count=1):
+        """Add the value to the histogram.
+
+        """
+        self.buckets[value] = self.buckets.get(value, 0) + count
+        self.count += count
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        """Merge the other histogram into this one.
+
+        """
+        if other.accuracy is not None:
+            raise ValueError('Cannot merge sketch into exact histogram')
+        for value, count in other.buckets.iteritems():
+            self.buckets[value] = self.buckets.get(value, 0) + count
+        self.count += other.count
+        for value in (other.min, other.max):
+            if value is not None:
+                if self.min is None or value < self.min:
+                    self.min = value
+                if self.max is None or value > self.max:
+                    self.max = value
+
+    def percentile(self, percent):
+        """Return the exact percentile of the values (the smallest value
+        below or equal to which the given percent of the values falls), or
+        None if the histogram is empty.
+
+        """
+        if not self.count:
+            return None
+        rank = max(int(math.ceil(percent / 100.0 * self.count)), 1)
+        for value in sorted(self.buckets):
+            rank -= self.buckets[value]
+            if rank <= 0:
+                return value
+        return self.max
+
+
+def _create_sketch(accuracy):
+    """Return the new latency sketch with the given accuracy (or the exact
+    histogram if accuracy is None).
+
+    """
+    if accuracy is None:
+        return ExactHistogram()
+    return LatencySketch(accuracy)
+
+
+class _LabelSummary(object):
+    """The class that accumulates aggregate report values for the single
+    label.
+
+    """
+    def __init__(self, accuracy):
+        self.samples = 0
+        self.errors = 0
+        self.elapsed = 0
+        self.received = 0
+        self.start = None
+        self.end = None
+        self.sketch = _create_sketch(accuracy)
+
+    def add(self, elapsed, start, success, received):
+        self.samples += 1
+        self.errors += not success
+        self.elapsed += elapsed
+        self.received += received
+        if self.start is None or start < self.start:
+            self.start = start
+        if self.end is None or start + elapsed > self.end:
+            self.end = start + elapsed
+        self.sketch.add(elapsed)
+
+    def merge(self, other):
+        self.samples += other.samples
+        self.errors += other.errors
+        self.elapsed += other.elapsed
+        self.received += other.received
+        if other.start is not None:
+            self.start = (other.start if self.start is None else
+                    min(self.start, other.start))
+            self.end = (other.end if self.end is None else
+                    max(self.end, other.end))
+        self.sketch.merge(other.sketch)
+
+    def row(self, label):
+        duration = ((self.end - self.start) / 1000.0
+                if self.samples and self.end > self.start else 0)
+        sketch = self.sketch
+        return SummaryRow(
+                average=(float(self.elapsed) / self.samples
+                    if self.samples else None),
+                error_rate=(float(self.errors) / self.samples
+                    if self.samples else None),
+                label=label,
+                max=sketch.max,
+                median=sketch.percentile(50),
+                min=sketch.min,
+                p90=sketch.percentile(90),
+                p95=sketch.percentile(95),
+                p99=sketch.percentile(99),
+                received_rate=(self.received / 1024.0 / duration
+                    if duration else 0),
+                samples=self.samples,
+                throughput=self.samples / duration if duration else 0,
+                )
+
+
+class Summary(object):
+    """The class that computes the aggregate report (samples count,
+    average, median, percentiles, minimum and maximum of elapsed time,
+    error rate, throughput and received data rate) per label. Summaries
+    of separate results files (or their parts) can be merged.
+
+    """
+    def __init__(self, accuracy=0.01):
+        """Initialize the class.
+
+        Arguments:
+        accuracy -- relative accuracy of the percentiles estimation (None
+            for exact percentiles)
+
+        """
+        self.accuracy = accuracy
+        self.labels = {}
+        self.total = _LabelSummary(accuracy)
+
+    def add(self, sample):
+        """Add the sample to the summary.
+
+        """
+        label_summary = self.labels.get(sample.label)
+        if label_summary is None:
+            label_summary = self.labels[sample.label] = _LabelSummary(
+                    self.accuracy)
+        values = (_milliseconds(sample.elapsed_time),
+                _milliseconds(sample.timestamp - _EPOCH), sample.success,
+                sample.bytes_received)
+        label_summary.add(*values)
+        self.total.add(*values)
+
+    def update(self, samples):
+        """Add all the samples to the summary and return the summary.
+
+        """
+        add = self.add
+        for sample in samples:
+            add(sample)
+        return self
+
+    def merge(self, other):
+        """Merge the other summary into this one and return this summary.
+
+        """
+        for label, other_summary in other.labels.iteritems():
+            label_summary = self.labels.get(label)
+            if label_summary is None:
+                label_summary = self.labels[label] = _LabelSummary(
+                        self.accuracy)
+            label_summary.merge(other_summary)
+        self.total.merge(other.total)
+        return self
+
+    def rows(self):
+        """Return the aggregate report as a list of SummaryRow class
+        instances: one per label (sorted by label) followed by the total
+        row.
+
+        """
+        return [self.labels[label].row(label)
+                for label in sorted(self.labels)] + [self.total.row(None)]
+
+
+def summarize(source, cache=False, accuracy=0.01, growing=False,
+        **kwargs):
+    """The function that returns the aggregate report of the results file
+    (instance of Summary class), optionally reusing the cached report of
+    the part of the file processed before, so only the data appended since
+    then are parsed. The cache is saved along with the position and
+    identity of the file (device, inode and checksum of the data before
+    the position), and discarded when the file is replaced or rewritten.
+    Failures to save the cache are ignored.
+
+    Arguments:
+    source -- name of the file containing the results data
+    cache -- name of the cache file, True to save it alongside the results
+        file (with .summary extension added) or False to disable caching
+    accuracy -- relative accuracy of the percentiles estimation (None for
+        exact percentiles)
+    growing -- the file is still being written: incomplete last line of
+        the CSV file or incomplete last sample of the XML file is left for
+        the next call
+
+    Keyword arguments are passed to the parser (see create_parser
+    function).
+
+    """
+    if cache is True:
+        cache = source + '.summary'
+    state = _load_summary(cache, source, accuracy) if cache else None
+    summary, position = state or (Summary(accuracy), None)
+    kwargs.pop('position', None)
+    for sample, position in _itercomplete(source, position, growing,
+            **kwargs):
+        summary.add(sample)
+    if cache and position is not None:
+        try:
+            _save_summary(cache, source, summary, position)
+        except EnvironmentError:
+            pass
+    return summary
+
+
+_TRUNCATED_XML_ERRORS = ('no element found', 'unclosed token',
+        'partial character')
+
+
+def _itercomplete(source, position=None, growing=False, **kwargs):
+    """Iterate over the samples of the file, yielding the tuples of the
+    sample and the position after it. If the file is still growing,
+    incomplete last line of the CSV file or incomplete last sample of the
+    XML file is not yielded (other errors are raised).
+
+    """
+    parser = create_parser(source, position=position, **kwargs)
+    if not growing:
+        for sample in parser.itersamples():
+            yield sample, parser.position
+        return
+    with open(source, 'rb') as fp:
+        fp.seek(0, os.SEEK_END)
+        size = fp.tell()
+        fp.seek(max(size - 65536, 0))
+        tail = fp.read()
+    end = size - len(tail) + tail.rfind('\n') + 1
+    csv_file = isinstance(parser, CSVParser)
+    try:
+        for sample in parser.itersamples():
+            if csv_file and parser.position.offset > end:
+                break
+            yield sample, parser.position
+    except SyntaxError as error:
+        if csv_file or not str(error).startswith(_TRUNCATED_XML_ERRORS):
+            raise
+
+
+def follow(source, interval=1, timeout=None, position=None, **kwargs):
+    """The generator that yields samples of the results file as they are
+    written (like tail -f), checking the file for new data every interval
+    seconds. Incomplete last line of the CSV file or incomplete last
+    sample of the XML file is yielded once it is written completely.
+
+    Arguments:
+    source -- name of the file containing the results data
+    interval -- time between checks of the file in seconds
+    timeout -- time in seconds without new samples after which the
+        iteration stops (None to follow the file forever)
+    position -- position (instance of Position class or a sequence of its
+        fields) to resume the iteration from
+
+    Keyword arguments are passed to the parser (see create_parser
+    function).
+
+    """
+    updated = time.time()
+    while True:
+        found = False
+        if _has_header(source):
+            for sample, position in _itercomplete(source, position, True,
+                    **kwargs):
+                found = True
+                yield sample
+        if found:
+            updated = time.time()
+        elif timeout is not None and time.time() - updated >= timeout:
+            return
+        time.sleep(interval)
+
+
+def _has_header(source):
+    """Check whether the first line of the file (needed to determine the
+    format) has been written completely.
+
+    """
+    try:
+        with open(source, 'rb') as fp:
+            return fp.readline().endswith('\n')
+    except IOError:
+        return False
+
+
+def _get_identity(source, offset):
+    """Return the identity of the results file: device and inode numbers
+    and checksum of the data before the offset.
+
+    """
+    with open(source, 'rb') as fp:
+        stat = os.fstat(fp.fileno())
+        fp.seek(max(offset - 4096, 0))
+        data = fp.read(min(offset, 4096))
+    return (stat.st_dev, stat.st_ino, hashlib.md5(data).hexdigest())
+
+
+def _load_summary(cache, source, accuracy):
+    """Return the cached summary and position of the results file, or None
+    if the cache is missing, malformed or does not match the file.
+
+    """
+    # unpickling and reading the malformed state may raise almost anything
+    try:
+        with open(cache, 'rb') as fp:
+            state = cPickle.load(fp)
+        position = Position(*state['position'])
+        if (state.get('version') != 1 or state['accuracy'] != accuracy or
+                os.path.getsize(source) < position.offset or
+                _get_identity(source, position.offset) != state['identity']):
+            return None
+        summary = Summary(accuracy)
+        for label, label_state in state['labels'].iteritems():
+            summary.labels[label] = _load_label_summary(label_state,
+                    accuracy)
+        summary.total = _load_label_summary(state['total'], accuracy)
+    except Exception:
+        return None
+    return summary, position
+
+
+def _load_label_summary(state, accuracy):
+    label_summary = _LabelSummary(accuracy)
+    label_summary.__dict__.update(state, sketch=label_summary.sketch)
+    label_summary.sketch.__dict__.update(state['sketch'])
+    return label_summary
+
+
+def _dump_label_summary(label_summary):
+    return dict(vars(label_summary), sketch=vars(label_summary.sketch))
+
+
+def _save_summary(cache, source, summary, position):
+    """Save the summary (as plain data, so it does not depend on the module
+    name) and position of the results file to the cache. The cache is
+    written to the temporary file first and renamed, so it is never left
+    partially written.
+
+    """
+    state = {'accuracy': summary.accuracy,
+            'identity': _get_identity(source, position.offset),
+            'labels': dict((label, _dump_label_summary(label_summary))
+                for label, label_summary in summary.labels.iteritems()),
+            'position': tuple(position),
+            'total': _dump_label_summary(summary.total), 'version': 1}
+    temp = '%s.%d.tmp' % (cache, os.getpid())
+    with open(temp, 'wb') as fp:
+        cPickle.dump(state, fp, cPickle.HIGHEST_PROTOCOL)
+    try:
+        os.rename(temp, cache)
+    except OSError:
+        os.remove(cache)
+        os.rename(temp, cache)
+
+
+def compare(baseline, candidate, percent=95, threshold=0.1,
+        error_threshold=0.01, alpha=0.05, jobs=None, accuracy=0.01,
+        **kwargs):
+    """The function that compares the candidate run with the baseline run
+    per label. The results files of both runs are summarized in parallel
+    processes into mergeable aggregate reports, so only the latency
+    sketches and counters are kept in memory. Return the list of
+    ComparisonRow class instances: one per label (sorted by label)
+    followed by the total row.
+
+    The label is regressed when the compared percentile of elapsed time
+    increased by more than threshold and elapsed time is significantly
+    higher (by the Mann-Whitney U test computed over the sketches
+    buckets), or when the error rate increased by more than
+    error_threshold and significantly.
+
+    Arguments:
+    baseline -- name of the results file of the baseline run (or list of
+        names of the files)
+    candidate -- name of the results file of the candidate run (or list
+        of names of the files)
+    percent -- percentile of elapsed time to compare
+    threshold -- maximum relative increase of the percentile
+    error_threshold -- maximum absolute increase of the error rate
+    alpha -- significance level of the tests
+    jobs -- number of processes (the number of CPUs by default)
+    accuracy -- relative accuracy of the percentiles estimation (None for
+        exact percentiles)
+
+    Keyword arguments are passed to the parser (see create_parser
+    function).
+
+    """
+    runs = [[baseline] if isinstance(baseline, basestring) else baseline,
+            [candidate] if isinstance(candidate, basestring) else candidate]
+    tasks = [(filename, accuracy, kwargs) for filenames in runs
+            for filename in filenames]
+    jobs = min(jobs or multiprocessing.cpu_count(), len(tasks))
+    if jobs > 1:
+        pool = multiprocessing.Pool(jobs)
+        try:
+            summaries = pool.map(_summarize_file, tasks)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        summaries = map(_summarize_file, tasks)
+    baseline_summary = reduce(Summary.merge, summaries[:len(runs[0])])
+    candidate_summary = reduce(Summary.merge, summaries[len(runs[0]):])
+    labels = sorted(set(baseline_summary.labels) |
+            set(candidate_summary.labels))
+    rows = []
+    for label in labels + [None]:
+        if label is None:
+            old, new = baseline_summary.total, candidate_summary.total
+        else:
+            old = baseline_summary.labels.get(label)
+            new = candidate_summary.labels.get(label)
+        old_value = old and old.sketch.percentile(percent)
+        new_value = new and new.sketch.percentile(percent)
+        if old is None or new is None:
+            rows.append(ComparisonRow(baseline=old and old.row(label),
+                    baseline_percentile=old_value,
+                    candidate=new and new.row(label),
+                    candidate_percentile=new_value, change=None,
+                    error_p_value=None, label=label, p_value=None,
+                    regression=False))
+            continue
+        change = (float(new_value) / old_value - 1 if old_value
+                else None)
+        p_value = _mann_whitney(old.sketch, new.sketch)
+        error_p_value = _proportions_test(old.errors, old.samples,
+                new.errors, new.samples)
+        regression = (change is not None and change > threshold and
+                p_value < alpha) or (float(new.errors) / new.samples -
+                float(old.errors) / old.samples > error_threshold and
+                error_p_value < alpha)
+        rows.append(ComparisonRow(baseline=old.row(label),
+                baseline_percentile=old_value, candidate=new.row(label),
+                candidate_percentile=new_value, change=change,
+                error_p_value=error_p_value, label=label, p_value=p_value,
+                regression=regression))
+    return rows
+
+
+def _summarize_file(task):
+    """Return the aggregate report of the results file.
+
+    """
+    filename, accuracy, kwargs = task
+    return Summary(accuracy).update(create_parser(filename,
+            **kwargs).itersamples())
+
+
+def _mann_whitney(baseline, candidate):
+    """Return the one-sided p-value of the Mann-Whitney U test of the
+    values in the candidate sketch not being higher than the values in
+    the baseline sketch. The values in the same bucket are treated as
+    ties.
+
+    """
+    count = baseline.count + candidate.count
+    if not baseline.count or not candidate.count:
+        return 1.0
+    ties = (baseline.zero_count + candidate.zero_count) ** 3 - (
+            baseline.zero_count + candidate.zero_count)
+    u = candidate.zero_count * baseline.zero_count / 2.0
+    below = baseline.zero_count
+    for index in sorted(set(baseline.buckets) | set(candidate.buckets)):
+        old = baseline.buckets.get(index, 0)
+        new = candidate.buckets.get(index, 0)
+        u += new * (below + old / 2.0)
+        below += old
+        ties += (old + new) ** 3 - (old + new)
+    product = float(baseline.count) * candidate.count
+    variance = product / 12 * (count + 1 - ties / (count * (count - 1.0)))
+    if variance <= 0:
+        return 1.0
+    z = (u - product / 2) / math.sqrt(variance)
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def _proportions_test(baseline_errors, baseline_samples, candidate_errors,
+        candidate_samples):
+    """Return the one-sided p-value of the two proportions z-test of the
+    error rate not being higher in the candidate run.
+
+    """
+    errors = baseline_errors + candidate_errors
+    samples = baseline_samples + candidate_samples
+    rate = float(errors) / samples
+    variance = rate * (1 - rate) * (1.0 / baseline_samples +
+            1.0 / candidate_samples)
+    if variance <= 0:
+        return 1.0
+    z = (float(candidate_errors) / candidate_samples -
+            float(baseline_errors) / baseline_samples) / math.sqrt(variance)
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+class Heatmap(object):
+    """The class that builds the latency heatmap: the two-dimensional
+    histogram of elapsed time (in logarithmically sized buckets) over time
+    (in fixed intervals), overall and per label. Heatmaps of separate
+    results files (or their parts) can be merged, and serialized into a
+    compact form.
+
+    """
+    def __init__(self, interval=10, accuracy=0.1):
+        """Initialize the class.
+
+        Arguments:
+        interval -- length of the time intervals in seconds
+        accuracy -- relative accuracy of elapsed time buckets (bucket
+            upper bounds grow by the factor of (1 + accuracy) / (1 -
+            accuracy))
+
+        """
+        self.interval = interval
+        self.accuracy = accuracy
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.cells = {None: {}}
+        self._buckets = {}
+
+    def _get_bucket(self, value):
+        """Return the index of the elapsed time bucket (-1 for zero).
+
+        """
+        bucket = self._buckets.get(value)
+        if bucket is None:
+            bucket = (int(math.ceil(math.log(value) / self.log_gamma))
+                    if value > 0 else -1)
+            if len(self._buckets) < 100000:
+                self._buckets[value] = bucket
+        return bucket
+
+    def add(self, sample):
+        """Add the sample to the heatmap.
+
+        """
+        self.update((sample, ))
+
+    def update(self, samples):
+        """Add all the samples to the heatmap and return the heatmap.
+
+        """
+        interval = self.interval * 1000
+        cells = self.cells
+        total = cells[None]
+        get_bucket = self._get_bucket
+        for sample in samples:
+            timestamp = _milliseconds(sample.timestamp - _EPOCH)
+            key = (timestamp - timestamp % interval,
+                    get_bucket(_milliseconds(sample.elapsed_time)))
+            label_cells = cells.get(sample.label)
+            if label_cells is None:
+                label_cells = cells[sample.label] = {}
+            label_cells[key] = label_cells.get(key, 0) + 1
+            total[key] = total.get(key, 0) + 1
+        return self
+
+    def merge(self, other):
+        """Merge the other heatmap (with the same interval and accuracy)
+        into this one and return this heatmap.
+
+        """
+        if (other.interval, other.accuracy) != (self.interval,
+                self.accuracy):
+            raise ValueError('Cannot merge heatmaps with different '
+                    'intervals or accuracy')
+        for label, other_cells in other.cells.iteritems():
+            label_cells = self.cells.setdefault(label, {})
+            for key, value in other_cells.iteritems():
+                label_cells[key] = label_cells.get(key, 0) + value
+        return self
+
+    def labels(self):
+        """Return the sorted list of labels.
+
+        """
+        return sorted(label for label in self.cells if label is not None)
+
+    def matrix(self, label=None):
+        """Return the heatmap of the label (all the labels if None) as the
+        tuple of the list of interval starts (instances of datetime
+        class), the list of bucket upper bounds of elapsed time (ms) and
+        the list of rows of counts (one row per interval and one count per
+        bucket). Intervals and buckets between the first and the last
+        ones are all included, so the matrix can be plotted directly.
+
+        """
+        cells = self.cells.get(label) or {}
+        if not cells:
+            return [], [], []
+        interval = self.interval * 1000
+        times = [time for time, bucket in cells]
+        buckets = [bucket for time, bucket in cells]
+        first_bucket, last_bucket = min(buckets), max(buckets)
+        bounds = [self.gamma ** bucket if bucket >= 0 else 0
+                for bucket in range(first_bucket, last_bucket + 1)]
+        starts = range(min(times), max(times) + interval, interval)
+        rows = [[cells.get((start, bucket), 0)
+                for bucket in range(first_bucket, last_bucket + 1)]
+                for start in starts]
+        return ([datetime.utcfromtimestamp(start / 1000.0)
+                for start in starts], bounds, rows)
+
+    def dumps(self):
+        """Return the heatmap serialized as a compressed string.
+
+        """
+        return zlib.compress(json.dumps({'accuracy': self.accuracy,
+                'cells': [[label, [time for time, bucket in cells],
+                    [bucket for time, bucket in cells], cells.values()]
+                    for label, cells in self.cells.iteritems()],
+                'interval': self.interval}, separators=(',', ':')))
+
+    @classmethod
+    def loads(cls, data):
+        """Return the heatmap deserialized from the string returned by
+        dumps method.
+
+        """
+        state = json.loads(zlib.decompress(data))
+        heatmap = cls(state['interval'], state['accuracy'])
+        for label, times, buckets, values in state['cells']:
+            heatmap.cells[label] = dict(zip(zip(times, buckets), values))
+        return heatmap
+
+
+class _RollingRing(object):
+    """The class that keeps samples counts, errors counts and latency
+    sketches in the ring of time slots for the single label. Slots are
+    reused when the ring wraps around, so the memory used is bounded by
+    the number of slots.
+
+    """
+    def __init__(self, size, accuracy):
+        self.accuracy = accuracy
+        self.slots = [None] * size
+        self.samples = [0] * size
+        self.errors = [0] * size
+        self.sketches = [None] * size
+
+    def add(self, slot, elapsed, success):
+        index = slot % len(self.slots)
+        if self.slots[index] != slot:
+            self.slots[index] = slot
+            self.samples[index] = self.errors[index] = 0
+            self.sketches[index] = _create_sketch(self.accuracy)
+        self.samples[index] += 1
+        self.errors[index] += not success
+        self.sketches[index].add(elapsed)
+
+    def indexes(self, first, last):
+        return [index for index, slot in enumerate(self.slots)
+                if slot is not None and first <= slot <= last]
+
+
+class RollingStats(object):
+    """The class that maintains statistics (samples and errors counts,
+    throughput, error rate and percentiles of elapsed time) over the
+    sliding time window per label, updated as samples arrive. Samples
+    are counted in fixed time slots by their end time, so samples coming
+    out of order are accounted properly unless they are older than the
+    window.
+
+    """
+    def __init__(self, window=60, resolution=1, accuracy=0.01):
+        """Initialize the class.
+
+        Arguments:
+        window -- maximum length of the window in seconds
+        resolution -- length of the time slot in seconds
+        accuracy -- relative accuracy of the percentiles estimation (None
+            for exact percentiles)
+
+        """
+        self.window = window
+        self.resolution = resolution
+        self.accuracy = accuracy
+        self.size = int(math.ceil(float(window) / resolution))
+        self.labels = {}
+        self.total = _RollingRing(self.size, accuracy)
+        self.start = None
+        self.end = None
+        self.dropped = 0
+
+    def add(self, sample):
+        """Add the sample to the statistics. Samples ending before the
+        window of the latest sample are dropped (and counted in dropped
+        attribute).
+
+        """
+        elapsed = _milliseconds(sample.elapsed_time)
+        end = _milliseconds(sample.timestamp - _EPOCH) + elapsed
+        slot = self._get_slot(end)
+        if self.end is None:
+            self.start = self.end = end
+        elif end > self.end:
+            self.end = end
+        elif slot <= self._get_slot(self.end) - self.size:
+            self.dropped += 1
+            return
+        elif end < self.start:
+            self.start = end
+        ring = self.labels.get(sample.label)
+        if ring is None:
+            ring = self.labels[sample.label] = _RollingRing(self.size,
+                    self.accuracy)
+        ring.add(slot, elapsed, sample.success)
+        self.total.add(slot, elapsed, sample.success)
+
+    def update(self, samples):
+        """Add all the samples to the statistics and return the
+        statistics.
+
+        """
+        add = self.add
+        for sample in samples:
+            add(sample)
+        return self
+
+    def _get_slot(self, time):
+        return int(time // (self.resolution * 1000))
+
+    def _get_window(self, label, window):
+        """Return the ring of the label (None for the total), the indexes
+        of its slots within the window and the window duration in
+        seconds.
+
+        """
+        ring = self.total if label is None else self.labels.get(label)
+        if ring is None or self.end is None:
+            return None, [], 0
+        last = self._get_slot(self.end)
+        first = last - min(int(math.ceil(float(window or self.window) /
+                self.resolution)), self.size) + 1
+        start = max(first * self.resolution * 1000, self.start)
+        return ring, ring.indexes(first, last), (self.end - start) / 1000.0
+
+    def count(self, label=None, window=None, errors=False):
+        """Return the number of samples (or failed samples) of the label
+        (all the labels if None) ending within the window (the last window
+        seconds, the whole window by default).
+
+        """
+        ring, indexes, duration = self._get_window(label, window)
+        if ring is None:
+            return 0
+        values = ring.errors if errors else ring.samples
+        return sum(values[index] for index in indexes)
+
+    def throughput(self, label=None, window=None, errors=False):
+        """Return the number of samples (or failed samples) per second of
+        the label (all the labels if None) within the window.
+
+        """
+        ring, indexes, duration = self._get_window(label, window)
+        if not duration:
+            return 0
+        values = ring.errors if errors else ring.samples
+        return sum(values[index] for index in indexes) / duration
+
+    def error_rate(self, label=None, window=None):
+        """Return the ratio of failed samples of the label (all the labels
+        if None) within the window, or None if there are no samples.
+
+        """
+        samples = self.count(label, window)
+        if not samples:
+            return None
+        return float(self.count(label, window, errors=True)) / samples
+
+    def percentile(self, percent, label=None, window=None):
+        """Return the estimated percentile of elapsed time of the label
+        (all the labels if None) within the window, or None if there are
+        no samples.
+
+        """
+        ring, indexes, duration = self._get_window(label, window)
+        sketch = _create_sketch(self.accuracy)
+        for index in indexes:
+            sketch.merge(ring.sketches[index])
+        return sketch.percentile(percent)
+
+
+class _ChangeState(object):
+    """The class that keeps the baseline (exponentially weighted moving
+    average and variance) and the cumulative sums of deviations from it
+    for the single metric of the single label.
+
+    """
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.samples = 0
+        self.mean = self.variance = 0.0
+        self.upper = self.lower = 0.0
+        self.upper_samples = self.lower_samples = 0
+        self.upper_total = self.lower_total = 0.0
+        self.upper_mean = self.lower_mean = 0.0
+
+    def warm_up(self, value):
+        self.samples += 1
+        delta = value - self.mean
+        self.mean += delta / self.samples
+        self.variance += (delta * (value - self.mean) - self.variance) / \
+                self.samples
+
+    def accumulate(self, value, upper, lower):
+        if upper > 0:
+            if not self.upper_samples:
+                self.upper_mean = self.mean
+            self.upper = upper
+            self.upper_samples += 1
+            self.upper_total += value
+        else:
+            self.upper = self.upper_samples = self.upper_total = 0
+        if lower > 0:
+            if not self.lower_samples:
+                self.lower_mean = self.mean
+            self.lower = lower
+            self.lower_samples += 1
+            self.lower_total += value
+        else:
+            self.lower = self.lower_samples = self.lower_total = 0
+
+    def follow(self, value, alpha):
+        delta = value - self.mean
+        self.mean += alpha * delta
+        self.variance = (1 - alpha) * (self.variance + alpha * delta * delta)
+
+
+class ChangeDetector(object):
+    """The class that detects changes of elapsed time and error rate per
+    label in the stream of samples, using constant time and memory per
+    label. The baseline of the label is estimated from the first samples
+    and then followed by exponentially weighted moving averages, and the
+    deviations from it are accumulated by two-sided CUSUM of logarithm of
+    elapsed time and one-sided (increases only) Bernoulli CUSUM of
+    errors. When the sum exceeds the threshold, the change point is
+    reported and the baseline of the metric is estimated anew.
+
+    """
+    min_error_rate = 0.001
+
+    def __init__(self, alpha=0.01, threshold=10.0, drift=0.5, warmup=100,
+            error_shift=2.0):
+        """Initialize the class.
+
+        Arguments:
+        alpha -- weight of the new sample in the moving averages of the
+            baseline
+        threshold -- threshold of the cumulative sums (in standard
+            deviations of logarithm of elapsed time, and log-likelihood
+            ratio of errors)
+        drift -- deviation of logarithm of elapsed time (in standard
+            deviations) ignored per sample, about half of the smallest
+            change to be detected
+        warmup -- number of samples of the label used to estimate the
+            baseline before the detection starts (again after a change)
+        error_shift -- ratio of the increased error rate to be detected to
+            the baseline error rate
+
+        """
+        self.alpha = alpha
+        self.threshold = threshold
+        self.drift = drift
+        self.warmup = warmup
+        self.error_shift = error_shift
+        self.labels = {}
+
+    def add(self, sample):
+        """Add the sample to the detector and return the list of changes
+        detected (instances of ChangePoint class, usually none).
+
+        """
+        states = self.labels.get(sample.label)
+        if states is None:
+            states = self.labels[sample.label] = (_ChangeState(),
+                    _ChangeState())
+        elapsed, errors = states
+        changes = []
+        value = math.log1p(_milliseconds(sample.elapsed_time))
+        if elapsed.samples < self.warmup:
+            elapsed.warm_up(value)
+        else:
+            score = (value - elapsed.mean) / max(math.sqrt(elapsed.variance),
+                    0.05)
+            elapsed.accumulate(value, elapsed.upper + score - self.drift,
+                    elapsed.lower - score - self.drift)
+            if elapsed.upper > self.threshold or \
+                    elapsed.lower > self.threshold:
+                increase = elapsed.upper > self.threshold
+                mean, total, samples = (elapsed.upper_mean,
+                        elapsed.upper_total, elapsed.upper_samples
+                        ) if increase else (elapsed.lower_mean,
+                        elapsed.lower_total, elapsed.lower_samples)
+                changes.append(ChangePoint(math.expm1(mean),
+                        'increase' if increase else 'decrease', sample.label,
+                        'elapsed_time', sample.timestamp,
+                        math.expm1(total / samples)))
+                elapsed.reset()
+            else:
+                elapsed.follow(value, self.alpha)
+        value = 0.0 if sample.success else 1.0
+        if errors.samples < self.warmup:
+            errors.warm_up(value)
+        else:
+            baseline = min(max(errors.mean, self.min_error_rate), 0.5)
+            shifted = min(baseline * self.error_shift, (1 + baseline) / 2)
+            if value:
+                score = math.log(shifted / baseline)
+            else:
+                score = math.log((1 - shifted) / (1 - baseline))
+            errors.accumulate(value, errors.upper + score, 0)
+            if errors.upper > self.threshold:
+                changes.append(ChangePoint(errors.upper_mean, 'increase',
+                        sample.label, 'error_rate', sample.timestamp,
+                        errors.upper_total / errors.upper_samples))
+                errors.reset()
+            else:
+                errors.follow(value, self.alpha)
+        return changes
+
+    def detect(self, samples):
+        """Add the samples to the detector, yielding changes as they are
+        detected.
+
+        """
+        add = self.add
+        for sample in samples:
+            for change in add(sample):
+                yield change
+
+    def baseline(self, label):
+        """Return the tuple of the current baseline of elapsed time
+        (geometric mean in ms) and error rate of the label, with None
+        for the metric which is still being estimated (or of the label
+        not seen yet).
+
+        """
+        if label not in self.labels:
+            return None, None
+        elapsed, errors = self.labels[label]
+        return (math.expm1(elapsed.mean)
+                if elapsed.samples >= self.warmup else None,
+                errors.mean if errors.samples >= self.warmup else None)
+
+
+_FINGERPRINT_PATTERNS = (
+        (re.compile(r'[0-9a-fA-F]{8}(?:-[0-9a-fA-F]{4}){3}-[0-9a-fA-F]{12}'),
+            '<uuid>'),
+        (re.compile(r'\b(?=[a-fA-F]*[0-9])[0-9a-fA-F]{8,}\b'), '<hex>'),
+        (re.compile(r'[0-9]+'), '#'),
+        (re.compile(r'\s+'), ' '),
+        )
+
+
+def fingerprint(message):
+    """The function that normalizes the error message, so that messages
+    which only differ by embedded ids, numbers or timestamps get the same
+    fingerprint.
+
+    """
+    for pattern, replacement in _FINGERPRINT_PATTERNS:
+        message = pattern.sub(replacement, message)
+    return message.strip()
+
+
+class _SpaceSaving(object):
+    """The class that implements the Space-Saving algorithm: it counts the
+    items monitored, and when a new item arrives and all the counters are
+    in use, the item with the minimum count is replaced by the new one
+    inheriting its count as the overestimation error. The minimum is found
+    with the heap of (count, key) entries, which are updated lazily: the
+    count of the entry is refreshed only when it reaches the top of the
+    heap, as counts never decrease.
+
+    """
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.counters = {}
+        self.heap = []
+
+    def add(self, key, timestamp, sample):
+        counter = self.counters.get(key)
+        if counter is not None:
+            counter[0] += 1
+            if timestamp < counter[2]:
+                counter[2] = timestamp
+            elif timestamp > counter[3]:
+                counter[3] = timestamp
+            return
+        if len(self.counters) < self.capacity:
+            self.counters[key] = [1, 0, timestamp, timestamp, sample]
+            heapq.heappush(self.heap, (1, key))
+            return
+        min_count, min_key = self._pop_min()
+        del self.counters[min_key]
+        self.counters[key] = [min_count + 1, min_count, timestamp, timestamp,
+                sample]
+        heapq.heappush(self.heap, (min_count + 1, key))
+
+    def _pop_min(self):
+        heap = self.heap
+        while True:
+            count, key = heap[0]
+            actual = self.counters[key][0]
+            if actual == count:
+                return heapq.heappop(heap)
+            heapq.heapreplace(heap, (actual, key))
+
+    def min_count(self):
+        if len(self.counters) < self.capacity:
+            return 0
+        entry = self._pop_min()
+        heapq.heappush(self.heap, entry)
+        return entry[0]
+
+    def merge(self, other):
+        self_min, other_min = self.min_count(), other.min_count()
+        counters = {}
+        for key in set(self.counters) | set(other.counters):
+            counter = self.counters.get(key)
+            other_counter = other.counters.get(key)
+            if counter is None:
+                counter = [self_min, self_min] + other_counter[2:]
+            elif other_counter is None:
+                other_counter = [other_min, other_min] + counter[2:]
+            counters[key] = [counter[0] + other_counter[0],
+                    counter[1] + other_counter[1],
+                    min(counter[2], other_counter[2]),
+                    max(counter[3], other_counter[3]), counter[4]]
+        self.counters = dict(sorted(counters.iteritems(),
+                key=lambda item: -item[1][0])[:self.capacity])
+        self.heap = [(counter[0], key)
+                for key, counter in self.counters.iteritems()]
+        heapq.heapify(self.heap)
+
+
+class ErrorAnalyzer(object):
+    """The class that groups failed samples by label and error fingerprint
+    (response code, normalized response message and normalized assertion
+    failure message) and tracks the heaviest groups per label with the
+    Space-Saving algorithm, so the memory used does not depend on the
+    number of samples or distinct messages. Analyzers of separate results
+    files (or their parts) can be merged.
+
+    """
+    def __init__(self, capacity=100):
+        """Initialize the class.
+
+        Arguments:
+        capacity -- maximum number of fingerprints tracked per label (the
+            counts of the top fingerprints are more accurate when the
+            capacity is several times larger than the number of
+            fingerprints reported)
+
+        """
+        self.capacity = capacity
+        self.labels = {}
+
+    def add(self, sample):
+        """Add the sample to the analyzer (successful samples are
+        ignored).
+
+        """
+        if sample.success:
+            return
+        failure_message = next((result.failure_message
+                for result in sample.assertion_results
+                if result.failure_message), '')
+        key = (sample.response_code, fingerprint(sample.response_message),
+                fingerprint(failure_message))
+        sketch = self.labels.get(sample.label)
+        if sketch is None:
+            sketch = self.labels[sample.label] = _SpaceSaving(self.capacity)
+        sketch.add(key, sample.timestamp, sample)
+
+    def update(self, samples):
+        """Add all the samples to the analyzer and return the analyzer.
+
+        """
+        add = self.add
+        for sample in samples:
+            add(sample)
+        return self
+
+    def merge(self, other):
+        """Merge the other analyzer into this one and return this analyzer.
+
+        """
+        for label, other_sketch in other.labels.iteritems():
+            sketch = self.labels.get(label)
+            if sketch is None:
+                sketch = self.labels[label] = _SpaceSaving(self.capacity)
+            sketch.merge(other_sketch)
+        return self
+
+    def top(self, count=10, label=None):
+        """Return the list of ErrorFingerprint class instances for the
+        heaviest fingerprints (of the given label or of all the labels),
+        sorted by count in descending order.
+
+        Arguments:
+        count -- maximum number of fingerprints returned
+        label -- label of the samples (all the labels by default)
+
+        """
+        labels = [label] if label is not None else self.labels.keys()
+        fingerprints = []
+        for label in labels:
+            sketch = self.labels.get(label)
+            if sketch is None:
+                continue
+            for key, counter in sketch.counters.iteritems():
+                fingerprints.append(ErrorFingerprint(count=counter[0],
+                        error=counter[1], example=counter[4],
+                        failure_message=key[2],
+                        first_timestamp=counter[2], label=label,
+                        last_timestamp=counter[3], response_code=key[0],
+                        response_message=key[1]))
+        fingerprints.sort(key=lambda item: -item.count)
+        return fingerprints[:count]
+
+
+def _hash64(value):
+    """Return the stable 64-bit hash of the value, which is the same across
+    processes and machines.
+
+    """
+    return struct.unpack_from('<Q', hashlib.md5(_to_bytes(value)).digest())[0]
+
+
+class HyperLogLog(object):
+    """The class that implements the HyperLogLog cardinality estimator.
+    Registers are stored sparsely until the number of the registers set
+    makes the dense representation smaller. Estimators with the same
+    precision can be merged.
+
+    """
+    def __init__(self, precision=12):
+        """Initialize the class.
+
+        Arguments:
+        precision -- number of bits of the hash used to choose a register
+            (4 to 16); the estimator uses 2 ** precision registers and its
+            standard error is 1.04 / sqrt(2 ** precision)
+
+        """
+        if not 4 <= precision <= 16:
+            raise ValueError('Precision must be between 4 and 16')
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = {}
+
+    def add(self, value):
+        """Add the value to the estimator.
+
+        """
+        self.add_hash(_hash64(value))
+
+    def add_hash(self, value_hash):
+        """Add the value by its 64-bit hash (see add method).
+
+        """
+        bits = 64 - self.precision
+        self._update(value_hash >> bits,
+                bits - (value_hash & ((1 << bits) - 1)).bit_length() + 1)
+
+    def _update(self, index, rank):
+        """Set the register to the rank if the rank is greater than its
+        value. The registers are switched to the dense representation when
+        it gets smaller than the sparse one.
+
+        """
+        registers = self.registers
+        if isinstance(registers, dict):
+            if rank > registers.get(index, 0):
+                registers[index] = rank
+                if len(registers) * 64 > self.size:
+                    self.registers = bytearray(self.size)
+                    for index, rank in registers.iteritems():
+                        self.registers[index] = rank
+        elif rank > registers[index]:
+            registers[index] = rank
+
+    def merge(self, other):
+        """Merge the other estimator (with the same precision) into this one
+        and return this estimator.
+
+        """
+        if other.precision != self.precision:
+            raise ValueError('Cannot merge estimators with different '
+                    'precision')
+        if isinstance(other.registers, dict):
+            items = other.registers.items()
+        else:
+            items = [(index, rank)
+                    for index, rank in enumerate(other.registers) if rank]
+        for index, rank in items:
+            self._update(index, rank)
+        return self
+
+    def count(self):
+        """Return the estimated number of distinct values added.
+
+        """
+        size = self.size
+        if isinstance(self.registers, dict):
+            ranks = self.registers.values()
+        else:
+            ranks = [rank for rank in self.registers if rank]
+        zeros = size - len(ranks)
+        total = zeros + sum([2.0 ** -rank for rank in ranks])
+        alpha = {16: 0.673, 32: 0.697, 64: 0.709}.get(size,
+                0.7213 / (1 + 1.079 / size))
+        estimate = alpha * size * size / total
+        if estimate <= 2.5 * size and zeros:
+            estimate = size * math.log(float(size) / zeros)
+        return int(round(estimate))
+
+
+class DistinctCounter(object):
+    """The class that estimates the numbers of distinct values of the
+    sample fields (e.g. URLs, query strings, threads and hosts) with
+    HyperLogLog estimators, overall and per label, and optionally per time
+    interval. Counters of separate results files (or their parts) can be
+    merged.
+
+    """
+    def __init__(self, fields=('url', 'query_string', 'thread_name',
+            'hostname'), interval=None, precision=12):
+        """Initialize the class.
+
+        Arguments:
+        fields -- names of the Sample fields to count distinct values of
+        interval -- length of the time intervals in seconds (no counting
+            per interval by default)
+        precision -- precision of the HyperLogLog estimators
+
+        """
+        self.fields = tuple(fields)
+        self.interval = interval
+        self.precision = precision
+        self.estimators = {}
+
+    def _get_estimators(self, key):
+        """Return the list of estimators (one per field) for the key.
+
+        """
+        estimators = self.estimators.get(key)
+        if estimators is None:
+            estimators = self.estimators[key] = [
+                    HyperLogLog(self.precision) for field in self.fields]
+        return estimators
+
+    def add(self, sample):
+        """Add the sample to the counter.
+
+        """
+        keys = [(None, None), (sample.label, None)]
+        if self.interval:
+            interval = self.interval * 1000
+            timestamp = _milliseconds(sample.timestamp - _EPOCH)
+            start = timestamp - timestamp % interval
+            keys.extend([(None, start), (sample.label, start)])
+        hashes = [_hash64(getattr(sample, field)) for field in self.fields]
+        for key in keys:
+            for estimator, value_hash in zip(self._get_estimators(key),
+                    hashes):
+                estimator.add_hash(value_hash)
+
+    def update(self, samples):
+        """Add all the samples to the counter and return the counter.
+
+        """
+        add = self.add
+        for sample in samples:
+            add(sample)
+        return self
+
+    def merge(self, other):
+        """Merge the other counter (with the same fields, interval and
+        precision) into this one and return this counter.
+
+        """
+        if (other.fields, other.interval) != (self.fields, self.interval):
+            raise ValueError('Cannot merge counters with different fields '
+                    'or intervals')
+        for key, other_estimators in other.estimators.iteritems():
+            for estimator, other_estimator in zip(self._get_estimators(key),
+                    other_estimators):
+                estimator.merge(other_estimator)
+        return self
+
+    def count(self, field, label=None, interval=None):
+        """Return the estimated number of distinct values of the field.
+
+        Arguments:
+        field -- name of the Sample field
+        label -- label of the samples (all the labels by default)
+        interval -- start of the time interval (instance of datetime
+            class, the whole run by default)
+
+        """
+        if interval is not None:
+            interval = _milliseconds(interval - _EPOCH)
+        estimators = self.estimators.get((label, interval))
+        if estimators is None:
+            return 0
+        return estimators[self.fields.index(field)].count()
+
+    def keys(self):
+        """Return the sorted list of (label, interval) pairs the counts are
+        available for; the total counts have None label and interval, and
+        the interval is the start of the time interval otherwise.
+
+        """
+        return [(label, interval if interval is None else
+                datetime.utcfromtimestamp(interval / 1000.0))
+                for label, interval in sorted(self.estimators)]
+
+
+_QUERY_OPERATORS = {
+        '==': operator.eq, '!=': operator.ne, '<': operator.lt,
+        '<=': operator.le, '>': operator.gt, '>=': operator.ge,
+        'in': lambda value, values: value in values,
+        'not in': lambda value, values: value not in values,
+        '~': lambda value, pattern: pattern.search(value) is not None,
+        }
+_QUERY_AGGREGATE = re.compile(
+        r'^(count|sum|mean|min|max|p(\d+(?:\.\d+)?))(?:\((\w+)\))?$')
+
+
+class Query(object):
+    """The class that runs group-by queries over the samples: filters the
+    samples, groups them by the values of the fields and computes the
+    aggregates per group. Samples are processed in columnar batches: the
+    group-by columns are dictionary-encoded and the rows are hashed into
+    groups by the codes, so the aggregates are computed over whole lists
+    of values per group and batch. Time intervals (elapsed_time,
+    idle_time and latency_time) are converted to milliseconds for both
+    filters and aggregates. Queries of separate results files (or their
+    parts) can be merged, and queries can be pickled (e.g. to be run by
+    process_files function).
+
+    """
+    def __init__(self, select=('count', ), group_by=(), where=(),
+            accuracy=0.01):
+        """Initialize the class.
+
+        Arguments:
+        select -- aggregates to compute: count, sum(field), mean(field),
+            min(field), max(field) or pN(field) for the Nth percentile
+            (e.g. p99(elapsed_time))
+        group_by -- names of the Sample fields to group the samples by
+        where -- conditions the samples must meet, as (field, operator,
+            value) tuples; operators are ==, !=, <, <=, >, >=, in, not in
+            and ~ (regular expression search)
+        accuracy -- relative accuracy of the percentiles estimation (None
+            for exact percentiles)
+
+        """
+        self.select = tuple(select)
+        self.group_by = tuple(group_by)
+        self.conditions = tuple(tuple(condition) for condition in where)
+        self.accuracy = accuracy
+        self.aggregates = []
+        for aggregate in self.select:
+            match = _QUERY_AGGREGATE.match(aggregate.replace(' ', ''))
+            function, percent, field = (match.groups() if match
+                    else (None, None, None))
+            if (not match or (field is None) != (function == 'count') or
+                    field is not None and field not in Sample._fields):
+                raise ValueError('Invalid aggregate: %s' % aggregate)
+            self.aggregates.append(('percentile' if percent else function,
+                    field, percent and float(percent)))
+        self.where = []
+        for field, name, value in self.conditions:
+            if field not in Sample._fields or name not in _QUERY_OPERATORS:
+                raise ValueError('Invalid condition: %s %s %r' % (field,
+                        name, value))
+            if name == '~':
+                value = re.compile(value)
+            self.where.append((field, _QUERY_OPERATORS[name], value))
+        for field in self.group_by:
+            if field not in Sample._fields:
+                raise ValueError('Invalid group by field: %s' % field)
+        self.row_class = namedtuple('QueryRow', self.group_by + tuple(
+                function if field is None else '%s_%s' % (
+                    function if percent is None else
+                    'p' + ('%g' % percent).replace('.', '_'), field)
+                for function, field, percent in self.aggregates))
+        self.dictionaries = [{} for field in self.group_by]
+        self.groups = {}
+
+    def _get_state(self):
+        """Return the initial aggregates state of the group.
+
+        """
+        state = []
+        sketches = {}
+        for function, field, percent in self.aggregates:
+            if function == 'percentile':
+                if field not in sketches:
+                    sketches[field] = _create_sketch(self.accuracy)
+                state.append(sketches[field])
+            else:
+                state.append({'count': 0, 'sum': 0, 'mean': [0, 0]}.get(
+                        function))
+        return state
+
+    def __getstate__(self):
+        return {'definition': (self.select, self.group_by, self.conditions,
+                self.accuracy), 'dictionaries': self.dictionaries,
+                'groups': self.groups}
+
+    def __setstate__(self, state):
+        self.__init__(*state['definition'])
+        self.dictionaries = state['dictionaries']
+        self.groups = state['groups']
+
+    def add(self, sample):
+        """Add the sample to the query.
+
+        """
+        self.update_columns(_get_columns([sample]))
+
+    def update(self, samples, batch_size=1000):
+        """Add all the samples to the query (in columnar batches of
+        batch_size samples) and return the query.
+
+        """
+        samples = iter(samples)
+        while True:
+            batch = list(islice(samples, batch_size))
+            if not batch:
+                return self
+            self.update_columns(_get_columns(batch))
+
+    def update_columns(self, columns):
+        """Add the columnar batch of samples (as yielded by parser's
+        iterbatches method with columnar flag) to the query and return the
+        query.
+
+        """
+        if not columns:
+            return self
+        size = len(columns['label'])
+        columns = dict(columns)
+        for field in ('elapsed_time', 'idle_time', 'latency_time'):
+            if field in columns:
+                columns[field] = [_milliseconds(value)
+                        for value in columns[field]]
+        rows = range(size)
+        for field, function, value in self.where:
+            column = columns[field]
+            rows = [row for row in rows if function(column[row], value)]
+        codes = []
+        for field, dictionary in zip(self.group_by, self.dictionaries):
+            column = columns[field]
+            setdefault = dictionary.setdefault
+            codes.append([setdefault(column[row], len(dictionary))
+                    for row in rows])
+        batch_groups = {}
+        for row, key in zip(rows, zip(*codes) if codes else [()] * len(rows)):
+            group_rows = batch_groups.get(key)
+            if group_rows is None:
+                group_rows = batch_groups[key] = []
+            group_rows.append(row)
+        for key, group_rows in batch_groups.iteritems():
+            state = self.groups.get(key)
+            if state is None:
+                state = self.groups[key] = self._get_state()
+            self._aggregate(state, columns, group_rows)
+        return self
+
+    def _aggregate(self, state, columns, rows):
+        """Update the aggregates state of the group with its rows of the
+        batch.
+
+        """
+        added = set()
+        for index, (function, field, percent) in enumerate(self.aggregates):
+            if function == 'count':
+                state[index] += len(rows)
+                continue
+            column = columns[field]
+            values = [column[row] for row in rows]
+            if function == 'sum':
+                state[index] += sum(values)
+            elif function == 'mean':
+                state[index][0] += sum(values)
+                state[index][1] += len(values)
+            elif function == 'min':
+                value = min(values)
+                if state[index] is None or value < state[index]:
+                    state[index] = value
+            elif function == 'max':
+                value = max(values)
+                if state[index] is None or value > state[index]:
+                    state[index] = value
+            elif field not in added:
+                added.add(field)
+                add = state[index].add
+                for value in values:
+                    add(value)
+
+    def run(self, source, batch_size=1000, **kwargs):
+        """Run the query over the results file (streamed in batches) and
+        return the result rows.
+
+        Arguments:
+        source -- name of the file containing the results data
+        batch_size -- number of samples processed at once
+
+        Keyword arguments are passed to the parser (see create_parser
+        function).
+
+        """
+        parser = create_parser(source, **kwargs)
+        for columns in parser.iterbatches(batch_size, columnar=True):
+            self.update_columns(columns)
+        return self.rows()
+
+    def merge(self, other):
+        """Merge the other query (with the same definition) into this one
+        and return this query.
+
+        """
+        if ((other.select, other.group_by, other.conditions,
+                other.accuracy) != (self.select, self.group_by,
+                self.conditions, self.accuracy)):
+            raise ValueError('Cannot merge different queries')
+        values = [[None] * len(dictionary)
+                for dictionary in other.dictionaries]
+        for field_values, dictionary in zip(values, other.dictionaries):
+            for value, code in dictionary.iteritems():
+                field_values[code] = value
+        for other_key, other_state in other.groups.iteritems():
+            key = tuple(dictionary.setdefault(field_values[code],
+                    len(dictionary)) for dictionary, field_values, code in
+                    zip(self.dictionaries, values, other_key))
+            state = self.groups.get(key)
+            if state is None:
+                state = self.groups[key] = self._get_state()
+            merged = set()
+            for index, (function, field, percent) in enumerate(
+                    self.aggregates):
+                value = other_state[index]
+                if function in ('count', 'sum'):
+                    state[index] += value
+                elif function == 'mean':
+                    state[index][0] += value[0]
+                    state[index][1] += value[1]
+                elif function == 'percentile':
+                    if field not in merged:
+                        merged.add(field)
+                        state[index].merge(value)
+                elif value is not None and (state[index] is None or
+                        (value < state[index]) == (function == 'min')):
+                    state[index] = value
+        return self
+
+    def rows(self):
+        """Return the result as a list of rows (named tuples with the group
+        by fields followed by the aggregates) sorted by the group by
+        fields.
+
+        """
+        values = [[None] * len(dictionary)
+                for dictionary in self.dictionaries]
+        for field_values, dictionary in zip(values, self.dictionaries):
+            for value, code in dictionary.iteritems():
+                field_values[code] = value
+        rows = []
+        for key, state in self.groups.iteritems():
+            row = [field_values[code]
+                    for field_values, code in zip(values, key)]
+            for index, (function, field, percent) in enumerate(
+                    self.aggregates):
+                value = state[index]
+                if function == 'mean':
+                    value = float(value[0]) / value[1] if value[1] else None
+                elif function == 'percentile':
+                    value = value.percentile(percent)
+                row.append(value)
+            rows.append(self.row_class(*row))
+        rows.sort()
+        return rows
+
+
+class MetricsExporter(object):
+    """The class that aggregates samples per label per time interval and
+    sends the metrics (samples and errors counts, average, minimum,
+    maximum and percentiles of elapsed time) to the time series database
+    in Graphite plaintext or InfluxDB line protocol. Metrics are sent in
+    batches over the single TCP connection (reconnecting and retrying on
+    errors) or in UDP datagrams.
+
+    """
+    metrics = ('samples', 'errors', 'average', 'min', 'max', 'median',
+            'p90', 'p95', 'p99')
+    datagram_size = 1432
+
+    def __init__(self, host, port, protocol='graphite', transport='tcp',
+            **kwargs):
+        """Initialize the class.
+
+        Arguments:
+        host -- host name of the database
+        port -- port number of the database
+        protocol -- graphite or influxdb
+        transport -- tcp or udp
+
+        Keyword arguments:
+        interval -- length of the time intervals in seconds (10 by
+            default)
+        prefix -- prefix of the Graphite metric names or the InfluxDB
+            measurement name (jmeter by default)
+        delay -- number of intervals the metrics are kept open for samples
+            coming out of order (1 by default)
+        batch_size -- maximum number of lines sent at once (500 by
+            default)
+        retries -- number of retries after connection errors (3 by
+            default)
+        retry_delay -- delay in seconds before the first retry, doubled
+            after every retry (0.5 by default)
+        timeout -- socket timeout in seconds (10 by default)
+
+        """
+        if protocol not in ('graphite', 'influxdb'):
+            raise ValueError('Unknown protocol: %s' % protocol)
+        if transport not in ('tcp', 'udp'):
+            raise ValueError('Unknown transport: %s' % transport)
+        self.address = (host, port)
+        self.protocol = protocol
+        self.transport = transport
+        self.interval = kwargs.get('interval', 10)
+        self.prefix = kwargs.get('prefix', 'jmeter')
+        self.delay = kwargs.get('delay', 1)
+        self.batch_size = kwargs.get('batch_size', 500)
+        self.retries = kwargs.get('retries', 3)
+        self.retry_delay = kwargs.get('retry_delay', 0.5)
+        self.timeout = kwargs.get('timeout', 10)
+        self.intervals = {}
+        self.last = None
+        self.closed = None
+        self.lines = []
+        self.socket = None
+        self.sent = 0
+        self.dropped = 0
+
+    def add(self, sample):
+        """Add the sample to the metrics of its interval, and send the
+        metrics of the intervals which are not open any more. Samples of
+        the intervals already sent are dropped (and counted in dropped
+        attribute), as sending them again would overwrite the metrics of
+        the interval.
+
+        """
+        interval = self.interval * 1000
+        timestamp = _milliseconds(sample.timestamp - _EPOCH)
+        start = timestamp - timestamp % interval
+        if self.last is None or start > self.last:
+            self.last = start
+            for key in sorted(self.intervals):
+                if key < start - self.delay * interval:
+                    self._format(key, self.intervals.pop(key))
+                    self.closed = key
+            if self.lines:
+                self.flush()
+        if self.closed is not None and start <= self.closed:
+            self.dropped += 1
+            return
+        labels = self.intervals.get(start)
+        if labels is None:
+            labels = self.intervals[start] = {}
+        label_summary = labels.get(sample.label)
+        if label_summary is None:
+            label_summary = labels[sample.label] = _LabelSummary(0.01)
+        label_summary.add(_milliseconds(sample.elapsed_time), timestamp,
+                sample.success, sample.bytes_received)
+
+    def update(self, samples):
+        """Add all the samples to the metrics and return the exporter.
+
+        """
+        add = self.add
+        for sample in samples:
+            add(sample)
+        return self
+
+    def _format(self, start, labels):
+        """Format the metrics of the interval as lines of the protocol.
+
+        """
+        for label in sorted(labels):
+            label_summary = labels[label]
+            row = label_summary.row(label)
+            values = dict(row._asdict(), errors=label_summary.errors)
+            if self.protocol == 'graphite':
+                name = '%s.%s.' % (self.prefix, re.sub(r'[^\w-]', '_',
+                        _to_bytes(label) or '_'))
+                self.lines.extend('%s%s %s %d\n' % (name, metric,
+                        values[metric], start // 1000)
+                        for metric in self.metrics)
+            else:
+                self.lines.append('%s,label=%s %s %d\n' % (
+                        _escape_influx(self.prefix),
+                        _escape_influx(_to_bytes(label) or '_'),
+                        ','.join('%s=%s' % (metric, ('%di' % values[metric])
+                            if metric in ('samples', 'errors')
+                            else values[metric])
+                            for metric in self.metrics),
+                        start * 1000000))
+
+    def flush(self):
+        """Send the formatted lines. The lines which failed to be sent are
+        kept for the next attempt.
+
+        """
+        while self.lines:
+            batch = self.lines[:self.batch_size]
+            if self.transport == 'udp':
+                self._send_datagrams(batch)
+            else:
+                self._send(''.join(batch))
+            del self.lines[:len(batch)]
+            self.sent += len(batch)
+
+    def _send(self, data):
+        """Send the data over TCP connection, reconnecting and retrying
+        after errors.
+
+        """
+        delay = self.retry_delay
+        for attempt in range(self.retries + 1):
+            try:
+                if self.socket is None:
+                    self.socket = socket.create_connection(self.address,
+                            self.timeout)
+                self.socket.sendall(data)
+                return
+            except socket.error:
+                self._close_socket()
+                if attempt == self.retries:
+                    raise
+                time.sleep(delay)
+                delay *= 2
+
+    def _send_datagrams(self, lines):
+        """Send the lines in UDP datagrams not exceeding datagram_size
+        (unless a single line does).
+
+        """
+        if self.socket is None:
+            self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        data = ''
+        for line in lines:
+            if data and len(data) + len(line) > self.datagram_size:
+                self.socket.sendto(data, self.address)
+                data = ''
+            data += line
+        if data:
+            self.socket.sendto(data, self.address)
+
+    def _close_socket(self):
+        if self.socket is not None:
+            self.socket.close()
+            self.socket = None
+
+    def close(self):
+        """Send the metrics of all the intervals and close the connection.
+
+        """
+        for start in sorted(self.intervals):
+            self._format(start, self.intervals[start])
+            self.closed = start
+        self.intervals = {}
+        try:
+            self.flush()
+        finally:
+            self._close_socket()
+
+
+def _escape_influx(value):
+    """Escape the InfluxDB line protocol special characters in the tag
+    value or measurement name.
+
+    """
+    return re.sub(r'([ ,=\\])', r'\\\1', value)
+
+
+def process_files(sources, factory=Summary, jobs=None, **kwargs):
+    """The function that processes many results files in parallel
+    processes and merges the per-file results into one. The files are
+    distributed largest first, and small files are grouped into tasks of
+    similar total size, so the per-task overhead is shared and idle
+    processes take the next task as soon as they are done. Files which
+    fail to be processed are reported without aborting the other files.
+
+    Return the tuple of the merged result and the list of (filename,
+    error message) tuples of the files failed.
+
+    Arguments:
+    sources -- directory, glob pattern or filename (or list of them)
+    factory -- callable (e.g. class) returning new result instances with
+        update(samples) and merge(other) methods, such as Summary,
+        ErrorAnalyzer or DistinctCounter (must be picklable, e.g. a class
+        or functools.partial of a class)
+    jobs -- number of processes (the number of CPUs by default)
+
+    Keyword arguments are passed to the parser (see create_parser
+    function).
+
+    """
+    if isinstance(sources, basestring):
+        sources = [sources]
+    filenames = set()
+    for source in sources:
+        if os.path.isdir(source):
+            source = os.path.join(source, '*')
+        filenames.update(filename for filename in glob.glob(source)
+                if os.path.isfile(filename))
+    files = sorted(((os.path.getsize(filename), filename)
+            for filename in filenames), reverse=True)
+    jobs = jobs or multiprocessing.cpu_count()
+    task_size = sum(size for size, filename in files) / (jobs * 4) or 1
+    tasks = []
+    task = []
+    task_bytes = 0
+    for size, filename in files:
+        task.append(filename)
+        task_bytes += size
+        if task_bytes >= task_size:
+            tasks.append((factory, task, kwargs))
+            task = []
+            task_bytes = 0
+    if task:
+        tasks.append((factory, task, kwargs))
+    result = factory()
+    failures = []
+    if jobs > 1 and len(tasks) > 1:
+        pool = multiprocessing.Pool(min(jobs, len(tasks)))
+        try:
+            task_results = list(pool.imap_unordered(_process_task, tasks))
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        task_results = [_process_task(task) for task in tasks]
+    for task_result, task_failures in task_results:
+        result.merge(task_result)
+        failures.extend(task_failures)
+    failures.sort()
+    return result, failures
+
+
+def _process_task(task):
+    """Process the group of results files and return the tuple of the
+    merged result and the list of failures.
+
+    """
+    factory, filenames, kwargs = task
+    result = factory()
+    failures = []
+    for filename in filenames:
+        try:
+            file_result = factory()
+            file_result.update(create_parser(filename,
+                    **kwargs).itersamples())
+        except Exception as e:
+            failures.append((filename, '%s: %s' % (type(e).__name__, e)))
+        else:
+            result.merge(file_result)
+    return result, failures
+
+
+def fanout(source, consumers, batch_size=1000, workers=None, depth=4):
+    """The function that parses the results once and dispatches the
+    batches of samples to all the consumers. Consumers are either objects
+    with update(samples) method (such as Summary, ErrorAnalyzer,
+    DistinctCounter, RollingStats or MetricsExporter) or callables, which
+    are called with the lists of samples. Return the list of consumers
+    (in process mode, the copies updated in the worker processes).
+
+    Arguments:
+    source -- parser or iterable of Sample class instances
+    consumers -- list of consumers
+    batch_size -- number of samples dispatched at once
+    workers -- None to run the consumers in the calling thread, thread
+        to run every consumer in its own thread or process to run every
+        consumer in its own process (the batches are pickled)
+    depth -- maximum number of batches queued for every consumer (the
+        parsing blocks when a queue is full)
+
+    Errors raised by the consumers are raised after all the workers have
+    finished. In process mode, they are raised as RuntimeError with the
+    type, message and traceback of the original error (which may not be
+    picklable), as are the exits of the worker processes which have not
+    returned their consumers (e.g. killed by the system).
+
+    """
+    if hasattr(source, 'iterbatches'):
+        batches = source.iterbatches(batch_size)
+    else:
+        samples = iter(source)
+        batches = iter(lambda: list(islice(samples, batch_size)), [])
+    consumers = list(consumers)
+    if workers is None:
+        for batch in batches:
+            for consumer in consumers:
+                _consume(consumer, batch)
+        return consumers
+    if workers == 'thread':
+        queue_class, worker_class = Queue.Queue, threading.Thread
+        results = Queue.Queue()
+    elif workers == 'process':
+        queue_class, worker_class = multiprocessing.Queue, \
+                multiprocessing.Process
+        results = multiprocessing.Queue()
+    else:
+        raise ValueError('Unknown workers type: %s' % workers)
+    queues = [queue_class(depth) for consumer in consumers]
+    threads = [worker_class(target=_consume_queue, args=(index, consumer,
+            queue, results, workers == 'process'))
+            for index, (consumer, queue) in enumerate(zip(consumers, queues))]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    errors = {}
+    try:
+        for batch in batches:
+            for index, queue in enumerate(queues):
+                if index not in errors:
+                    _put_batch(queue, batch, threads[index], errors, index)
+            if errors:
+                break
+    finally:
+        for index, queue in enumerate(queues):
+            if index not in errors:
+                _put_batch(queue, None, threads[index], errors, index)
+        pending = set(range(len(threads))) - set(errors)
+        while pending:
+            try:
+                index, consumer, error = results.get(timeout=0.1)
+            except Queue.Empty:
+                exited = [index for index in pending
+                        if not threads[index].is_alive()]
+                if exited and not _get_results(results, consumers, errors,
+                        pending, workers):
+                    for index in exited:
+                        pending.discard(index)
+                        errors[index] = _exit_error(threads[index])
+                continue
+            _set_result(consumers, errors, pending, workers, index, consumer,
+                    error)
+        for thread in threads:
+            thread.join()
+    if errors:
+        index = min(errors)
+        error = errors[index]
+        if isinstance(error, tuple):
+            raise RuntimeError('Consumer %d failed: %s: %s\n%s' % ((index, )
+                    + error))
+        raise error
+    return consumers
+
+
+def _put_batch(queue, batch, thread, errors, index):
+    """Put the batch to the queue of the consumer, checking that the
+    consumer's worker is still alive while the queue is full.
+
+    """
+    while True:
+        try:
+            queue.put(batch, timeout=0.1)
+            return
+        except Queue.Full:
+            if not thread.is_alive():
+                errors[index] = _exit_error(thread)
+                return
+
+
+def _exit_error(thread):
+    """Return the error of the worker which exited without the result.
+
+    """
+    return ('WorkerExited', 'worker exited with code %s' % getattr(thread,
+            'exitcode', None), '')
+
+
+def _get_results(results, consumers, errors, pending, workers):
+    """Get the results already queued and return True if there were any.
+
+    """
+    found = False
+    while True:
+        try:
+            item = results.get(timeout=0.1)
+        except Queue.Empty:
+            return found
+        found = True
+        _set_result(consumers, errors, pending, workers, *item)
+
+
+def _set_result(consumers, errors, pending, workers, index, consumer,
+        error):
+    """Store the result of the consumer received from its worker.
+
+    """
+    pending.discard(index)
+    if consumer is not None:
+        consumers[index] = (cPickle.loads(consumer)
+                if workers == 'process' else consumer)
+    if error is not None:
+        errors[index] = error
+
+
+def _consume(consumer, batch):
+    """Pass the batch of samples to the consumer.
+
+    """
+    update = getattr(consumer, 'update', None)
+    if update is None:
+        consumer(batch)
+    else:
+        update(batch)
+
+
+def _consume_queue(index, consumer, queue, results, pickled):
+    """Pass the batches from the queue to the consumer until None is
+    received and put the result (the tuple of the consumer index, the
+    consumer, pickled explicitly if requested, and the exception raised)
+    to the results queue (the thread or process target of fanout
+    function). After an exception, the queue is still drained so the
+    parsing does not block.
+
+    """
+    error = None
+    for batch in iter(queue.get, None):
+        if error is None:
+            try:
+                _consume(consumer, batch)
+            except Exception as e:
+                error = _describe_error(e) if pickled else e
+    if pickled:
+        try:
+            consumer = cPickle.dumps(consumer, cPickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            consumer = None
+            error = error or _describe_error(e)
+    results.put((index, consumer, error))
+
+
+def _describe_error(error):
+    """Return the tuple of the type name, message and traceback text of the
+    exception being handled, which (unlike the exception) can always be
+    pickled.
+
+    """
+    try:
+        message = str(error)
+    except UnicodeError:
+        message = _to_bytes(unicode(error))
+    return type(error).__name__, message, traceback.format_exc()
+
+
+class _Run(object):
+    """The class that holds the results file loaded into memory in compact
+    columnar form: timestamps, elapsed times, bytes received and success
+    flags in arrays, labels and response codes as indexes into the lists
+    of distinct values. Time series computed are memoized, and their
+    estimated size is included in the size of the run.
+
+    """
+    point_size = 1536
+
+    def __init__(self, filename, **kwargs):
+        stat = os.stat(filename)
+        self.identity = (stat.st_size, stat.st_mtime)
+        self.labels = []
+        self.response_codes = []
+        self.timestamps = array('d')
+        self.elapsed = array('l')
+        self.received = array('l')
+        self.success = array('b')
+        self.label_codes = array('l')
+        self.response_code_codes = array('l')
+        self.series = {}
+        self.series_size = 0
+        self.lock = threading.Lock()
+        labels = {}
+        response_codes = {}
+        self.summary = Summary()
+        for columns in create_parser(filename,
+                **kwargs).iterbatches(columnar=True):
+            timestamps = [_milliseconds(timestamp - _EPOCH)
+                    for timestamp in columns['timestamp']]
+            elapsed = [_milliseconds(elapsed)
+                    for elapsed in columns['elapsed_time']]
+            self.timestamps.extend(timestamps)
+            self.elapsed.extend(elapsed)
+            self.received.extend(columns['bytes_received'])
+            self.success.extend(columns['success'])
+            for values, codes, column in ((labels, self.label_codes,
+                    columns['label']), (response_codes,
+                    self.response_code_codes, columns['response_code'])):
+                setdefault = values.setdefault
+                codes.extend([setdefault(value, len(values))
+                        for value in column])
+            for sample_values in zip(columns['label'], elapsed, timestamps,
+                    columns['success'], columns['bytes_received']):
+                self._add_to_summary(*sample_values)
+        for values, names in ((labels, self.labels),
+                (response_codes, self.response_codes)):
+            names.extend(sorted(values, key=values.get))
+        self.columns_size = sum(len(column) * column.itemsize
+                for column in (self.timestamps, self.elapsed, self.received,
+                    self.success, self.label_codes,
+                    self.response_code_codes)) + sum(len(value) + 64
+                for value in self.labels + self.response_codes)
+
+    @property
+    def size(self):
+        """Estimated memory used by the run in bytes.
+
+        """
+        return self.columns_size + self.series_size
+
+    def clear_series(self):
+        """Drop the memoized time series.
+
+        """
+        with self.lock:
+            self.series = {}
+            self.series_size = 0
+
+    def _add_to_summary(self, label, elapsed, start, success, received):
+        summary = self.summary
+        label_summary = summary.labels.get(label)
+        if label_summary is None:
+            label_summary = summary.labels[label] = _LabelSummary(
+                    summary.accuracy)
+        label_summary.add(elapsed, start, success, received)
+        summary.total.add(elapsed, start, success, received)
+
+    def filter(self, label=None, errors=False, successes=False, start=None,
+            end=None, limit=100):
+        """Return the list of samples (as dictionaries) matching the
+        filters.
+
+        """
+        pattern = re.compile(label) if label else None
+        label_codes = set(code for code, name in enumerate(self.labels)
+                if pattern is None or pattern.search(name))
+        samples = []
+        for index, timestamp in enumerate(self.timestamps):
+            if (self.label_codes[index] not in label_codes or
+                    errors and self.success[index] or
+                    successes and not self.success[index] or
+                    start is not None and timestamp < start or
+                    end is not None and timestamp >= end):
+                continue
+            samples.append({'bytes': self.received[index],
+                    'elapsed': self.elapsed[index],
+                    'label': self.labels[self.label_codes[index]],
+                    'responseCode': self.response_codes[
+                        self.response_code_codes[index]],
+                    'success': bool(self.success[index]),
+                    'timeStamp': int(timestamp)})
+            if len(samples) >= limit:
+                break
+        return samples
+
+    def timeseries(self, interval, label=None):
+        """Return the list of time series points (as dictionaries) with
+        the samples count, errors count, average and percentiles of
+        elapsed time per time interval (in seconds). The series is
+        computed outside of the lock, which guards the memoized series
+        only.
+
+        """
+        key = (interval, label)
+        with self.lock:
+            series = self.series.get(key)
+        if series is not None:
+            return series
+        code = self.labels.index(label) if label in self.labels else -1
+        interval *= 1000
+        points = {}
+        for index, timestamp in enumerate(self.timestamps):
+            if label is not None and self.label_codes[index] != code:
+                continue
+            start = int(timestamp - timestamp % interval)
+            point = points.get(start)
+            if point is None:
+                point = points[start] = _LabelSummary(0.01)
+            point.add(self.elapsed[index], timestamp,
+                    self.success[index], self.received[index])
+        series = [dict(point.row(label)._asdict(), errors=point.errors,
+                timeStamp=start)
+                for start, point in sorted(points.iteritems())]
+        with self.lock:
+            # the same series may have been memoized by another thread
+            if key in self.series:
+                return self.series[key]
+            self.series[key] = series
+            self.series_size += (len(series) + 1) * self.point_size
+        return series
+
+
+class _AnalysisHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """The class that handles the analysis server HTTP requests.
+
+    """
+    def do_GET(self):
+        url = urlparse.urlparse(self.path)
+        query = dict(urlparse.parse_qsl(url.query))
+        try:
+            if url.path == '/runs':
+                result = self.server.runs()
+            else:
+                filename = query.pop('file', None)
+                if not filename or url.path not in ('/summary', '/filter',
+                        '/timeseries'):
+                    return self._send(404, {'error': 'Not found'})
+                run = self.server.get_run(filename)
+                if url.path == '/summary':
+                    result = [row._asdict() for row in run.summary.rows()]
+                elif url.path == '/filter':
+                    result = run.filter(label=query.get('label'),
+                            errors=query.get('errors') == '1',
+                            successes=query.get('successes') == '1',
+                            start=_get_int(query, 'start'),
+                            end=_get_int(query, 'end'),
+                            limit=_get_int(query, 'limit') or 100)
+                else:
+                    result = run.timeseries(_get_int(query, 'interval') or
+                            60, query.get('label'))
+                    self.server.trim()
+        except (IOError, OSError) as e:
+            return self._send(404, {'error': str(e)})
+        except Exception as e:
+            return self._send(400, {'error': '%s: %s' % (type(e).__name__,
+                    e)})
+        self._send(200, result)
+
+    def _send(self, status, result):
+        data = json.dumps(result)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            BaseHTTPServer.BaseHTTPRequestHandler.log_message(self, format,
+                    *args)
+
+
+def _get_int(query, name):
+    value = query.get(name)
+    return int(value) if value else None
+
+
+class AnalysisServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """The HTTP server which loads the results files once into compact
+    in-memory columns and answers the queries about them. The runs loaded
+    are kept in the least recently used order, and the least recently
+    used ones are dropped when the memory budget is exceeded (including
+    the memoized time series); the files changed since loading are
+    reloaded. Files are loaded outside of the server lock, so other
+    requests are answered meanwhile, and concurrent requests for the file
+    being loaded wait for the single load. Responses are JSON documents:
+
+    /runs -- loaded runs
+    /summary?file=FILE -- aggregate report rows
+    /filter?file=FILE[&label=REGEX][&errors=1][&successes=1][&start=MS]
+        [&end=MS][&limit=N] -- samples matching the filters
+    /timeseries?file=FILE[&interval=SECONDS][&label=LABEL] -- time
+        series of samples counts, errors counts and elapsed time
+
+    """
+    daemon_threads = True
+
+    def __init__(self, address=('127.0.0.1', 0), root='.',
+            memory=512 * 1024 * 1024, verbose=False, **kwargs):
+        """Initialize the class.
+
+        Arguments:
+        address -- (host, port) tuple to listen at (an arbitrary local
+            port by default)
+        root -- directory the results files are looked up in (files
+            outside of it are not served)
+        memory -- memory budget of the loaded runs in bytes
+        verbose -- log the requests
+
+        Keyword arguments are passed to the parser (see create_parser
+        function).
+
+        """
+        BaseHTTPServer.HTTPServer.__init__(self, address, _AnalysisHandler)
+        self.root = os.path.realpath(root)
+        self.memory = memory
+        self.verbose = verbose
+        self.kwargs = kwargs
+        self.loaded = OrderedDict()
+        self.loading = {}
+        self.lock = threading.Lock()
+
+    def get_run(self, filename):
+        """Return the run of the results file (relative to the root
+        directory), loading it if required.
+
+        """
+        path = os.path.realpath(os.path.join(self.root, filename))
+        if not path.startswith(os.path.join(self.root, '')):
+            raise IOError('File is outside of the root directory: %s' %
+                    filename)
+        stat = os.stat(path)
+        identity = (stat.st_size, stat.st_mtime)
+        with self.lock:
+            run = self.loaded.pop(path, None)
+            if run is not None and run.identity == identity:
+                self.loaded[path] = run
+                return run
+            loading = self.loading.get(path)
+            owner = loading is None or loading[0] != identity
+            if owner:
+                loading = self.loading[path] = (identity, threading.Event(),
+                        [])
+        identity, loaded, result = loading
+        if owner:
+            try:
+                result.append((_Run(path, **self.kwargs), None))
+            except Exception as e:
+                result.append((None, e))
+            with self.lock:
+                if self.loading.get(path) is loading:
+                    del self.loading[path]
+                if result[0][0] is not None:
+                    self.loaded.pop(path, None)
+                    self.loaded[path] = result[0][0]
+            loaded.set()
+            self.trim()
+        else:
+            loaded.wait()
+        run, error = result[0]
+        if error is not None:
+            raise error
+        return run
+
+    def trim(self):
+        """Drop the least recently used runs (or the memoized time series
+        of the last run) while the memory budget is exceeded.
+
+        """
+        with self.lock:
+            size = sum(run.size for run in self.loaded.itervalues())
+            while size > self.memory and len(self.loaded) > 1:
+                size -= self.loaded.popitem(last=False)[1].size
+            if size > self.memory:
+                for run in self.loaded.itervalues():
+                    run.clear_series()
+
+    def runs(self):
+        """Return the list of loaded runs (as dictionaries) in the least
+        recently used order.
+
+        """
+        with self.lock:
+            return [{'file': os.path.relpath(path, self.root),
+                    'samples': len(run.timestamps), 'size': run.size}
+                    for path, run in self.loaded.iteritems()]
+
+
+def _get_predicate(options):
+    """Return the function which checks whether the sample passes the
+    command line filters.
+
+    """
+    label = re.compile(options.label) if options.label else None
+    def predicate(sample):
+        if label is not None and not label.search(sample.label):
+            return False
+        if options.errors and sample.success:
+            return False
+        if options.successes and not sample.success:
+            return False
+        if options.start is not None or options.end is not None:
+            timestamp = _milliseconds(sample.timestamp - _EPOCH)
+            if options.start is not None and timestamp < options.start:
+                return False
+            if options.end is not None and timestamp >= options.end:
+                return False
+        return True
+    return predicate
+
+
+def _get_output(options, filename):
+    """Return the output filename for the input file.
+
+    """
+    if len(options.files) > 1 or os.path.isdir(options.output):
+        name = os.path.splitext(os.path.basename(filename))[0]
+        return os.path.join(options.output, '%s.%s' % (name,
+                options.format or 'csv'))
+    return options.output
+
+
+def _run_command(task):
+    """Run the command on the single results file and return the tuple of
+    the result and the number of samples processed.
+
+    """
+    options, filename = task
+    accuracy = None if getattr(options, 'exact', False) else 0.01
+    if options.command == 'summarize' and (options.cache or
+            options.growing):
+        summary = summarize(filename, cache=options.cache,
+                accuracy=accuracy, growing=options.growing,
+                delimiter=options.delimiter, prefetch=options.prefetch)
+        return summary, summary.total.samples
+    parser = create_parser(filename, delimiter=options.delimiter,
+            prefetch=options.prefetch)
+    samples = parser.itersamples()
+    if options.command == 'summarize':
+        summary = Summary(accuracy).update(samples)
+        return summary, summary.total.samples
+    if options.command == 'filter':
+        predicate = _get_predicate(options)
+        samples = (sample for sample in samples if predicate(sample))
+    output = _get_output(options, filename)
+    format = options.format or ('xml' if output.lower().endswith('.xml')
+            else 'csv')
+    writer_class = {'csv': CSVWriter, 'xml': XMLWriter}[format]
+    writer = writer_class(output, fields=options.fields)
+    try:
+        return None, writer.writesamples(samples)
+    finally:
+        writer.close()
+
+
+def _format_summary(summary, options):
+    """Return the aggregate report as a text table or CSV.
+
+    """
+    header = ('Label', '# Samples', 'Average', 'Median', '90% Line',
+            '95% Line', '99% Line', 'Min', 'Max', 'Error %', 'Throughput',
+            'Received KB/sec')
+    rows = [header]
+    for row in summary.rows():
+        if not row.samples:
+            continue
+        rows.append(('TOTAL' if row.label is None else _to_bytes(row.label),
+                str(row.samples), '%.0f' % row.average,
+                '%.0f' % row.median, '%.0f' % row.p90, '%.0f' % row.p95,
+                '%.0f' % row.p99, str(row.min), str(row.max),
+                '%.2f%%' % (row.error_rate * 100), '%.1f/sec' % row.throughput,
+                '%.2f' % row.received_rate))
+    if options.csv:
+        lines = []
+        writer = csv.writer(_LinesWriter(lines), lineterminator='')
+        writer.writerows(rows)
+        return '\n'.join(lines) + '\n'
+    widths = [max(len(row[i]) for row in rows) for i in range(len(header))]
+    return ''.join(['  '.join([row[0].ljust(widths[0])] + [value.rjust(width)
+            for value, width in zip(row[1:], widths[1:])]) + '\n'
+            for row in rows])
+
+
+def _format_comparison(rows, options):
+    """Return the comparison of runs as a text table.
+
+    """
+    header = ('Label', 'Baseline %g%%' % options.percentile,
+            'Candidate %g%%' % options.percentile, 'Change', 'P-value',
+            'Baseline Error %', 'Candidate Error %', 'Verdict')
+    lines = [header]
+    for row in rows:
+        values = [_to_bytes('TOTAL' if row.label is None else row.label)]
+        for value in (row.baseline_percentile, row.candidate_percentile):
+            values.append('%.0f' % value if value is not None else '-')
+        values.append('%+.1f%%' % (row.change * 100)
+                if row.change is not None else '-')
+        values.append('%.3f' % row.p_value
+                if row.p_value is not None else '-')
+        for summary_row in (row.baseline, row.candidate):
+            values.append('%.2f%%' % (summary_row.error_rate * 100)
+                    if summary_row else '-')
+        values.append('REGRESSION' if row.regression else 'ok')
+        lines.append(values)
+    widths = [max(len(line[i]) for line in lines)
+            for i in range(len(header))]
+    return ''.join(['  '.join([line[0].ljust(widths[0])] + [value.rjust(
+            width) for value, width in zip(line[1:], widths[1:])]) + '\n'
+            for line in lines])
+
+
+def _format_change(change):
+    """Return the change point as a line of text.
+
+    """
+    if change.metric == 'error_rate':
+        values = '%.2f%% -> %.2f%%' % (change.baseline * 100,
+                change.value * 100)
+    else:
+        values = '%.0f ms -> %.0f ms' % (change.baseline, change.value)
+    return '%s  %s  %s %s: %s\n' % (change.timestamp.isoformat(' '),
+            _to_bytes(change.label), change.metric.replace('_', ' '),
+            change.direction, values)
+
+
+class _LinesWriter(object):
+    """The file-like class that collects written lines into the list.
+
+    """
+    def __init__(self, lines):
+        self.write = lines.append
+
+
+def _get_arguments_parser():
+    """Return the command line arguments parser.
+
+    """
+    parser = argparse.ArgumentParser(prog='python -m jtl',
+            description='Process JMeter results (JTL) files.')
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('files', nargs='+', metavar='FILE',
+            help='results file')
+    common.add_argument('-j', '--jobs', type=int, default=1,
+            help='number of files processed in parallel (0 for the number '
+                'of CPUs); each file is parsed by a single process, so a '
+                'single large file does not benefit')
+    common.add_argument('--delimiter', default=',',
+            help='custom delimiter character (CSV only)')
+    common.add_argument('--prefetch', type=int, default=0, metavar='DEPTH',
+            help='number of 1 MB buffers read ahead in a background thread '
+                '(0 to disable)')
+    output = argparse.ArgumentParser(add_help=False)
+    output.add_argument('-o', '--output', required=True,
+            help='output file (or directory for multiple input files)')
+    output.add_argument('--format', choices=('csv', 'xml'),
+            help='output format (determined by the output file extension by '
+                'default)')
+    output.add_argument('--fields', type=lambda value: value.split(','),
+            help='comma-separated names of sample fields to be written')
+    commands = parser.add_subparsers(dest='command')
+    summarize = commands.add_parser('summarize', parents=[common],
+            help='print the aggregate report')
+    summarize.add_argument('--csv', action='store_true',
+            help='print the report as CSV')
+    summarize.add_argument('--exact', action='store_true',
+            help='compute exact percentiles (counting every millisecond '
+                'value) instead of estimating them')
+    summarize.add_argument('--cache', action='store_true',
+            help='reuse the report of the data processed before (saved '
+                'alongside the results files), parsing appended data only')
+    summarize.add_argument('--growing', action='store_true',
+            help='the files are still being written: leave incomplete last '
+                'samples for the next run')
+    compare = commands.add_parser('compare', parents=[common],
+            help='compare the run with the baseline run (exit status is 1 '
+                'on regression)')
+    compare.add_argument('-b', '--baseline', action='append', required=True,
+            metavar='FILE', help='results file of the baseline run (repeat '
+                'the option for several files)')
+    compare.add_argument('--percentile', type=float, default=95,
+            help='percentile of elapsed time to compare')
+    compare.add_argument('--threshold', type=float, default=10,
+            help='maximum increase of the percentile (%%)')
+    compare.add_argument('--error-threshold', type=float, default=1,
+            help='maximum increase of the error rate (percentage points)')
+    compare.add_argument('--alpha', type=float, default=0.05,
+            help='significance level of the tests')
+    compare.add_argument('--exact', action='store_true',
+            help='compare exact percentiles instead of estimated ones')
+    serve = commands.add_parser('serve',
+            help='serve the analysis of the results files over HTTP')
+    serve.add_argument('--host', default='127.0.0.1',
+            help='host to listen at')
+    serve.add_argument('--port', type=int, default=8080,
+            help='port to listen at')
+    serve.add_argument('--root', default='.',
+            help='directory of the results files')
+    serve.add_argument('--memory', type=int, default=512,
+            help='memory budget of the loaded results files (MB)')
+    serve.add_argument('--delimiter', default=',',
+            help='custom delimiter character (CSV only)')
+    watch = commands.add_parser('watch',
+            help='print changes of elapsed time and error rate of labels '
+                '(exit status is 1 if any)')
+    watch.add_argument('file', metavar='FILE', help='results file')
+    watch.add_argument('-f', '--follow', action='store_true',
+            help='keep reading the samples appended to the file')
+    watch.add_argument('--timeout', type=float,
+            help='time without new samples after which following stops '
+                '(seconds)')
+    watch.add_argument('--threshold', type=float,
+            help='threshold of the cumulative sums of deviations (the '
+                'ChangeDetector default by default)')
+    watch.add_argument('--warmup', type=int,
+            help='number of samples of the label used to estimate the '
+                'baseline (the ChangeDetector default by default)')
+    watch.add_argument('--delimiter', default=',',
+            help='custom delimiter character (CSV only)')
+    commands.add_parser('convert', parents=[common, output],
+            help='convert results to another format')
+    filter = commands.add_parser('filter', parents=[common, output],
+            help='write the samples matching the filters')
+    filter.add_argument('--label', help='regular expression for labels')
+    filter.add_argument('--errors', action='store_true',
+            help='failed samples only')
+    filter.add_argument('--successes', action='store_true',
+            help='successful samples only')
+    filter.add_argument('--start', type=int,
+            help='minimum timestamp (ms since epoch)')
+    filter.add_argument('--end', type=int,
+            help='maximum timestamp (ms since epoch, exclusive)')
+    return parser
+
+
+def main(argv=None):
+    """The command line entry point. Process the results files (in
+    parallel when requested), print the results and throughput statistics
+    and return the exit status.
+
+    """
+    arguments_parser = _get_arguments_parser()
+    options = arguments_parser.parse_args(argv)
+    if options.command == 'serve':
+        server = AnalysisServer((options.host, options.port),
+                root=options.root, memory=options.memory * 1024 * 1024,
+                verbose=True, delimiter=options.delimiter)
+        sys.stderr.write('Serving %s at http://%s:%d/\n' % ((options.root, )
+                + server.server_address))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+        return 0
+    if options.command == 'watch':
+        detector = ChangeDetector(**dict((name, value) for name, value in
+                (('threshold', options.threshold),
+                    ('warmup', options.warmup)) if value is not None))
+        if options.follow:
+            samples = follow(options.file, timeout=options.timeout,
+                    delimiter=options.delimiter)
+        else:
+            samples = create_parser(options.file,
+                    delimiter=options.delimiter).itersamples()
+        status = 0
+        try:
+            for change in detector.detect(samples):
+                sys.stdout.write(_format_change(change))
+                sys.stdout.flush()
+                status = 1
+        except KeyboardInterrupt:
+            pass
+        return status
+    for filename in options.files + (options.baseline
+            if options.command == 'compare' else []):
+        if not os.path.isfile(filename):
+            arguments_parser.error('input file not found: %s' % filename)
+    if options.command == 'compare':
+        rows = compare(options.baseline, options.files,
+                percent=options.percentile, threshold=options.threshold / 100,
+                error_threshold=options.error_threshold / 100,
+                alpha=options.alpha, jobs=options.jobs or None,
+                accuracy=None if options.exact else 0.01,
+                delimiter=options.delimiter, prefetch=options.prefetch)
+        sys.stdout.write(_format_comparison(rows, options))
+        return 1 if any(row.regression for row in rows) else 0
+    if options.command != 'summarize':
+        outputs = [_get_output(options, filename)
+                for filename in options.files]
+        if len(set(outputs)) < len(outputs):
+            arguments_parser.error('input files have clashing names')
+        if len(outputs) > 1 and not os.path.isdir(options.output):
+            os.makedirs(options.output)
+    jobs = options.jobs or multiprocessing.cpu_count()
+    files = sorted(options.files, key=os.path.getsize, reverse=True)
+    tasks = [(options, filename) for filename in files]
+    started = time.time()
+    if jobs > 1 and len(tasks) > 1:
+        pool = multiprocessing.Pool(min(jobs, len(tasks)))
+        try:
+            results = list(pool.imap_unordered(_run_command, tasks))
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = [_run_command(task) for task in tasks]
+    duration = max(time.time() - started, 1e-6)
+    if options.command == 'summarize':
+        summary = Summary(None if options.exact else 0.01)
+        for result, processed in results:
+            summary.merge(result)
+        sys.stdout.write(_format_summary(summary, options))
+    processed = sum(processed for result, processed in results)
+    size = sum(os.path.getsize(filename) for filename in files)
+    sys.stderr.write('Processed %d samples from %d file(s) (%.1f MB) in '
+            '%.2f s: %.0f samples/s, %.1f MB/s\n' % (processed, len(files),
+            size / 1048576.0, duration, processed / duration,
+            size / 1048576.0 / duration))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
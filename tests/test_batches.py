@@ -0,0 +1,91 @@
+# Copyright (C) 2012-2016 Victor Klepikovskiy
+#
+# This file is part of python-jtl.
+#
+# python-jtl is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# python-jtl is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-jtl. If not, see <http://www.gnu.org/licenses/>.
+
+
+import jtl
+import os.path
+import unittest
+
+
+class BatchesTestCase(unittest.TestCase):
+    """Testing batched iteration.
+
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.tests_dir = os.path.dirname(os.path.abspath(__file__))
+
+    def check_batches(self, samples_filename):
+        """Check that batches contain the same samples as the per-sample
+        iteration.
+
+        """
+        samples = list(jtl.create_parser(samples_filename).itersamples())
+        parser = jtl.create_parser(samples_filename)
+        batches = list(parser.iterbatches(2))
+        self.assertEqual([len(batch) for batch in batches],
+                [2] * (len(samples) // 2) + [1] * (len(samples) % 2))
+        self.assertEqual(sum(batches, []), samples)
+
+        parser = jtl.create_parser(samples_filename)
+        columns = next(parser.iterbatches(2, columnar=True))
+        self.assertEqual(sorted(columns), sorted(jtl.Sample._fields))
+        self.assertEqual(columns['label'], [s.label for s in samples[:2]])
+        self.assertEqual(list(jtl.create_parser(samples_filename,
+                position=parser.position).itersamples()), samples[2:])
+
+    def test_xml(self):
+        """Test XML parser.
+
+        """
+        self.check_batches(os.path.join(self.tests_dir, 'samples/main.xml'))
+        self.check_batches(os.path.join(self.tests_dir, 'samples/nested.xml'))
+
+    def test_csv(self):
+        """Test CSV parser.
+
+        """
+        self.check_batches(os.path.join(self.tests_dir, 'samples/main.csv'))
+
+    def test_converters(self):
+        """Test that CSV rows converted by position match the samples
+        converted from the dictionaries of column values.
+
+        """
+        for name in ('main.csv', 'minimized.csv'):
+            parser = jtl.create_parser(
+                    os.path.join(self.tests_dir, 'samples', name))
+            with parser._open() as fp:
+                fieldnames, reader = parser._get_reader(fp)
+                rows = [values for values in reader if values]
+            expected = [parser._get_sample(dict(zip(fieldnames, values)))
+                    for values in rows]
+            convert = parser._get_converter(fieldnames)
+            self.assertEqual(map(convert, rows), expected)
+            convert_batch = parser._get_batch_converter(fieldnames)
+            self.assertEqual(convert_batch(rows), expected)
+            self.assertEqual(convert_batch(rows, columnar=True),
+                    jtl._get_columns(expected))
+            # rows with unexpected number of values
+            rows[0] = rows[0][:-1]
+            expected[0] = parser._get_sample(dict(zip(fieldnames, rows[0])))
+            self.assertEqual(convert(rows[0]), expected[0])
+            self.assertEqual(convert_batch(rows), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+# Copyright (C) 2012-2016 Victor Klepikovskiy
+#
+# This file is part of python-jtl.
+#
+# python-jtl is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# python-jtl is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-jtl. If not, see <http://www.gnu.org/licenses/>.
+
+
+import jtl
+import os.path
+import shutil
+import tempfile
+import unittest
+
+
+class BulkTestCase(unittest.TestCase):
+    """Testing parallel processing of many results files.
+
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.tests_dir = os.path.dirname(os.path.abspath(__file__))
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        for index in range(10):
+            for name in ('main.csv', 'main.xml', 'nested.xml'):
+                shutil.copy(os.path.join(self.tests_dir, 'samples', name),
+                        os.path.join(self.temp_dir, '%d-%s' % (index, name)))
+        with open(os.path.join(self.temp_dir, 'broken.xml'), 'wb') as fp:
+            fp.write('<?xml version="1.0"?>\n<testResults>\n<sample')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_summary(self):
+        """Test merging summaries and reporting failures.
+
+        """
+        for jobs in (1, 3):
+            summary, failures = jtl.process_files(self.temp_dir, jobs=jobs)
+            self.assertEqual(summary.total.samples, 10 * (3 + 5 + 2))
+            self.assertEqual(len(failures), 1)
+            self.assertEqual(failures[0][0],
+                    os.path.join(self.temp_dir, 'broken.xml'))
+            self.assertTrue(failures[0][1].startswith('ParseError: '))
+
+    def test_glob(self):
+        """Test glob patterns and other result classes.
+
+        """
+        counter, failures = jtl.process_files([os.path.join(self.temp_dir,
+                '1-*.csv'), os.path.join(self.temp_dir, '2-*.csv')],
+                factory=jtl.ErrorAnalyzer, jobs=2)
+        self.assertEqual(failures, [])
+        self.assertEqual([error.count for error in counter.top()], [2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+# Copyright (C) 2012-2016 Victor Klepikovskiy
+#
+# This file is part of python-jtl.
+#
+# python-jtl is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# python-jtl is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-jtl. If not, see <http://www.gnu.org/licenses/>.
+
+
+import cPickle
+import jtl
+import os.path
+import shutil
+import tempfile
+import unittest
+
+
+class CacheTestCase(unittest.TestCase):
+    """Testing incremental aggregate report with the cache.
+
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.tests_dir = os.path.dirname(os.path.abspath(__file__))
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def check_growing(self, samples_filename, split):
+        """Check that the report of the file written in two parts matches
+        the report of the whole file.
+
+        """
+        with open(os.path.join(self.tests_dir, 'samples', samples_filename),
+                'rb') as fp:
+            data = fp.read()
+        filename = os.path.join(self.temp_dir, samples_filename)
+        with open(filename, 'wb') as fp:
+            fp.write(data[:split])
+        first = jtl.summarize(filename, cache=True, growing=True)
+        self.assertTrue(os.path.exists(filename + '.summary'))
+        with open(filename, 'ab') as fp:
+            fp.write(data[split:])
+        rows = jtl.summarize(filename, cache=True, growing=True).rows()
+        self.assertEqual(rows, jtl.summarize(filename).rows())
+        self.assertEqual(rows, jtl.summarize(filename, cache=True).rows())
+        return first, rows
+
+    def test_csv(self):
+        """Test CSV file with incomplete last line.
+
+        """
+        first, rows = self.check_growing('main.csv', 700)
+        self.assertEqual(first.total.samples, 2)
+        self.assertEqual(rows[-1].samples, 3)
+
+    def test_xml(self):
+        """Test XML file with incomplete last sample.
+
+        """
+        first, rows = self.check_growing('main.xml', 11000)
+        self.assertEqual(first.total.samples, 3)
+        self.assertEqual(rows[-1].samples, 5)
+
+    def test_rewritten(self):
+        """Test that the cache is discarded when the file is rewritten.
+
+        """
+        filename = os.path.join(self.temp_dir, 'main.csv')
+        shutil.copy(os.path.join(self.tests_dir, 'samples/main.csv'),
+                filename)
+        self.assertEqual(jtl.summarize(filename, cache=True).total.samples,
+                3)
+        with open(filename, 'rb') as fp:
+            data = fp.read()
+        with open(filename, 'wb') as fp:
+            fp.write(data.replace(',1152,', ',1153,'))
+        self.assertEqual(jtl.summarize(filename, cache=True).total.sketch.max,
+                1153)
+        self.assertEqual(jtl.summarize(filename, cache=True,
+                accuracy=0.05).total.samples, 3)
+
+    def test_finished(self):
+        """Test CSV file without the line break after the last line.
+
+        """
+        filename = os.path.join(self.temp_dir, 'main.csv')
+        with open(os.path.join(self.tests_dir, 'samples/main.csv'),
+                'rb') as fp:
+            data = fp.read().rstrip('\r\n')
+        with open(filename, 'wb') as fp:
+            fp.write(data)
+        self.assertEqual(jtl.summarize(filename, cache=True).total.samples,
+                3)
+        self.assertEqual(jtl.summarize(filename, growing=True).total.samples,
+                2)
+        self.assertFalse(os.path.exists(os.path.join(self.temp_dir,
+                'missing')))
+        self.assertEqual(jtl.summarize(filename, cache=os.path.join(
+                self.temp_dir, 'missing', 'main.summary')).total.samples, 3)
+
+    def test_corrupted(self):
+        """Test that XML errors before the end of the file are raised.
+
+        """
+        filename = os.path.join(self.temp_dir, 'main.xml')
+        with open(os.path.join(self.tests_dir, 'samples/main.xml'),
+                'rb') as fp:
+            data = fp.read()
+        with open(filename, 'wb') as fp:
+            fp.write(data[:5000] + '</x>' + data[5000:11000])
+        self.assertRaises(SyntaxError, jtl.summarize, filename, cache=True,
+                growing=True)
+        self.assertFalse(os.path.exists(filename + '.summary'))
+
+    def test_malformed(self):
+        """Test that the malformed cache is treated as missing.
+
+        """
+        filename = os.path.join(self.temp_dir, 'main.csv')
+        shutil.copy(os.path.join(self.tests_dir, 'samples/main.csv'),
+                filename)
+        rows = jtl.summarize(filename).rows()
+        for state in ([1, 2], {'position': None}, {'position': (0, 0, 0)},
+                'garbage'):
+            with open(filename + '.summary', 'wb') as fp:
+                if isinstance(state, str):
+                    fp.write(state)
+                else:
+                    cPickle.dump(state, fp, cPickle.HIGHEST_PROTOCOL)
+            self.assertEqual(jtl.summarize(filename, cache=True).rows(),
+                    rows)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+# Copyright (C) 2012-2016 Victor Klepikovskiy
+#
+# This file is part of python-jtl.
+#
+# python-jtl is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# python-jtl is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-jtl. If not, see <http://www.gnu.org/licenses/>.
+
+
+from StringIO import StringIO
+from datetime import timedelta
+import jtl
+import os.path
+import shutil
+import sys
+import tempfile
+import unittest
+
+
+class CommandTestCase(unittest.TestCase):
+    """Testing command line entry point.
+
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.tests_dir = os.path.dirname(os.path.abspath(__file__))
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.stdout, self.stderr = sys.stdout, sys.stderr
+        sys.stdout, sys.stderr = StringIO(), StringIO()
+
+    def tearDown(self):
+        sys.stdout, sys.stderr = self.stdout, self.stderr
+        shutil.rmtree(self.temp_dir)
+
+    def test_summarize(self):
+        """Test summarize command.
+
+        """
+        self.assertEqual(jtl.main(['summarize', '--csv', '-j', '2',
+                os.path.join(self.tests_dir, 'samples/main.xml'),
+                os.path.join(self.tests_dir, 'samples/main.csv')]), 0)
+        lines = sys.stdout.getvalue().splitlines()
+        self.assertEqual(len(lines), 7)
+        self.assertTrue(lines[0].startswith('Label,# Samples,Average,'))
+        self.assertTrue(lines[-1].startswith('TOTAL,8,1416,'))
+        self.assertTrue(sys.stderr.getvalue().startswith(
+                'Processed 8 samples from 2 file(s)'))
+        for filename in (self.temp_dir, os.path.join(self.temp_dir,
+                'missing.xml')):
+            self.assertRaises(SystemExit, jtl.main, ['summarize', filename])
+            self.assertTrue(sys.stderr.getvalue().endswith(
+                    'input file not found: %s\n' % filename))
+
+    def test_filter(self):
+        """Test filter command.
+
+        """
+        output = os.path.join(self.temp_dir, 'errors.xml')
+        self.assertEqual(jtl.main(['filter', '--errors', '--label', 'sample',
+                '-o', output, os.path.join(self.tests_dir,
+                    'samples/main.xml')]), 0)
+        samples = list(jtl.create_parser(output).itersamples())
+        self.assertEqual([sample.label for sample in samples],
+                ['fourth sample, last sample'])
+
+    def test_convert(self):
+        """Test convert command.
+
+        """
+        self.assertEqual(jtl.main(['convert', '-j', '2', '--fields',
+                'timestamp,label', '-o', self.temp_dir,
+                os.path.join(self.tests_dir, 'samples/main.xml'),
+                os.path.join(self.tests_dir, 'samples/nested.xml')]), 0)
+        self.assertEqual(sorted(os.listdir(self.temp_dir)),
+                ['main.csv', 'nested.csv'])
+        with open(os.path.join(self.temp_dir, 'nested.csv')) as fp:
+            self.assertEqual(fp.read().splitlines(), ['timeStamp,label',
+                    '1345758561246,Login page', '1345758562000,Checkout'])
+
+    def test_compare(self):
+        """Test compare command.
+
+        """
+        filename = os.path.join(self.tests_dir, 'samples/main.xml')
+        self.assertEqual(jtl.main(['compare', '-b', filename, filename]), 0)
+        lines = sys.stdout.getvalue().splitlines()
+        self.assertEqual(len(lines), 7)
+        self.assertTrue(lines[0].startswith('Label'))
+        self.assertTrue(lines[-1].startswith('TOTAL'))
+        self.assertTrue(lines[-1].endswith('  ok'))
+        self.assertEqual(jtl.main(['compare', '-b', filename, '-b', filename,
+                filename, filename]), 0)
+
+    def test_watch(self):
+        """Test watch command.
+
+        """
+        sample = next(jtl.create_parser(os.path.join(self.tests_dir,
+                'samples/main.csv')).itersamples())
+        filename = os.path.join(self.temp_dir, 'main.csv')
+        writer = jtl.CSVWriter(filename)
+        writer.writesamples(sample._replace(elapsed_time=timedelta(
+                milliseconds=100 if index < 20 else 1000),
+                timestamp=sample.timestamp + timedelta(seconds=index))
+                for index in range(30))
+        writer.close()
+        self.assertEqual(jtl.main(['watch', '--warmup', '10', filename]), 1)
+        lines = sys.stdout.getvalue().splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertTrue(lines[0].endswith(
+                'elapsed time increase: 100 ms -> 1000 ms'))
+        self.assertEqual(jtl.main(['watch', filename]), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+# Copyright (C) 2012-2016 Victor Klepikovskiy
+#
+# This file is part of python-jtl.
+#
+# python-jtl is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# python-jtl is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-jtl. If not, see <http://www.gnu.org/licenses/>.
+
+
+from datetime import timedelta
+import jtl
+import os.path
+import shutil
+import tempfile
+import unittest
+
+
+class CompareTestCase(unittest.TestCase):
+    """Testing comparison of runs.
+
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.tests_dir = os.path.dirname(os.path.abspath(__file__))
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def write_run(self, name, elapsed, errors):
+        """Write the run with samples of the given elapsed times (the
+        first errors of them failed) and return the filename.
+
+        """
+        sample = next(jtl.create_parser(os.path.join(self.tests_dir,
+                'samples/main.csv')).itersamples())
+        filename = os.path.join(self.temp_dir, name)
+        writer = jtl.CSVWriter(filename)
+        for index, value in enumerate(elapsed):
+            writer.write(sample._replace(label='a' if index % 2 else 'b',
+                    elapsed_time=timedelta(milliseconds=value),
+                    success=index >= errors))
+        writer.close()
+        return filename
+
+    def test_same(self):
+        """Test comparing the run with itself.
+
+        """
+        filename = os.path.join(self.tests_dir, 'samples/main.xml')
+        rows = jtl.compare(filename, [filename], jobs=1)
+        self.assertEqual(len(rows), 6)
+        for row in rows:
+            self.assertFalse(row.regression)
+            self.assertEqual(row.change, 0)
+            self.assertTrue(row.p_value > 0.4)
+            self.assertEqual(row.baseline, row.candidate)
+
+    def test_regression(self):
+        """Test detecting slower responses and higher error rate.
+
+        """
+        baseline = self.write_run('baseline.csv', range(100, 300), 2)
+        slower = self.write_run('slower.csv',
+                range(100, 200) + range(250, 350), 2)
+        failing = self.write_run('failing.csv', range(100, 300), 40)
+        rows = jtl.compare(baseline, slower, jobs=2)
+        self.assertEqual([row.label for row in rows], ['a', 'b', None])
+        self.assertTrue(all(row.regression for row in rows))
+        self.assertTrue(rows[-1].change > 0.1)
+        self.assertTrue(rows[-1].p_value < 0.05)
+        self.assertTrue(rows[-1].error_p_value > 0.4)
+        rows = jtl.compare(baseline, failing, jobs=1)
+        self.assertTrue(rows[-1].regression)
+        self.assertAlmostEqual(rows[-1].change, 0)
+        self.assertTrue(rows[-1].error_p_value < 0.05)
+        rows = jtl.compare(slower, baseline, jobs=1)
+        self.assertFalse(any(row.regression for row in rows))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+# Copyright (C) 2012-2016 Victor Klepikovskiy
+#
+# This file is part of python-jtl.
+#
+# python-jtl is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# python-jtl is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-jtl. If not, see <http://www.gnu.org/licenses/>.
+
+
+from datetime import datetime, timedelta
+import jtl
+import os.path
+import unittest
+
+
+class ConcurrencyTestCase(unittest.TestCase):
+    """Testing concurrency timeline reconstruction.
+
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.tests_dir = os.path.dirname(os.path.abspath(__file__))
+
+    def test_timeline(self):
+        """Test concurrency timeline of the overlapping samples.
+
+        """
+        template = jtl.Sample(*([None] * len(jtl.Sample._fields)))
+        start = datetime(2012, 8, 23, 21, 0, 0)
+        samples = [template._replace(label=label, hostname='hppc',
+                thread_name=thread_name, timestamp=start + timedelta(
+                    milliseconds=ts), elapsed_time=timedelta(milliseconds=t))
+                for label, thread_name, ts, t in (
+                    ('a', 'Thread 1', 0, 100),
+                    ('b', 'Thread 2', 50, 100),
+                    ('a', 'Thread 2', 60, 10),
+                    ('a', 'Thread 1', 100, 0),
+                    ('a', 'Thread 1', 100, 20),
+                    )]
+
+        timelines = jtl.concurrency(samples)
+        self.assertEqual(timelines.keys(), [None])
+        self.assertEqual([(p.requests, p.threads,
+                _ms(p.timestamp - start)) for p in timelines[None]], [
+                    (1, 1, 0),
+                    (2, 2, 50),
+                    (3, 2, 60),
+                    (2, 2, 70),
+                    (1, 1, 120),
+                    (0, 0, 150),
+                    ])
+
+        timelines = jtl.concurrency(samples, by='label')
+        self.assertEqual(sorted(timelines.keys()), ['a', 'b'])
+        self.assertEqual([(p.requests, p.threads,
+                _ms(p.timestamp - start)) for p in timelines['a']], [
+                    (1, 1, 0),
+                    (2, 2, 60),
+                    (1, 1, 70),
+                    (0, 0, 120),
+                    ])
+
+    def test_xml(self):
+        """Test concurrency timeline of the XML results.
+
+        """
+        samples_filename = os.path.join(self.tests_dir,
+                'samples/main.xml')
+        parser = jtl.create_parser(samples_filename)
+        timelines = jtl.concurrency(parser.itersamples(), by='hostname')
+        self.assertEqual(timelines.keys(), ['hppc'])
+        self.assertEqual(len(timelines['hppc']), 10)
+        self.assertEqual(max(p.requests for p in timelines['hppc']), 1)
+        self.assertEqual(timelines['hppc'][-1].requests, 0)
+
+
+def _ms(delta):
+    return int(round(delta.total_seconds() * 1000))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,171 @@
+# Copyright (C) 2012-2016 Victor Klepikovskiy
+#
+# This file is part of python-jtl.
+#
+# python-jtl is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# python-jtl is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-jtl. If not, see <http://www.gnu.org/licenses/>.
+
+
+from datetime import timedelta
+import jtl
+import os.path
+import random
+import shutil
+import tempfile
+import threading
+import unittest
+
+
+class ChangeDetectorTestCase(unittest.TestCase):
+    """Testing streaming change detection.
+
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.tests_dir = os.path.dirname(os.path.abspath(__file__))
+        cls.sample = next(jtl.create_parser(os.path.join(cls.tests_dir,
+                'samples/main.csv')).itersamples())
+
+    def get_samples(self, label, elapsed, error_rate, start, count):
+        """Return the samples of the label with elapsed time varying
+        around the given value, one per second since start.
+
+        """
+        generator = random.Random(label)
+        return [self.sample._replace(label=label,
+                elapsed_time=timedelta(milliseconds=int(elapsed *
+                    generator.uniform(0.8, 1.2))),
+                success=generator.random() >= error_rate,
+                timestamp=jtl._EPOCH + timedelta(seconds=start + second))
+                for second in range(count)]
+
+    def test_elapsed_time(self):
+        """Test changes of elapsed time.
+
+        """
+        detector = jtl.ChangeDetector()
+        changes = list(detector.detect(self.get_samples('a', 100, 0, 0, 300)
+                + self.get_samples('a', 200, 0, 300, 300)
+                + self.get_samples('a', 50, 0, 600, 300)))
+        self.assertEqual([(change.label, change.metric, change.direction)
+                for change in changes], [('a', 'elapsed_time', 'increase'),
+                ('a', 'elapsed_time', 'decrease')])
+        increase, decrease = changes
+        self.assertTrue(300 <= (increase.timestamp - jtl._EPOCH).seconds
+                < 310)
+        self.assertTrue(90 < increase.baseline < 110)
+        self.assertTrue(110 < increase.value < 220)
+        self.assertTrue(600 <= (decrease.timestamp - jtl._EPOCH).seconds
+                < 610)
+        self.assertTrue(180 < decrease.baseline < 220)
+        self.assertTrue(45 < decrease.value < 70)
+        self.assertTrue(45 < detector.baseline('a')[0] < 55)
+        self.assertEqual(detector.baseline('b'), (None, None))
+
+    def test_error_rate(self):
+        """Test changes of error rate.
+
+        """
+        detector = jtl.ChangeDetector()
+        changes = list(detector.detect(self.get_samples('a', 100, 0.01, 0,
+                1000) + self.get_samples('a', 100, 0.3, 1000, 200)))
+        self.assertEqual(len(changes), 1)
+        change = changes[0]
+        self.assertEqual((change.metric, change.direction),
+                ('error_rate', 'increase'))
+        self.assertTrue(1000 <= (change.timestamp - jtl._EPOCH).seconds
+                < 1100)
+        self.assertTrue(change.baseline < 0.05)
+        self.assertTrue(change.value > 0.2)
+
+    def test_stable(self):
+        """Test that stable labels do not raise false alarms.
+
+        """
+        detector = jtl.ChangeDetector()
+        samples = []
+        for index in range(100):
+            samples.extend(self.get_samples('label %d' % index,
+                    10 * (index + 1), 0.01, 0, 500))
+        samples.sort(key=lambda sample: sample.timestamp)
+        self.assertEqual(list(detector.detect(samples)), [])
+        self.assertEqual(len(detector.labels), 100)
+        self.assertTrue(detector.baseline('label 0')[1] < 0.05)
+
+
+class FollowTestCase(unittest.TestCase):
+    """Testing following the results file being written.
+
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.tests_dir = os.path.dirname(os.path.abspath(__file__))
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def check_growing(self, samples_filename, split, first, total):
+        """Check that samples of the file written in two parts are
+        yielded once they are complete.
+
+        """
+        with open(os.path.join(self.tests_dir, 'samples', samples_filename),
+                'rb') as fp:
+            data = fp.read()
+        filename = os.path.join(self.temp_dir, samples_filename)
+        with open(filename, 'wb') as fp:
+            fp.write(data[:split])
+        samples = jtl.follow(filename, interval=0.01, timeout=0.1)
+        labels = [next(samples).label for index in range(first)]
+        with open(filename, 'ab') as fp:
+            fp.write(data[split:])
+        labels.extend(sample.label for sample in samples)
+        self.assertEqual(labels, [sample.label for sample in
+                jtl.create_parser(filename).itersamples()])
+        self.assertEqual(len(labels), total)
+
+    def test_csv(self):
+        """Test CSV file with incomplete last line.
+
+        """
+        self.check_growing('main.csv', 700, 2, 3)
+
+    def test_xml(self):
+        """Test XML file with incomplete last sample.
+
+        """
+        self.check_growing('main.xml', 11000, 3, 5)
+
+    def test_created(self):
+        """Test the file which is written after following started.
+
+        """
+        filename = os.path.join(self.temp_dir, 'main.csv')
+        open(filename, 'wb').close()
+        def write():
+            shutil.copy(os.path.join(self.tests_dir, 'samples/main.csv'),
+                    filename)
+        timer = threading.Timer(0.1, write)
+        timer.start()
+        try:
+            samples = list(jtl.follow(filename, interval=0.01, timeout=1))
+        finally:
+            timer.join()
+        self.assertEqual(len(samples), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
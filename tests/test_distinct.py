@@ -0,0 +1,91 @@
+# Copyright (C) 2012-2016 Victor Klepikovskiy
+#
+# This file is part of python-jtl.
+#
+# python-jtl is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# python-jtl is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-jtl. If not, see <http://www.gnu.org/licenses/>.
+
+
+from datetime import datetime, timedelta
+import jtl
+import os.path
+import pickle
+import unittest
+
+
+class DistinctTestCase(unittest.TestCase):
+    """Testing approximate distinct counts.
+
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.tests_dir = os.path.dirname(os.path.abspath(__file__))
+
+    def test_hyperloglog(self):
+        """Test HyperLogLog estimator accuracy and merging.
+
+        """
+        estimator = jtl.HyperLogLog(14)
+        other = jtl.HyperLogLog(14)
+        for i in range(20000):
+            (estimator if i % 2 else other).add('/item?id=%d' % i)
+        self.assertAlmostEqual(estimator.count(), 10000, delta=300)
+        estimator.merge(pickle.loads(pickle.dumps(other)))
+        self.assertAlmostEqual(estimator.count(), 20000, delta=600)
+        small = jtl.HyperLogLog()
+        for i in range(100):
+            small.add(str(i % 10))
+        self.assertEqual(small.count(), 10)
+        self.assertRaises(ValueError, estimator.merge, small)
+        self.assertRaises(ValueError, jtl.HyperLogLog, 20)
+
+    def test_counter(self):
+        """Test distinct counts per label and interval.
+
+        """
+        template = jtl.Sample(*([None] * len(jtl.Sample._fields)))
+        start = datetime(2016, 5, 14)
+        samples = [template._replace(label='ab'[i % 2], hostname='host%d' %
+                (i % 3), thread_name='Thread 1-%d' % (i % 50), url='/%d' % i,
+                query_string='', timestamp=start + timedelta(seconds=i))
+                for i in range(3000)]
+        counter = jtl.DistinctCounter(interval=600)
+        counter.update(samples[:1000])
+        counter.merge(jtl.DistinctCounter(interval=600).update(samples[1000:]))
+        self.assertAlmostEqual(counter.count('url'), 3000, delta=150)
+        self.assertAlmostEqual(counter.count('thread_name'), 50, delta=1)
+        self.assertAlmostEqual(counter.count('thread_name', label='a'), 25,
+                delta=1)
+        self.assertEqual(counter.count('hostname', label='b'), 3)
+        self.assertEqual(counter.count('query_string'), 1)
+        self.assertAlmostEqual(counter.count('url', label='a',
+                interval=start + timedelta(seconds=600)), 300, delta=15)
+        self.assertEqual(counter.count('url', label='c'), 0)
+        self.assertEqual(len(counter.keys()), 3 + 5 * 3)
+        self.assertEqual(counter.keys()[:2], [(None, None),
+                (None, start)])
+        self.assertRaises(ValueError, counter.merge, jtl.DistinctCounter())
+
+    def test_xml(self):
+        """Test distinct counts of XML results.
+
+        """
+        parser = jtl.create_parser(os.path.join(self.tests_dir,
+                'samples/main.xml'))
+        counter = jtl.DistinctCounter().update(parser.itersamples())
+        self.assertEqual(counter.count('url'), 4)
+        self.assertEqual(counter.count('thread_name'), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+# Copyright (C) 2012-2016 Victor Klepikovskiy
+#
+# This file is part of python-jtl.
+#
+# python-jtl is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# python-jtl is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-jtl. If not, see <http://www.gnu.org/licenses/>.
+
+
+from datetime import datetime, timedelta
+import jtl
+import os.path
+import unittest
+
+
+class ErrorsTestCase(unittest.TestCase):
+    """Testing error fingerprinting.
+
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.tests_dir = os.path.dirname(os.path.abspath(__file__))
+
+    def test_fingerprint(self):
+        """Test error message normalization.
+
+        """
+        self.assertEqual(jtl.fingerprint('Order 12345 not found at '
+                '2016-05-14T10:00:00  (request '
+                '3f2504e0-4f89-11d3-9a0c-0305e82c3301, session 0a1b2c3d4e)'),
+                'Order # not found at #-#-#T#:#:# (request <uuid>, session '
+                '<hex>)')
+
+    def test_top(self):
+        """Test top fingerprints with bounded capacity.
+
+        """
+        template = jtl.Sample(*([None] * len(jtl.Sample._fields)))._replace(
+                assertion_results=(), label='a', response_code='500',
+                success=False)
+        start = datetime(2016, 5, 14)
+        samples = []
+        for i in range(1000):
+            if i % 2:
+                message = 'Timeout after %d ms' % i
+            elif i % 10 == 0:
+                message = 'Unique error %s' % chr(65 + i % 26) * (i % 7 + 1)
+            else:
+                message = 'Order %d not found' % i
+            samples.append(template._replace(response_message=message,
+                    timestamp=start + timedelta(seconds=i)))
+        samples.append(template._replace(success=True))
+        analyzer = jtl.ErrorAnalyzer(capacity=5)
+        analyzer.update(samples[:500])
+        other = jtl.ErrorAnalyzer(capacity=5).update(samples[500:])
+        analyzer.merge(other)
+        top = analyzer.top(2)
+        self.assertEqual([(item.response_message, item.label)
+                for item in top], [('Timeout after # ms', 'a'),
+                    ('Order # not found', 'a')])
+        self.assertTrue(top[0].count - top[0].error <= 500 <= top[0].count)
+        self.assertTrue(top[1].count - top[1].error <= 400 <= top[1].count)
+        self.assertEqual(top[0].first_timestamp, start + timedelta(seconds=1))
+        self.assertEqual(top[0].last_timestamp,
+                start + timedelta(seconds=999))
+        self.assertEqual(top[0].example.response_message, 'Timeout after 1 ms')
+
+    def test_out_of_order(self):
+        """Test first and last timestamps of samples completed out of
+        order, and counts after many evictions.
+
+        """
+        template = jtl.Sample(*([None] * len(jtl.Sample._fields)))._replace(
+                assertion_results=(), label='a', response_code='500',
+                success=False)
+        start = datetime(2016, 5, 14)
+        analyzer = jtl.ErrorAnalyzer(capacity=3)
+        for i in (5, 9, 2, 7, 1, 8):
+            analyzer.add(template._replace(response_message='Timeout',
+                    timestamp=start + timedelta(seconds=i)))
+        for i in range(8):
+            analyzer.add(template._replace(response_message='Error %s' %
+                    chr(65 + i), timestamp=start))
+        top = analyzer.top(1)[0]
+        self.assertEqual((top.response_message, top.count, top.error),
+                ('Timeout', 6, 0))
+        self.assertEqual(top.first_timestamp, start + timedelta(seconds=1))
+        self.assertEqual(top.last_timestamp, start + timedelta(seconds=9))
+        self.assertEqual(sum(item.count for item in analyzer.top()), 14)
+
+    def test_xml(self):
+        """Test fingerprints of XML results.
+
+        """
+        parser = jtl.create_parser(os.path.join(self.tests_dir,
+                'samples/main.xml'))
+        top = jtl.ErrorAnalyzer().update(parser.itersamples()).top()
+        self.assertEqual(len(top), 3)
+        self.assertEqual(sorted(item.label for item in top), [
+                'Transaction Controller', 'Transaction Controller Search',
+                'fourth sample, last sample'])
+        item = [item for item in top
+                if item.label == 'Transaction Controller Search'][0]
+        self.assertEqual(item.response_message, 'Number of samples in '
+                'transaction : #, number of failing samples : #')
+        self.assertTrue(item.failure_message.startswith(
+                'Test failed: message expected to equal / ****** received'))
+
+
+if __name__ == '__main__':
+    unittest.main()
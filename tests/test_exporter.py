@@ -0,0 +1,136 @@
+# Copyright (C) 2012-2016 Victor Klepikovskiy
+#
+# This file is part of python-jtl.
+#
+# python-jtl is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# python-jtl is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-jtl. If not, see <http://www.gnu.org/licenses/>.
+
+
+from datetime import timedelta
+import jtl
+import os.path
+import socket
+import threading
+import unittest
+
+
+class MetricsExporterTestCase(unittest.TestCase):
+    """Testing metrics export to local sockets.
+
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.tests_dir = os.path.dirname(os.path.abspath(__file__))
+
+    def get_samples(self):
+        return jtl.create_parser(os.path.join(self.tests_dir,
+                'samples/main.csv')).itersamples()
+
+    def receive_tcp(self, server, received):
+        """Accept connections and receive all the data (the thread target).
+
+        """
+        while True:
+            connection, address = server.accept()
+            data = ''.join(iter(lambda: connection.recv(4096), ''))
+            connection.close()
+            if not data:
+                break
+            received.append(data)
+
+    def test_graphite_tcp(self):
+        """Test Graphite plaintext protocol over TCP.
+
+        """
+        server = socket.socket()
+        server.bind(('127.0.0.1', 0))
+        server.listen(1)
+        received = []
+        thread = threading.Thread(target=self.receive_tcp,
+                args=(server, received))
+        thread.start()
+        try:
+            exporter = jtl.MetricsExporter(*server.getsockname(),
+                    interval=60, prefix='run', batch_size=4)
+            exporter.update(self.get_samples()).close()
+        finally:
+            socket.create_connection(server.getsockname()).close()
+            thread.join()
+            server.close()
+        self.assertEqual(len(received), 1)
+        lines = received[0].splitlines()
+        self.assertEqual(len(lines), 3 * len(exporter.metrics))
+        self.assertEqual(exporter.sent, len(lines))
+        self.assertIn('run._Home__page.samples 1 1345758780', lines)
+        self.assertIn('run.fourth_sample__last_sample.errors 1 1345758840',
+                lines)
+
+    def test_influxdb_udp(self):
+        """Test InfluxDB line protocol over UDP.
+
+        """
+        server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        server.bind(('127.0.0.1', 0))
+        try:
+            exporter = jtl.MetricsExporter(*server.getsockname(),
+                    protocol='influxdb', transport='udp', interval=60)
+            exporter.update(self.get_samples()).close()
+            data = server.recv(65536)
+        finally:
+            server.close()
+        lines = data.splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[0].startswith('jmeter,label="Home"\\ page '
+                'samples=1i,errors=0i,average=1152.0,min=1152,max=1152,'))
+        self.assertTrue(lines[0].endswith(' 1345758780000000000'))
+
+    def test_late(self):
+        """Test that samples of the intervals already sent are dropped.
+
+        """
+        sample = next(self.get_samples())
+        samples = [sample, sample._replace(
+                timestamp=sample.timestamp + timedelta(seconds=180)), sample]
+        server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        server.bind(('127.0.0.1', 0))
+        try:
+            exporter = jtl.MetricsExporter(*server.getsockname(),
+                    protocol='influxdb', transport='udp', interval=60)
+            exporter.update(samples).close()
+            lines = server.recv(65536).splitlines() + \
+                    server.recv(65536).splitlines()
+        finally:
+            server.close()
+        self.assertEqual(len(lines), 2)
+        self.assertIn(' samples=1i,', lines[0])
+        self.assertTrue(lines[0].endswith(' 1345758780000000000'))
+        self.assertTrue(lines[1].endswith(' 1345758960000000000'))
+        self.assertEqual(exporter.dropped, 1)
+
+    def test_retry(self):
+        """Test retrying when nothing listens on the port.
+
+        """
+        server = socket.socket()
+        server.bind(('127.0.0.1', 0))
+        address = server.getsockname()
+        server.close()
+        exporter = jtl.MetricsExporter(*address, retries=1, retry_delay=0)
+        self.assertRaises(socket.error, exporter.update, self.get_samples())
+        self.assertEqual(exporter.socket, None)
+        self.assertEqual(len(exporter.lines), len(exporter.metrics))
+        self.assertEqual(exporter.sent, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+# Copyright (C) 2012-2016 Victor Klepikovskiy
+#
+# This file is part of python-jtl.
+#
+# python-jtl is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# python-jtl is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-jtl. If not, see <http://www.gnu.org/licenses/>.
+
+
+import jtl
+import os.path
+import unittest
+
+
+def fail(samples):
+    raise KeyError('failed')
+
+
+class ArgumentsError(Exception):
+    """The exception which cannot be unpickled (its constructor requires
+    two arguments).
+
+    """
+    def __init__(self, code, message):
+        Exception.__init__(self, message)
+        self.code = code
+
+
+def fail_arguments(samples):
+    raise ArgumentsError(1, 'failed')
+
+
+def exit(samples):
+    os._exit(3)
+
+
+class FanoutTestCase(unittest.TestCase):
+    """Testing dispatching samples to multiple consumers.
+
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.tests_dir = os.path.dirname(os.path.abspath(__file__))
+        cls.samples_filename = os.path.join(cls.tests_dir, 'samples/main.xml')
+
+    def check_fanout(self, workers):
+        """Check that all the consumers get all the samples.
+
+        """
+        summary, analyzer, counter = jtl.fanout(
+                jtl.create_parser(self.samples_filename),
+                [jtl.Summary(), jtl.ErrorAnalyzer(), jtl.DistinctCounter(('url', ))],
+                batch_size=2, workers=workers, depth=1)
+        self.assertEqual(summary.total.samples, 5)
+        self.assertEqual(sum(error.count for error in analyzer.top()), 3)
+        self.assertEqual(counter.count('url'), 4)
+        if workers != 'process':
+            self.assertRaises(KeyError, jtl.fanout, jtl.create_parser(
+                    self.samples_filename).itersamples(),
+                    [jtl.Summary(), fail], batch_size=1, workers=workers,
+                    depth=1)
+
+    def test_direct(self):
+        """Test consumers called in the parsing thread.
+
+        """
+        self.check_fanout(None)
+        batches = []
+        jtl.fanout(jtl.create_parser(self.samples_filename), [batches.append],
+                batch_size=2)
+        self.assertEqual(sum(batches, []), list(jtl.create_parser(
+                self.samples_filename).itersamples()))
+
+    def test_thread(self):
+        """Test consumers running in threads.
+
+        """
+        self.check_fanout('thread')
+
+    def test_process(self):
+        """Test consumers running in processes.
+
+        """
+        self.check_fanout('process')
+        for consumer, message in ((fail, "Consumer 1 failed: KeyError: "
+                    "'failed'\nTraceback"),
+                (fail_arguments, 'Consumer 1 failed: ArgumentsError: failed'),
+                (exit, 'Consumer 1 failed: WorkerExited: worker exited with '
+                    'code 3')):
+            with self.assertRaises(RuntimeError) as context:
+                jtl.fanout(jtl.create_parser(self.samples_filename),
+                        [jtl.Summary(), consumer], batch_size=1,
+                        workers='process', depth=1)
+            self.assertTrue(str(context.exception).startswith(message))
+
+
+if __name__ == '__main__':
+    unittest.main()
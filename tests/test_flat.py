@@ -0,0 +1,109 @@
+# Copyright (C) 2012-2016 Victor Klepikovskiy
+#
+# This file is part of python-jtl.
+#
+# python-jtl is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# python-jtl is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-jtl. If not, see <http://www.gnu.org/licenses/>.
+
+
+from datetime import timedelta
+import jtl
+import os.path
+import unittest
+
+
+class FlatTestCase(unittest.TestCase):
+    """Testing flattened iteration over samples.
+
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.tests_dir = os.path.dirname(os.path.abspath(__file__))
+
+    def test_xml(self):
+        """Test XML parser.
+
+        """
+        samples_filename = os.path.join(self.tests_dir,
+                'samples/nested.xml')
+        parser = jtl.create_parser(samples_filename)
+        flat_samples = list(parser.iterflat())
+        self.assertEqual([(s.sample.label, s.sample_id, s.parent_id, s.depth)
+                for s in flat_samples], [
+                    ('Login page', 0, None, 0),
+                    ('/cart', 3, 2, 2),
+                    ('/cart/items', 4, 2, 2),
+                    ('Cart', 2, 1, 1),
+                    ('/pay', 5, 1, 1),
+                    ('Checkout', 1, None, 0),
+                    ])
+        for flat_sample in flat_samples:
+            self.assertEqual(flat_sample.sample.children, ())
+        self.assertEqual(flat_samples[4].sample.method, 'POST')
+
+        # aggregate child samples by parent
+        children_elapsed = {}
+        for flat_sample in flat_samples:
+            if flat_sample.parent_id is not None:
+                children_elapsed[flat_sample.parent_id] = children_elapsed.get(
+                        flat_sample.parent_id, timedelta(0)) + \
+                        flat_sample.sample.elapsed_time
+        self.assertEqual(children_elapsed,
+                {1: timedelta(0, 0, 700000), 2: timedelta(0, 0, 300000)})
+
+    def test_xml_children(self):
+        """Test that flattened XML samples match the nested ones.
+
+        """
+        samples_filename = os.path.join(self.tests_dir,
+                'samples/main.xml')
+        samples = list(jtl.create_parser(samples_filename).itersamples())
+        flat_samples = list(jtl.create_parser(samples_filename).iterflat())
+        self.assertEqual(len(flat_samples), 7)
+        self.assertEqual([s.sample for s in flat_samples[4:6]],
+                list(samples[4].children))
+        self.assertEqual(flat_samples[6].sample,
+                samples[4]._replace(children=()))
+        self.assertEqual([s.parent_id for s in flat_samples],
+                [None, None, None, None, 4, 4, None])
+
+    def test_xml_nested(self):
+        """Test that nested samples are collected by XML parser.
+
+        """
+        samples_filename = os.path.join(self.tests_dir,
+                'samples/nested.xml')
+        samples = list(jtl.create_parser(samples_filename).itersamples())
+        self.assertEqual([s.label for s in samples], ['Login page',
+                'Checkout'])
+        self.assertEqual([s.label for s in samples[1].children], ['Cart',
+                '/pay'])
+        self.assertEqual([s.label for s in samples[1].children[0].children],
+                ['/cart', '/cart/items'])
+
+    def test_csv(self):
+        """Test CSV parser.
+
+        """
+        samples_filename = os.path.join(self.tests_dir,
+                'samples/main.csv')
+        parser = jtl.create_parser(samples_filename)
+        flat_samples = list(parser.iterflat())
+        self.assertEqual(len(flat_samples), 3)
+        self.assertEqual([(s.sample_id, s.parent_id, s.depth)
+                for s in flat_samples], [(0, None, 0), (1, None, 0),
+                    (2, None, 0)])
+
+
+if __name__ == '__main__':
+    unittest.main()
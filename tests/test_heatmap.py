@@ -0,0 +1,73 @@
+# Copyright (C) 2012-2016 Victor Klepikovskiy
+#
+# This file is part of python-jtl.
+#
+# python-jtl is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# python-jtl is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-jtl. If not, see <http://www.gnu.org/licenses/>.
+
+
+from datetime import datetime
+import jtl
+import os.path
+import unittest
+
+
+class HeatmapTestCase(unittest.TestCase):
+    """Testing latency heatmaps.
+
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.tests_dir = os.path.dirname(os.path.abspath(__file__))
+
+    def get_heatmap(self, name, **kwargs):
+        return jtl.Heatmap(**kwargs).update(jtl.create_parser(
+                os.path.join(self.tests_dir, 'samples', name)).itersamples())
+
+    def test_matrix(self):
+        """Test the heatmap matrix of all the labels and of one label.
+
+        """
+        heatmap = self.get_heatmap('main.csv', interval=60, accuracy=0.5)
+        times, bounds, rows = heatmap.matrix()
+        self.assertEqual(times, [datetime(2012, 8, 23, 21, 53),
+                datetime(2012, 8, 23, 21, 54)])
+        self.assertEqual(len(bounds), len(rows[0]))
+        self.assertEqual(sum(map(sum, rows)), 3)
+        for row in rows:
+            for bound, value in zip(bounds, row):
+                if value:
+                    self.assertTrue(bound >= 109)
+        self.assertTrue(bounds[-1] >= 1152 > bounds[-2])
+        times, bounds, rows = heatmap.matrix('"Home" page')
+        self.assertEqual((len(times), len(bounds), rows), (1, 1, [[1]]))
+        self.assertEqual(heatmap.matrix('missing'), ([], [], []))
+
+    def test_merge(self):
+        """Test merging and serialization.
+
+        """
+        heatmap = self.get_heatmap('main.csv', interval=86400)
+        heatmap.merge(self.get_heatmap('main.xml', interval=86400))
+        self.assertEqual(len(heatmap.labels()), 5)
+        self.assertEqual(sum(map(sum, heatmap.matrix()[2])), 8)
+        data = heatmap.dumps()
+        self.assertTrue(isinstance(data, str))
+        loaded = jtl.Heatmap.loads(data)
+        self.assertEqual(loaded.cells, heatmap.cells)
+        self.assertEqual(loaded.matrix(), heatmap.matrix())
+        self.assertRaises(ValueError, heatmap.merge, jtl.Heatmap(interval=1))
+
+
+if __name__ == '__main__':
+    unittest.main()
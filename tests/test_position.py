@@ -0,0 +1,84 @@
+# Copyright (C) 2012-2016 Victor Klepikovskiy
+#
+# This file is part of python-jtl.
+#
+# python-jtl is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# python-jtl is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-jtl. If not, see <http://www.gnu.org/licenses/>.
+
+
+import jtl
+import json
+import os.path
+import unittest
+
+
+class PositionTestCase(unittest.TestCase):
+    """Testing checkpoint and resume of the iteration.
+
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.tests_dir = os.path.dirname(os.path.abspath(__file__))
+
+    def check_resume(self, samples_filename, method, **kwargs):
+        """Check that iteration resumed from every position yields the
+        remaining items.
+
+        """
+        parser = jtl.create_parser(samples_filename, **kwargs)
+        items = []
+        positions = [json.dumps(parser.position)]
+        for item in getattr(parser, method)():
+            items.append(item)
+            positions.append(json.dumps(parser.position))
+        self.assertTrue(len(items) > 1)
+        for i, position in enumerate(positions):
+            parser = jtl.create_parser(samples_filename,
+                    position=json.loads(position), **kwargs)
+            self.assertEqual(list(getattr(parser, method)()), items[i:])
+
+    def test_xml(self):
+        """Test XML parser.
+
+        """
+        self.check_resume(os.path.join(self.tests_dir, 'samples/main.xml'),
+                'itersamples')
+        self.check_resume(os.path.join(self.tests_dir, 'samples/main.xml'),
+                'iterflat')
+        self.check_resume(os.path.join(self.tests_dir, 'samples/nested.xml'),
+                'iterflat')
+
+    def test_csv(self):
+        """Test CSV parser.
+
+        """
+        self.check_resume(os.path.join(self.tests_dir, 'samples/main.csv'),
+                'itersamples')
+        self.check_resume(os.path.join(self.tests_dir, 'samples/main.csv'),
+                'iterflat')
+        parser = jtl.create_parser(os.path.join(self.tests_dir,
+                'samples/main.csv'))
+        list(parser.itersamples())
+        self.assertEqual(parser.position, jtl.Position(
+                os.path.getsize(parser.source), 3, 0))
+        parser = jtl.create_parser(os.path.join(self.tests_dir,
+                'samples/main.csv'), position=parser.position)
+        self.assertEqual(list(parser.iterflat()), [])
+        parser = jtl.create_parser(os.path.join(self.tests_dir,
+                'samples/main.csv'))
+        list(parser.iterbatches(size=2))
+        self.assertEqual(parser.position.sample_id, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+# Copyright (C) 2012-2016 Victor Klepikovskiy
+#
+# This file is part of python-jtl.
+#
+# python-jtl is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# python-jtl is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-jtl. If not, see <http://www.gnu.org/licenses/>.
+
+
+import jtl
+import os.path
+import unittest
+
+
+class PrefetchTestCase(unittest.TestCase):
+    """Testing reading ahead in the background thread.
+
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.tests_dir = os.path.dirname(os.path.abspath(__file__))
+
+    def check_prefetch(self, samples_filename):
+        """Check that prefetching parser yields the same samples and
+        positions as the regular one.
+
+        """
+        parser = jtl.create_parser(samples_filename)
+        samples = list(parser.itersamples())
+        prefetch_parser = jtl.create_parser(samples_filename, prefetch=2)
+        self.assertEqual(list(prefetch_parser.itersamples()), samples)
+        self.assertEqual(prefetch_parser.position, parser.position)
+
+        parser = jtl.create_parser(samples_filename, prefetch=1)
+        iterator = parser.itersamples()
+        next(iterator)
+        self.assertEqual(list(jtl.create_parser(samples_filename,
+                position=parser.position, prefetch=1).itersamples()),
+                samples[1:])
+
+    def test_xml(self):
+        """Test XML parser.
+
+        """
+        self.check_prefetch(os.path.join(self.tests_dir, 'samples/main.xml'))
+        self.check_prefetch(os.path.join(self.tests_dir,
+                'samples/nested.xml'))
+
+    def test_csv(self):
+        """Test CSV parser.
+
+        """
+        self.check_prefetch(os.path.join(self.tests_dir, 'samples/main.csv'))
+
+    def test_reader(self):
+        """Test reading lines and blocks with small buffers.
+
+        """
+        filename = os.path.join(self.tests_dir, 'samples/main.csv')
+        with open(filename, 'rb') as fp:
+            data = fp.read()
+        with jtl.PrefetchReader(filename, depth=1, buffer_size=7) as fp:
+            lines = list(iter(fp.readline, ''))
+            self.assertEqual(lines, data.splitlines(True))
+            self.assertEqual(fp.tell(), len(data))
+            fp.seek(10)
+            self.assertEqual(fp.read(5), data[10:15])
+            self.assertEqual(fp.tell(), 15)
+            self.assertEqual(fp.read(), data[15:])
+            self.assertEqual(fp.read(), '')
+            fp.seek(0)
+            self.assertEqual(fp.readline(), lines[0])
+            self.assertEqual(list(fp), lines[1:])
+            self.assertEqual(fp.tell(), len(data))
+
+
+if __name__ == '__main__':
+    unittest.main()
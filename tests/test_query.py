@@ -0,0 +1,127 @@
+# Copyright (C) 2012-2016 Victor Klepikovskiy
+#
+# This file is part of python-jtl.
+#
+# python-jtl is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# python-jtl is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-jtl. If not, see <http://www.gnu.org/licenses/>.
+
+
+from datetime import datetime
+import cPickle
+import functools
+import jtl
+import os.path
+import unittest
+
+
+class QueryTestCase(unittest.TestCase):
+    """Testing group-by queries.
+
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.tests_dir = os.path.dirname(os.path.abspath(__file__))
+
+    def test_group_by(self):
+        """Test grouping, filtering and aggregates.
+
+        """
+        samples_filename = os.path.join(self.tests_dir, 'samples/main.xml')
+        query = jtl.Query(select=('count', 'sum(bytes_received)',
+                'mean(elapsed_time)', 'min(elapsed_time)',
+                'max(timestamp)', 'p50(elapsed_time)',
+                'p99.9(elapsed_time)'), group_by=('success', ),
+                where=[('timestamp', '<', datetime(2012, 9, 1)),
+                    ('label', '~', '^[/"f]')])
+        rows = query.run(samples_filename, batch_size=2)
+        samples = [sample for sample in jtl.create_parser(
+                samples_filename).itersamples()
+                if sample.timestamp < datetime(2012, 9, 1) and
+                sample.label[0] in '/"f']
+        self.assertEqual(rows[0]._fields, ('success', 'count',
+                'sum_bytes_received', 'mean_elapsed_time',
+                'min_elapsed_time', 'max_timestamp', 'p50_elapsed_time',
+                'p99_9_elapsed_time'))
+        self.assertEqual([(row.success, row.count) for row in rows],
+                [(False, 1), (True, 2)])
+        success = [sample for sample in samples if sample.success]
+        elapsed = sorted(jtl._milliseconds(sample.elapsed_time)
+                for sample in success)
+        row = rows[1]
+        self.assertEqual(row.sum_bytes_received,
+                sum(sample.bytes_received for sample in success))
+        self.assertAlmostEqual(row.mean_elapsed_time,
+                sum(elapsed) / 2.0)
+        self.assertEqual(row.min_elapsed_time, elapsed[0])
+        self.assertEqual(row.max_timestamp,
+                max(sample.timestamp for sample in success))
+        self.assertAlmostEqual(row.p50_elapsed_time, elapsed[0],
+                delta=elapsed[0] * 0.01)
+        self.assertEqual(row.p99_9_elapsed_time, elapsed[1])
+
+        # conditions given by a generator
+        query = jtl.Query(group_by=('success', ), where=(condition
+                for condition in [('label', '~', '^[/"f]')]))
+        self.assertEqual(len(query.where), 1)
+
+    def test_merge(self):
+        """Test merging queries of separate files.
+
+        """
+        query = jtl.Query(select=('count', 'max(elapsed_time)',
+                'p90(elapsed_time)'), group_by=('label', 'response_code'),
+                where=[('bytes_received', '>', 0)])
+        query.run(os.path.join(self.tests_dir, 'samples/main.xml'))
+        other = jtl.Query(select=('count', 'max(elapsed_time)',
+                'p90(elapsed_time)'), group_by=('label', 'response_code'),
+                where=[('bytes_received', '>', 0)])
+        other.run(os.path.join(self.tests_dir, 'samples/main.csv'))
+        rows = query.merge(other).rows()
+        self.assertEqual(rows[0][:4], ('"Home" page', '200', 2, 1350))
+        self.assertEqual(sum(row.count for row in rows), 8)
+        self.assertRaises(ValueError, jtl.Query, select=('p99', ))
+        self.assertRaises(ValueError, jtl.Query, select=('sum(foo)', ))
+        self.assertRaises(ValueError, query.merge, jtl.Query())
+        self.assertRaises(ValueError, query.merge, jtl.Query(
+                select=('count', 'max(elapsed_time)', 'p90(elapsed_time)'),
+                group_by=('label', 'response_code')))
+
+    def test_samples(self):
+        """Test queries fed with samples by fanout and process_files.
+
+        """
+        samples_filename = os.path.join(self.tests_dir, 'samples/main.xml')
+        definition = {'select': ('count', 'p50(elapsed_time)'),
+                'group_by': ('label', ), 'where': [('label', '~', '^[^/]')]}
+        rows = jtl.Query(**definition).run(samples_filename)
+        query = jtl.Query(**definition).update(jtl.create_parser(
+                samples_filename).itersamples(), batch_size=2)
+        self.assertEqual(query.rows(), rows)
+        query, = jtl.fanout(jtl.create_parser(samples_filename),
+                [jtl.Query(**definition)])
+        self.assertEqual(query.rows(), rows)
+        query = cPickle.loads(cPickle.dumps(query, cPickle.HIGHEST_PROTOCOL))
+        self.assertEqual(query.rows(), rows)
+        csv_filename = os.path.join(self.tests_dir, 'samples/main.csv')
+        query, failures = jtl.process_files([samples_filename,
+                csv_filename], factory=functools.partial(jtl.Query,
+                    **definition), jobs=2)
+        self.assertEqual(failures, [])
+        expected = jtl.Query(**definition)
+        expected.run(samples_filename)
+        other = jtl.Query(**definition)
+        other.run(csv_filename)
+        self.assertEqual(query.rows(), expected.merge(other).rows())
+
+if __name__ == '__main__':
+    unittest.main()
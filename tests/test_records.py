@@ -0,0 +1,74 @@
+# Copyright (C) 2012-2016 Victor Klepikovskiy
+#
+# This file is part of python-jtl.
+#
+# python-jtl is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# python-jtl is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-jtl. If not, see <http://www.gnu.org/licenses/>.
+
+
+import jtl
+import os.path
+import unittest
+
+
+class RecordsTestCase(unittest.TestCase):
+    """Testing memory-mapped CSV records scanning.
+
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.tests_dir = os.path.dirname(os.path.abspath(__file__))
+
+    def test_csv(self):
+        """Test CSV parser.
+
+        """
+        samples_filename = os.path.join(self.tests_dir,
+                'samples/main.csv')
+        parser = jtl.create_parser(samples_filename)
+        records = list(parser.iterrecords(('timeStamp', 'elapsed', 'label',
+                'success', 'failureMessage', 'IdleTime', 'Connect')))
+        self.assertEqual(len(records), 3)
+        self.assertEqual(records[0], (1345758839670, 1152, '"Home" page',
+                'true', '', 0, ''))
+        self.assertEqual(records[1][:4], (1345758858365, 109,
+                'fourth sample, last sample', 'false'))
+        self.assertEqual(records[1][4], 'Test failed: code expected to '
+                'equal /\n\n****** received  : [[[404]]]\n\n****** '
+                'comparison: [[[200]]]\n\n/')
+        self.assertEqual(records[2][:2], (1345758873601, 882))
+
+        samples = list(parser.itersamples())
+        records = list(parser.iterrecords())
+        self.assertEqual(len(records[0]), 20)
+        for sample, record in zip(samples, records):
+            self.assertEqual(sample.bytes_received, record[9])
+            self.assertEqual(sample.url, record[12])
+            self.assertEqual(sample.hostname, record[18])
+
+    def test_fieldnames(self):
+        """Test CSV parser with custom fieldnames and delimiter.
+
+        """
+        samples_filename = os.path.join(self.tests_dir,
+                'samples/delimiter.csv')
+        parser = jtl.create_parser(samples_filename, delimiter='|',
+                fieldnames=('timeStamp', 'elapsed', 'label', 'responseCode',
+                    'responseMessage', 'threadName', 'dataType', 'success',
+                    'bytes', 'Latency'))
+        self.assertEqual(list(parser.iterrecords(('Latency', 'label',
+                'allThreads'))), [(851, '"Home" page', 0)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+# Copyright (C) 2012-2016 Victor Klepikovskiy
+#
+# This file is part of python-jtl.
+#
+# python-jtl is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# python-jtl is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-jtl. If not, see <http://www.gnu.org/licenses/>.
+
+
+from datetime import timedelta
+import jtl
+import os.path
+import unittest
+
+
+class RollingStatsTestCase(unittest.TestCase):
+    """Testing sliding window statistics.
+
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.tests_dir = os.path.dirname(os.path.abspath(__file__))
+        cls.sample = next(jtl.create_parser(os.path.join(cls.tests_dir,
+                'samples/main.csv')).itersamples())
+
+    def get_sample(self, second, elapsed, label='a', success=True):
+        """Return the sample ending at the given second of the test.
+
+        """
+        elapsed_time = timedelta(milliseconds=elapsed)
+        return self.sample._replace(elapsed_time=elapsed_time, label=label,
+                success=success, timestamp=jtl._EPOCH + timedelta(
+                    seconds=1000 + second) - elapsed_time)
+
+    def test_window(self):
+        """Test counts, throughput, error rate and percentiles within the
+        window.
+
+        """
+        stats = jtl.RollingStats(window=10)
+        self.assertEqual(stats.count(), 0)
+        self.assertEqual(stats.percentile(95), None)
+        self.assertEqual(stats.error_rate('a'), None)
+        stats.update(self.get_sample(second, second * 10, success=second % 4)
+                for second in range(20))
+        self.assertEqual(stats.count(), 10)
+        self.assertEqual(stats.count(errors=True), 2)
+        self.assertAlmostEqual(stats.throughput(), 10 / 9.0)
+        self.assertAlmostEqual(stats.throughput(window=5, errors=True),
+                1 / 4.0)
+        self.assertAlmostEqual(stats.error_rate(), 0.2)
+        self.assertAlmostEqual(stats.percentile(100), 190)
+        self.assertAlmostEqual(stats.percentile(50, window=4), 170,
+                delta=1.7)
+        self.assertEqual(stats.count('b'), 0)
+
+    def test_out_of_order(self):
+        """Test samples coming out of order.
+
+        """
+        stats = jtl.RollingStats(window=10)
+        stats.add(self.get_sample(10, 100))
+        stats.add(self.get_sample(5, 100, label='b', success=False))
+        stats.add(self.get_sample(0, 100))
+        self.assertEqual(stats.dropped, 1)
+        self.assertEqual(stats.count(), 2)
+        self.assertEqual(stats.count('b', errors=True), 1)
+        self.assertAlmostEqual(stats.throughput('a'), 1 / 5.0)
+        stats.add(self.get_sample(25, 100))
+        self.assertEqual(stats.count(), 1)
+        self.assertEqual(stats.count('b'), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+# Copyright (C) 2012-2016 Victor Klepikovskiy
+#
+# This file is part of python-jtl.
+#
+# python-jtl is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# python-jtl is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-jtl. If not, see <http://www.gnu.org/licenses/>.
+
+
+import json
+import jtl
+import os.path
+import threading
+import unittest
+import urllib2
+
+
+class AnalysisServerTestCase(unittest.TestCase):
+    """Testing analysis server on localhost.
+
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.tests_dir = os.path.dirname(os.path.abspath(__file__))
+
+    def setUp(self):
+        self.server = jtl.AnalysisServer(root=self.tests_dir, memory=1000)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.thread.join()
+        self.server.server_close()
+
+    def get(self, path):
+        """Return the status and the decoded response of the request.
+
+        """
+        url = 'http://%s:%d%s' % (self.server.server_address + (path, ))
+        try:
+            response = urllib2.urlopen(url)
+        except urllib2.HTTPError as e:
+            response = e
+        return response.getcode(), json.load(response)
+
+    def test_queries(self):
+        """Test summary, filter and time series queries.
+
+        """
+        status, rows = self.get('/summary?file=samples/main.csv')
+        self.assertEqual(status, 200)
+        self.assertEqual([row['label'] for row in rows], ['"Home" page',
+                '/search/images;_ylt=A0oG7lg2AvZPowgACQNXNyoA',
+                'fourth sample, last sample', None])
+        self.assertEqual(rows[-1]['samples'], 3)
+        status, samples = self.get('/filter?file=samples/main.xml&errors=1'
+                '&label=Transaction&limit=1')
+        self.assertEqual(samples, [{'bytes': 64189, 'elapsed': 1359,
+                'label': 'Transaction Controller', 'responseCode': '',
+                'success': False, 'timeStamp': 1345758570542}])
+        status, points = self.get('/timeseries?file=samples/main.xml'
+                '&interval=60&label=%22Home%22%20page')
+        self.assertEqual([(point['timeStamp'], point['samples'])
+                for point in points], [(1345758540000, 1)])
+
+    def test_runs(self):
+        """Test the runs kept in memory and errors.
+
+        """
+        self.get('/summary?file=samples/main.csv')
+        self.get('/summary?file=samples/main.xml')
+        status, runs = self.get('/runs')
+        self.assertEqual([run['file'] for run in runs],
+                ['samples/main.xml'])
+        self.assertEqual(runs[0]['samples'], 5)
+        self.assertEqual(self.get('/summary?file=../jtl.py')[0], 404)
+        self.assertEqual(self.get('/summary?file=missing.csv')[0], 404)
+        self.assertEqual(self.get('/unknown')[0], 404)
+
+    def test_loading(self):
+        """Test that loading the run does not block other requests and
+        concurrent requests for the run wait for the single load.
+
+        """
+        run_class = jtl._Run
+        started = threading.Event()
+        release = threading.Event()
+        loads = []
+        def load(*args, **kwargs):
+            loads.append(args)
+            started.set()
+            release.wait()
+            return run_class(*args, **kwargs)
+        jtl._Run = load
+        try:
+            results = []
+            threads = [threading.Thread(target=lambda: results.append(
+                    self.get('/summary?file=samples/main.csv')))
+                    for index in range(2)]
+            for thread in threads:
+                thread.start()
+            self.assertTrue(started.wait(5))
+            self.assertEqual(self.get('/runs'), (200, []))
+            release.set()
+            for thread in threads:
+                thread.join()
+        finally:
+            jtl._Run = run_class
+            release.set()
+        self.assertEqual(len(loads), 1)
+        self.assertEqual([status for status, rows in results], [200, 200])
+
+    def test_series_size(self):
+        """Test that memoized time series count in the memory budget.
+
+        """
+        run = self.server.get_run('samples/main.xml')
+        size = run.size
+        run.timeseries(60)
+        self.assertTrue(run.size > size)
+        self.server.memory = size + 100
+        self.assertEqual(self.get('/timeseries?file=samples/main.xml'
+                '&interval=10')[0], 200)
+        self.assertEqual(run.series, {})
+        self.assertEqual(run.size, size)
+
+        # the memoized series and their size stay consistent when the
+        # series are computed and dropped concurrently
+        def compute(interval):
+            for index in range(20):
+                run.timeseries(interval)
+                run.clear_series()
+        threads = [threading.Thread(target=compute, args=(interval, ))
+                for interval in (1, 10, 60, 3600)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        run.timeseries(60)
+        self.assertEqual(run.size - size,
+                sum(len(series) + 1 for series in run.series.itervalues())
+                * run.point_size)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+# Copyright (C) 2012-2016 Victor Klepikovskiy
+#
+# This file is part of python-jtl.
+#
+# python-jtl is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# python-jtl is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-jtl. If not, see <http://www.gnu.org/licenses/>.
+
+
+from datetime import timedelta
+import jtl
+import os.path
+import unittest
+
+
+class SessionsTestCase(unittest.TestCase):
+    """Testing virtual user sessions reconstruction.
+
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.tests_dir = os.path.dirname(os.path.abspath(__file__))
+        cls.sample = next(jtl.create_parser(os.path.join(cls.tests_dir,
+                'samples/main.csv')).itersamples())
+
+    def get_sample(self, thread_name, second, label, success=True):
+        """Return the sample of the thread taking one second.
+
+        """
+        return self.sample._replace(elapsed_time=timedelta(seconds=1),
+                idle_time=timedelta(milliseconds=10), label=label,
+                success=success, thread_name=thread_name,
+                timestamp=jtl._EPOCH + timedelta(seconds=second))
+
+    def test_iterations(self):
+        """Test splitting sessions into iterations on the marker label and
+        reordering the samples.
+
+        """
+        samples = [self.get_sample('1', 0, 'login'),
+                self.get_sample('2', 1, 'login'),
+                self.get_sample('1', 5, 'buy', False),
+                self.get_sample('1', 3, 'search'),
+                self.get_sample('1', 10, 'login'),
+                self.get_sample('1', 12, 'search')]
+        summaries = list(jtl.itersessions(samples, marker='login'))
+        self.assertEqual([(summary.thread_name, summary.iteration)
+                for summary in summaries],
+                [('1', 1), ('1', 2), ('1', None), ('2', 1), ('2', None)])
+        first = summaries[0]
+        self.assertEqual((first.samples, first.errors), (3, 1))
+        self.assertEqual(first.duration, timedelta(seconds=6))
+        self.assertEqual(first.think_time, timedelta(seconds=3))
+        self.assertEqual(first.idle_time, timedelta(milliseconds=30))
+        session = summaries[2]
+        self.assertEqual((session.samples, session.errors), (5, 1))
+        self.assertEqual(session.duration, timedelta(seconds=13))
+        self.assertEqual(session.think_time, timedelta(seconds=8))
+        self.assertEqual(session.start, jtl._EPOCH)
+        self.assertEqual(session.end, jtl._EPOCH + timedelta(seconds=13))
+
+    def test_timeout(self):
+        """Test closing idle sessions before the end of the samples.
+
+        """
+        samples = iter([self.get_sample('1', 0, 'a'),
+                self.get_sample('2', 100, 'a'),
+                self.get_sample('2', 200, 'a')])
+        summaries = jtl.itersessions(samples, window=1, timeout=30)
+        self.assertEqual(next(summaries).thread_name, '1')
+        self.assertEqual(next(samples).thread_name, '2')
+
+
+if __name__ == '__main__':
+    unittest.main()
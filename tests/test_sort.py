@@ -0,0 +1,69 @@
+# Copyright (C) 2012-2016 Victor Klepikovskiy
+#
+# This file is part of python-jtl.
+#
+# python-jtl is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# python-jtl is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-jtl. If not, see <http://www.gnu.org/licenses/>.
+
+
+import cPickle
+import jtl
+import os.path
+import unittest
+
+
+class SortTestCase(unittest.TestCase):
+    """Testing sorting samples by timestamps.
+
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.tests_dir = os.path.dirname(os.path.abspath(__file__))
+
+    def check_sorted(self, samples_filename):
+        """Check that samples sorted in memory and in runs spilled to
+        temporary files are the same.
+
+        """
+        samples = list(jtl.create_parser(samples_filename).itersamples())
+        samples = samples + samples[::-1]
+        expected = sorted(samples, key=lambda sample: sample.timestamp)
+        self.assertEqual(list(jtl.itersorted(samples)), expected)
+        self.assertEqual(list(jtl.itersorted(samples, run_size=2)),
+                expected)
+        self.assertEqual(list(jtl.itersorted(iter(samples),
+                run_size=len(samples))), expected)
+        self.assertEqual(list(jtl.itersorted([])), [])
+        for sample in samples:
+            data = cPickle.dumps(jtl._pack_sample(sample),
+                    cPickle.HIGHEST_PROTOCOL)
+            self.assertNotIn('jtl', data)
+            self.assertNotIn('datetime', data)
+            self.assertEqual(jtl._unpack_sample(cPickle.loads(data)), sample)
+
+    def test_xml(self):
+        """Test XML samples (with nested samples).
+
+        """
+        self.check_sorted(os.path.join(self.tests_dir, 'samples/main.xml'))
+        self.check_sorted(os.path.join(self.tests_dir, 'samples/nested.xml'))
+
+    def test_csv(self):
+        """Test CSV samples.
+
+        """
+        self.check_sorted(os.path.join(self.tests_dir, 'samples/main.csv'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+# Copyright (C) 2012-2016 Victor Klepikovskiy
+#
+# This file is part of python-jtl.
+#
+# python-jtl is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# python-jtl is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-jtl. If not, see <http://www.gnu.org/licenses/>.
+
+
+from datetime import datetime
+import jtl
+import os.path
+import shutil
+import tempfile
+import unittest
+
+
+class SplitTestCase(unittest.TestCase):
+    """Testing raw splitting of results files.
+
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.tests_dir = os.path.dirname(os.path.abspath(__file__))
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def check_split(self, samples_filename, **kwargs):
+        """Check that the files split contain all the samples and return
+        the dictionary of the files.
+
+        """
+        filenames = jtl.split(samples_filename, self.temp_dir, **kwargs)
+        samples = list(jtl.create_parser(samples_filename).itersamples())
+        split_samples = []
+        for key, filename in filenames.iteritems():
+            for sample in jtl.create_parser(filename).itersamples():
+                if kwargs.get('by', 'label') == 'label':
+                    self.assertEqual(sample.label, key)
+                split_samples.append(sample)
+        self.assertEqual(sorted(split_samples), sorted(samples))
+        return filenames
+
+    def test_csv(self):
+        """Test splitting CSV file by label.
+
+        """
+        samples_filename = os.path.join(self.tests_dir, 'samples/main.csv')
+        filenames = self.check_split(samples_filename, max_open=1)
+        self.assertEqual(len(filenames), 3)
+        self.assertEqual(os.path.basename(filenames['"Home" page']),
+                'main-_Home__page.csv')
+        with open(samples_filename, 'rb') as fp:
+            header = fp.readline()
+            lines = fp.read()
+        data = ''
+        for filename in sorted(filenames.values()):
+            with open(filename, 'rb') as fp:
+                self.assertEqual(fp.readline(), header)
+                data += fp.read()
+        self.assertEqual(sorted(data.splitlines(True)),
+                sorted(lines.splitlines(True)))
+
+    def test_xml(self):
+        """Test splitting XML file by label and by time interval.
+
+        """
+        samples_filename = os.path.join(self.tests_dir, 'samples/main.xml')
+        filenames = self.check_split(samples_filename)
+        self.assertEqual(len(filenames), 5)
+        with open(samples_filename, 'rb') as fp:
+            data = fp.read()
+        for filename in filenames.values():
+            with open(filename, 'rb') as fp:
+                for line in fp:
+                    self.assertIn(line, data)
+        filenames = self.check_split(samples_filename, by='timestamp',
+                interval=60)
+        self.assertEqual(sorted(filenames), [datetime(2012, 8, 23, 21, 49),
+                datetime(2012, 8, 23, 21, 50), datetime(2012, 11, 10, 15, 2)])
+
+
+if __name__ == '__main__':
+    unittest.main()
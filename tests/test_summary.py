@@ -0,0 +1,103 @@
+# Copyright (C) 2012-2016 Victor Klepikovskiy
+#
+# This file is part of python-jtl.
+#
+# python-jtl is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# python-jtl is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-jtl. If not, see <http://www.gnu.org/licenses/>.
+
+
+import jtl
+import math
+import os.path
+import unittest
+
+
+class SummaryTestCase(unittest.TestCase):
+    """Testing aggregate report and latency sketch.
+
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.tests_dir = os.path.dirname(os.path.abspath(__file__))
+
+    def test_sketch(self):
+        """Test latency sketch percentiles and merging.
+
+        """
+        sketch = jtl.LatencySketch()
+        other = jtl.LatencySketch()
+        for value in range(1001):
+            (sketch if value % 2 else other).add(value)
+        sketch.merge(other)
+        self.assertEqual(sketch.count, 1001)
+        self.assertEqual((sketch.min, sketch.max), (0, 1000))
+        self.assertEqual(sketch.percentile(0), 0)
+        self.assertEqual(sketch.percentile(100), 1000)
+        for percent in (10, 50, 90, 99):
+            self.assertAlmostEqual(sketch.percentile(percent), percent * 10,
+                    delta=percent * 10 * 0.01)
+        self.assertRaises(ValueError, sketch.merge, jtl.LatencySketch(0.05))
+
+    def test_summary(self):
+        """Test aggregate report of XML and CSV results.
+
+        """
+        summary = jtl.Summary().update(jtl.create_parser(os.path.join(
+                self.tests_dir, 'samples/main.csv')).itersamples())
+        rows = summary.rows()
+        self.assertEqual([row.label for row in rows], ['"Home" page',
+                '/search/images;_ylt=A0oG7lg2AvZPowgACQNXNyoA',
+                'fourth sample, last sample', None])
+        total = rows[-1]
+        self.assertEqual((total.samples, total.min, total.max),
+                (3, 109, 1152))
+        self.assertAlmostEqual(total.average, (1152 + 109 + 882) / 3.0)
+        self.assertAlmostEqual(total.error_rate, 1 / 3.0)
+        self.assertAlmostEqual(total.throughput,
+                3 / ((1345758873601 + 882 - 1345758839670) / 1000.0))
+
+        other = jtl.Summary().update(jtl.create_parser(os.path.join(
+                self.tests_dir, 'samples/main.xml')).itersamples())
+        summary.merge(other)
+        rows = summary.rows()
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(rows[0].samples, 2)
+        self.assertEqual(rows[-1].samples, 8)
+        self.assertEqual(rows[-1].max, 3571)
+
+    def test_exact(self):
+        """Test exact percentiles.
+
+        """
+        histogram = jtl.ExactHistogram()
+        other = jtl.ExactHistogram()
+        values = [value * 7 % 1000 for value in range(5000)]
+        for value in values:
+            (histogram if value % 3 else other).add(value)
+        histogram.merge(other)
+        values.sort()
+        for percent in (0, 10, 50, 99, 99.9, 100):
+            rank = max(int(math.ceil(percent / 100.0 * len(values))), 1)
+            self.assertEqual(histogram.percentile(percent), values[rank - 1])
+        self.assertRaises(ValueError, histogram.merge, jtl.LatencySketch())
+        self.assertRaises(ValueError, jtl.LatencySketch().merge, histogram)
+
+        summary = jtl.Summary(accuracy=None).update(jtl.create_parser(
+                os.path.join(self.tests_dir, 'samples/main.xml')).itersamples())
+        total = summary.rows()[-1]
+        self.assertEqual((total.median, total.p90, total.p99),
+                (1359, 3571, 3571))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+# Copyright (C) 2012-2016 Victor Klepikovskiy
+#
+# This file is part of python-jtl.
+#
+# python-jtl is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+#
+# python-jtl is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with python-jtl. If not, see <http://www.gnu.org/licenses/>.
+
+
+import jtl
+import os.path
+import shutil
+import tempfile
+import unittest
+
+
+class WriterTestCase(unittest.TestCase):
+    """Testing results writers and converter.
+
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.tests_dir = os.path.dirname(os.path.abspath(__file__))
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_xml(self):
+        """Test XML writer.
+
+        """
+        for samples_filename in ('samples/main.xml', 'samples/nested.xml',
+                'samples/minimized.xml'):
+            samples_filename = os.path.join(self.tests_dir, samples_filename)
+            target = os.path.join(self.temp_dir, 'results.xml')
+            self.assertEqual(jtl.convert(samples_filename, target), len(list(
+                    jtl.create_parser(samples_filename).itersamples())))
+            self.assertEqual(
+                    list(jtl.create_parser(target).itersamples()),
+                    list(jtl.create_parser(samples_filename).itersamples()))
+
+    def test_csv(self):
+        """Test CSV writer.
+
+        """
+        for samples_filename in ('samples/main.csv', 'samples/main.xml'):
+            samples_filename = os.path.join(self.tests_dir, samples_filename)
+            target = os.path.join(self.temp_dir, 'results.csv')
+            jtl.convert(samples_filename, target)
+            samples = list(jtl.create_parser(samples_filename).itersamples())
+            for sample, converted in zip(samples,
+                    jtl.create_parser(target).itersamples()):
+                for field in ('all_threads', 'bytes_received', 'data_type',
+                        'elapsed_time', 'error_count', 'group_threads',
+                        'hostname', 'label', 'latency_time', 'response_code',
+                        'response_message', 'success', 'thread_name',
+                        'timestamp', 'url'):
+                    self.assertEqual(getattr(sample, field),
+                            getattr(converted, field))
+        self.assertEqual(converted.assertion_results[0].failure_message,
+                samples[-1].assertion_results[1].failure_message)
+
+    def test_fields(self):
+        """Test writing the subset of fields.
+
+        """
+        samples_filename = os.path.join(self.tests_dir, 'samples/main.xml')
+        target = os.path.join(self.temp_dir, 'results.csv')
+        jtl.convert(samples_filename, target, fields=('timestamp', 'label',
+                'elapsed_time', 'success', 'cookies'))
+        with open(target) as fp:
+            self.assertEqual(fp.readline(), 'timeStamp,label,elapsed,success\n')
+            self.assertEqual(fp.readline(),
+                    '1345758561246,"""Home"" page",1350,true\n')
+
+        target = os.path.join(self.temp_dir, 'results.xml')
+        jtl.convert(samples_filename, target, fields=('timestamp', 'label',
+                'children'))
+        with open(target) as fp:
+            self.assertEqual(fp.read().splitlines()[2:4], [
+                    '<httpSample ts="1345758561246" lb="&quot;Home&quot; '
+                    'page"/>',
+                    '<sample ts="1345758570542" lb="Transaction Controller"/>',
+                    ])
+        samples = list(jtl.create_parser(target).itersamples())
+        self.assertEqual(len(samples[4].children), 2)
+        self.assertEqual(samples[4].children[1].label,
+                '/search/images;_ylt=A0oG7lg2AvZPowgACQNXNyoA')
+
+
+if __name__ == '__main__':
+    unittest.main()